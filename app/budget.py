@@ -0,0 +1,201 @@
+# budget.py - OpenAI token budget governor (rolling hour/day windows)
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from app.db import shared
+
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class TokenBudgetGovernor:
+    """Tracks OpenAI token spend and degrades gracefully as the budget runs out.
+
+    Stages, from the remaining fraction of the tightest window:
+      - normal    : every non-strict request goes to OpenAI
+      - conserve  : local decision (EnhancedModerator) is kept when its
+                    confidence reaches a bar that drops as the budget shrinks
+      - cheap     : same, and OpenAI calls switch to ``cheap_model``
+      - exhausted : OpenAI is never called, local decision only
+    """
+
+    NORMAL = 'normal'
+    CONSERVE = 'conserve'
+    CHEAP = 'cheap'
+    EXHAUSTED = 'exhausted'
+
+    def __init__(self, config, db_path: str):
+        self.config = config
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._windows = {HOUR: deque(), DAY: deque()}
+        self._used = {HOUR: 0, DAY: 0}
+        # Appels spéculatifs jetés : déjà dans les fenêtres via record(), suivis
+        # à part (dernière heure) pour plafonner la spéculation
+        self._wasted = deque()
+        self._wasted_hour = 0
+        self.speculative_wasted_tokens = 0
+        self.init_database()
+        self.load_recent_usage()
+
+    # ----- persistence -----
+
+    def init_database(self):
+        conn = shared(self.db_path).connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS openai_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                model TEXT,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_openai_usage_timestamp ON openai_usage(timestamp)")
+        # On garde une semaine d'historique, les fenêtres n'utilisent que 24h
+        conn.execute("DELETE FROM openai_usage WHERE timestamp < ?", (time.time() - 7 * DAY,))
+        conn.commit()
+        conn.close()
+
+    def load_recent_usage(self):
+        """Rebuild the rolling windows after a restart"""
+        conn = shared(self.db_path).connect()
+        rows = conn.execute("""
+            SELECT timestamp, prompt_tokens + completion_tokens
+            FROM openai_usage
+            WHERE timestamp >= ?
+            ORDER BY timestamp
+        """, (time.time() - DAY,)).fetchall()
+        conn.close()
+
+        with self._lock:
+            for timestamp, tokens in rows:
+                self._append(timestamp, tokens)
+
+    # ----- accounting -----
+
+    def _append(self, timestamp: float, tokens: int):
+        for window, events in self._windows.items():
+            events.append((timestamp, tokens))
+            self._used[window] += tokens
+
+    def _expire(self, now: float):
+        for window, events in self._windows.items():
+            while events and events[0][0] < now - window:
+                self._used[window] -= events.popleft()[1]
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int):
+        """Usage callback for OpenAIModerator (every call, retries included)"""
+        now = time.time()
+        with self._lock:
+            self._append(now, prompt_tokens + completion_tokens)
+        try:
+            with shared(self.db_path).transaction() as conn:
+                conn.execute("""
+                    INSERT INTO openai_usage (timestamp, model, prompt_tokens, completion_tokens)
+                    VALUES (?, ?, ?, ?)
+                """, (now, model, prompt_tokens, completion_tokens))
+        except Exception as e:
+            print(f"⚠️  Budget usage not persisted: {e}")
+
+    def record_speculative_waste(self, tokens: int):
+        """SpeculativeAI callback: tokens of a speculative call that was discarded"""
+        now = time.time()
+        with self._lock:
+            self._wasted.append((now, tokens))
+            self._wasted_hour += tokens
+            self.speculative_wasted_tokens += tokens
+
+    def speculation_allowed(self, config=None) -> bool:
+        """Normal stage, and discarded speculation within its share of the last hour"""
+        config = config or self.config
+        if self.plan(config)['stage'] != self.NORMAL:
+            return False
+        max_share = float(config.get('performance.speculative_ai.max_wasted_share', 0.2))
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            while self._wasted and self._wasted[0][0] < now - HOUR:
+                self._wasted_hour -= self._wasted.popleft()[1]
+            wasted, used = self._wasted_hour, self._used[HOUR]
+        return not used or wasted <= max_share * used
+
+    def usage_by_model(self):
+        """(model, calls, prompt_tokens, completion_tokens) over the stored history"""
+        conn = shared(self.db_path).connect()
+        try:
+            return conn.execute("""
+                SELECT model, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens)
+                FROM openai_usage
+                GROUP BY model
+            """).fetchall()
+        finally:
+            conn.close()
+
+    # ----- policy -----
+
+    def _limits(self, config=None) -> Dict[int, int]:
+        config = config or self.config
+        return {
+            HOUR: int(config.get('openai_budget.hourly_tokens', 0) or 0),
+            DAY: int(config.get('openai_budget.daily_tokens', 0) or 0),
+        }
+
+    def remaining_fraction(self, config=None) -> float:
+        """Remaining share of the tightest configured window (1.0 = unlimited)"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            used = dict(self._used)
+        fractions = [
+            max(0.0, 1.0 - used[window] / limit)
+            for window, limit in self._limits(config).items() if limit > 0
+        ]
+        return min(fractions) if fractions else 1.0
+
+    def plan(self, config=None) -> Dict[str, Any]:
+        """What the pipeline may spend on the next request (``config`` : snapshot de la requête)"""
+        config = config or self.config
+        if not config.get('openai_budget.enabled', True):
+            return {'stage': self.NORMAL, 'remaining': 1.0, 'confidence_bar': None, 'model': None}
+
+        remaining = self.remaining_fraction(config)
+        conserve_below = float(config.get('openai_budget.conserve_below', 0.5))
+        cheap_below = float(config.get('openai_budget.cheap_below', 0.25))
+        exhausted_below = float(config.get('openai_budget.exhausted_below', 0.05))
+
+        if remaining >= conserve_below:
+            return {'stage': self.NORMAL, 'remaining': remaining, 'confidence_bar': None, 'model': None}
+        if remaining < exhausted_below:
+            return {'stage': self.EXHAUSTED, 'remaining': remaining, 'confidence_bar': 0.0, 'model': None}
+
+        # La barre baisse linéairement : plus le budget fond, plus une décision
+        # locale moins sûre suffit pour ne pas appeler OpenAI.
+        max_bar = float(config.get('openai_budget.max_confidence_bar', 0.9))
+        min_bar = float(config.get('openai_budget.min_confidence_bar', 0.6))
+        span = max(conserve_below - exhausted_below, 1e-9)
+        bar = min_bar + (max_bar - min_bar) * (remaining - exhausted_below) / span
+
+        stage = self.CHEAP if remaining < cheap_below else self.CONSERVE
+        model = config.get('openai_budget.cheap_model', 'gpt-4o-mini') if stage == self.CHEAP else None
+        return {'stage': stage, 'remaining': remaining, 'confidence_bar': round(bar, 3), 'model': model}
+
+    def get_state(self) -> Dict[str, Any]:
+        plan = self.plan()
+        with self._lock:
+            used = dict(self._used)
+        limits = self._limits()
+        return {
+            'enabled': self.config.get('openai_budget.enabled', True),
+            'stage': plan['stage'],
+            'remaining': round(plan['remaining'], 4),
+            'confidence_bar': plan['confidence_bar'],
+            'model_override': plan['model'],
+            'hour': {'used': used[HOUR], 'limit': limits[HOUR]},
+            'day': {'used': used[DAY], 'limit': limits[DAY]},
+            'speculative_wasted': {'hour': self._wasted_hour, 'total': self.speculative_wasted_tokens},
+        }
@@ -1,17 +1,221 @@
 # config_loader.py - PlexStaffAI Configuration Management
 
+import os
+import threading
 import yaml
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 from datetime import datetime
 
+from app.keyword_matcher import TITLE_FIELDS, KeywordMatcher
+
+# Valeurs numériques / listes de chaînes vérifiées avant un hot-reload
+NUMERIC_KEYS = (
+    'ai_rules.auto_approve.rating_above',
+    'ai_rules.auto_reject.rating_below',
+    'ai_rules.needs_review.episode_count_above',
+    'ai_rules.needs_review.season_count_above',
+    'ai_rules.needs_review.new_user_days',
+    'ai_rules.needs_review.obscure_popularity_threshold',
+    'similarity.min_similarity',
+    'similarity.min_confidence',
+    'openai_budget.hourly_tokens',
+    'openai_budget.daily_tokens',
+    'metrics.timing_sample_rate',
+    'library_sync.page_size',
+    'machine_learning.retrain_threshold',
+    'machine_learning.retrain_interval_minutes',
+    'machine_learning.naive_bayes.min_samples',
+    'machine_learning.naive_bayes.alpha',
+    'machine_learning.naive_bayes.min_confidence',
+)
+STRING_LIST_KEYS = (
+    'ai_rules.auto_approve.genres',
+    'ai_rules.auto_reject.genres',
+    'ai_rules.auto_reject.keywords',
+    'ai_rules.needs_review.controversial_keywords',
+)
+
+
+def validate_config(config: Any) -> List[str]:
+    """Erreurs bloquantes d'une config parsée (liste vide = OK)"""
+    if not isinstance(config, dict) or not config:
+        return ['config must be a non-empty mapping']
+
+    errors = []
+    missing = object()
+
+    def lookup(key_path):
+        value = config
+        for key in key_path.split('.'):
+            if not isinstance(value, dict):
+                errors.append(f"{key_path}: parent is not a mapping")
+                return missing
+            value = value.get(key, missing)
+            if value is missing:
+                return missing
+        return value
+
+    for section in ('ai_rules', 'ai_rules.auto_approve', 'ai_rules.auto_reject', 'ai_rules.needs_review'):
+        value = lookup(section)
+        if value is not missing and value is not None and not isinstance(value, dict):
+            errors.append(f"{section}: expected a mapping")
+    if errors:
+        return errors
+
+    for key_path in NUMERIC_KEYS:
+        value = lookup(key_path)
+        if value is not missing and value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))):
+            errors.append(f"{key_path}: expected a number, got {value!r}")
+    for key_path in STRING_LIST_KEYS:
+        value = lookup(key_path)
+        if value is not missing and value is not None and (
+                not isinstance(value, list) or not all(isinstance(v, str) for v in value)):
+            errors.append(f"{key_path}: expected a list of strings")
+    return errors
+
+
+def lookup(config: Any, key_path: str, default: Any = None) -> Any:
+    """Dot-notation lookup in a parsed config: 'ai_rules.auto_approve.rating_above'"""
+    value = config
+    for key in key_path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(key)
+        else:
+            return default
+    return value if value is not None else default
+
+
+class ConfigSnapshot:
+    """One config version, frozen for the duration of a request.
+
+    Same ``get`` as ConfigManager, but a reload never changes what it
+    returns: every component of a request reads the version it started
+    with, and that ``version`` is the one recorded with the decision.
+    """
+    __slots__ = ('config', 'version')
+
+    def __init__(self, config: Dict[str, Any], version: int):
+        self.config = config
+        self.version = version
+
+    def get(self, key_path: str, default: Any = None) -> Any:
+        return lookup(self.config, key_path, default)
+
+
 class ConfigManager:
-    """Charge et gère les règles AI personnalisées depuis config.yaml"""
+    """Charge et gère les règles AI personnalisées depuis config.yaml
+
+    ``config`` est un snapshot : il n'est jamais modifié en place, un
+    rechargement (``reload`` / watcher) le remplace d'un bloc et incrémente
+    ``version``. Les abonnés (``subscribe``) recompilent alors leurs règles.
+    ``snapshot()`` renvoie la paire (config, version) courante, publiée en
+    une seule affectation.
+    """
     
     def __init__(self, config_path: str = "/config/config.yaml"):
         self.config_path = Path(config_path)
+        self._init_reload_state()
+        self._stamp = self._file_stamp()
         self.config = self.load_config()
-    
+        self._snapshot = ConfigSnapshot(self.config, self.version)
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any], source: str = "<inline>") -> 'ConfigManager':
+        """ConfigManager sur une config déjà parsée (replay, what-if)"""
+        manager = cls.__new__(cls)
+        manager.config_path = Path(source)
+        manager._init_reload_state()
+        manager._stamp = None
+        manager.config = config
+        manager._snapshot = ConfigSnapshot(config, manager.version)
+        return manager
+
+    def _init_reload_state(self):
+        self.version = 1
+        self.loaded_at = datetime.now()
+        self.last_error: Optional[str] = None
+        self._reload_lock = threading.Lock()
+        self._subscribers: List[Callable[['ConfigManager'], Any]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.config_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def subscribe(self, callback: Callable[['ConfigManager'], Any]):
+        """Callback appelé après chaque nouveau snapshot"""
+        self._subscribers.append(callback)
+
+    def reload(self, force: bool = False) -> bool:
+        """Relit config.yaml si modifié ; le snapshot courant reste en place si invalide"""
+        with self._reload_lock:
+            stamp = self._file_stamp()
+            if stamp is None or (stamp == self._stamp and not force):
+                return False
+            self._stamp = stamp
+            try:
+                with open(self.config_path, 'r') as f:
+                    new_config = yaml.safe_load(f)
+            except (OSError, yaml.YAMLError) as e:
+                self.last_error = str(e)
+                print(f"❌ Config reload failed, keeping v{self.version}: {e}")
+                return False
+
+            errors = validate_config(new_config)
+            if errors:
+                self.last_error = '; '.join(errors)
+                print(f"❌ Invalid config, keeping v{self.version}: {self.last_error}")
+                return False
+
+            # Swap atomique : les lecteurs voient l'ancien ou le nouveau dict, jamais un mélange
+            self.config = new_config
+            self.version += 1
+            self._snapshot = ConfigSnapshot(new_config, self.version)
+            self.loaded_at = datetime.now()
+            self.last_error = None
+            subscribers = list(self._subscribers)
+            print(f"🔄 Config reloaded from {self.config_path} (v{self.version})")
+
+            for callback in subscribers:
+                try:
+                    callback(self)
+                except Exception as e:
+                    print(f"⚠️  Config subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
+        return True
+
+    def start_watcher(self, interval: float = 5.0):
+        """Polling du mtime de config.yaml dans un thread (hors chemin critique)"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"⚠️  Config watcher error: {e}")
+
+        self._watcher = threading.Thread(target=run, name='config-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watching.set()
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.config_path),
+            'version': self.version,
+            'loaded_at': self.loaded_at.isoformat(),
+            'last_error': self.last_error,
+            'watching': self._watcher is not None and self._watcher.is_alive(),
+        }
+
     def load_config(self) -> Dict[str, Any]:
         """Charge le fichier YAML avec fallback sur defaults"""
         try:
@@ -53,16 +257,13 @@ class ConfigManager:
             }
         }
     
+    def snapshot(self) -> ConfigSnapshot:
+        """Config courante et sa version, figées (une par requête)"""
+        return self._snapshot
+
     def get(self, key_path: str, default: Any = None) -> Any:
         """Accède config avec dot notation: 'ai_rules.auto_approve.rating_above'"""
-        keys = key_path.split('.')
-        value = self.config
-        for key in keys:
-            if isinstance(value, dict):
-                value = value.get(key)
-            else:
-                return default
-        return value if value is not None else default
+        return lookup(self.config, key_path, default)  # un seul snapshot par lecture
 
 
 class ModerationDecision:
@@ -95,10 +296,32 @@ class SmartModerator:
     
     def __init__(self, config: ConfigManager):
         self.config = config
-    
-    def should_auto_approve(self, request_data: Dict[str, Any]) -> Optional[ModerationDecision]:
+        self.recompile()
+
+    def recompile(self, config: ConfigManager = None):
+        """(Re)construit les automates de mots-clés depuis la config"""
+        self._compiled = self._compile(self.config.snapshot())
+
+    @staticmethod
+    def _compile(config) -> tuple:
+        return (
+            config.version,
+            KeywordMatcher(config.get('ai_rules.auto_reject.keywords', [])),
+            KeywordMatcher(config.get('ai_rules.needs_review.controversial_keywords', [])),
+        )
+
+    def _keywords(self, config) -> tuple:
+        """(reject, review) automata of ``config``'s version"""
+        compiled = self._compiled
+        if compiled[0] != getattr(config, 'version', compiled[0]):
+            # Snapshot pris juste avant / après un reload non encore recompilé
+            compiled = self._compile(config)
+        return compiled[1], compiled[2]
+
+    def should_auto_approve(self, request_data: Dict[str, Any], config=None) -> Optional[ModerationDecision]:
         """Vérifie si la request match des règles auto-approve"""
-        rules = self.config.get('ai_rules.auto_approve', {})
+        config = config or self.config
+        rules = config.get('ai_rules.auto_approve', {})
         
         # Check rating
         rating = request_data.get('rating', 0)
@@ -137,9 +360,10 @@ class SmartModerator:
         
         return None
     
-    def should_auto_reject(self, request_data: Dict[str, Any]) -> Optional[ModerationDecision]:
+    def should_auto_reject(self, request_data: Dict[str, Any], config=None) -> Optional[ModerationDecision]:
         """Vérifie si la request match des règles auto-reject"""
-        rules = self.config.get('ai_rules.auto_reject', {})
+        config = config or self.config
+        rules = config.get('ai_rules.auto_reject', {})
         
         # Check rating
         rating = request_data.get('rating', 10)
@@ -164,10 +388,10 @@ class SmartModerator:
                 rule_matched="auto_reject.genres"
             )
         
-        # Check banned keywords
-        title = request_data.get('title', '').upper()
-        keywords = rules.get('keywords', [])
-        matched_keywords = [kw for kw in keywords if kw.upper() in title]
+        # Check banned keywords (titre et titre original seulement : marqueurs de release)
+        matched_keywords = KeywordMatcher.matched_keywords(
+            self._keywords(config)[0].scan(request_data, text_fields=TITLE_FIELDS, list_fields=())
+        )
         if matched_keywords:
             return ModerationDecision(
                 ModerationDecision.REJECTED,
@@ -178,9 +402,10 @@ class SmartModerator:
         
         return None
     
-    def needs_human_review(self, request_data: Dict[str, Any]) -> Optional[ModerationDecision]:
+    def needs_human_review(self, request_data: Dict[str, Any], config=None) -> Optional[ModerationDecision]:
         """Vérifie si la request nécessite révision humaine"""
-        rules = self.config.get('ai_rules.needs_review', {})
+        config = config or self.config
+        rules = config.get('ai_rules.needs_review', {})
         
         # Check episode count (séries longues)
         episode_count = request_data.get('episode_count', 0)
@@ -204,6 +429,18 @@ class SmartModerator:
                 rule_matched="needs_review.season_count"
             )
         
+        # Check controversial keywords
+        hits = self._keywords(config)[1].scan(request_data)
+        if hits:
+            matched = KeywordMatcher.matched_keywords(hits)
+            fields = ', '.join(dict.fromkeys(hit.field for hit in hits))
+            return ModerationDecision(
+                ModerationDecision.NEEDS_REVIEW,
+                f"Controversial keyword(s) {', '.join(matched)} found in {fields}",
+                confidence=0.75,
+                rule_matched="needs_review.controversial_keywords"
+            )
+        
         # Check new user + obscure content
         user_age_days = request_data.get('user_age_days', 999)
         popularity = request_data.get('popularity', 100)
@@ -222,21 +459,21 @@ class SmartModerator:
         
         return None
     
-    def moderate(self, request_data: Dict[str, Any]) -> ModerationDecision:
-        """Modération complète avec cascade de règles"""
+    def moderate(self, request_data: Dict[str, Any], config=None) -> ModerationDecision:
+        """Modération complète avec cascade de règles (``config`` : snapshot de la requête)"""
         
         # 1. Check auto-reject (priorité max)
-        reject_decision = self.should_auto_reject(request_data)
+        reject_decision = self.should_auto_reject(request_data, config)
         if reject_decision:
             return reject_decision
         
         # 2. Check auto-approve
-        approve_decision = self.should_auto_approve(request_data)
+        approve_decision = self.should_auto_approve(request_data, config)
         if approve_decision:
             return approve_decision
         
         # 3. Check needs review
-        review_decision = self.needs_human_review(request_data)
+        review_decision = self.needs_human_review(request_data, config)
         if review_decision:
             return review_decision
         
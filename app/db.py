@@ -0,0 +1,146 @@
+# db.py - Managed SQLite connections (one per thread, WAL, cached statements)
+#
+# Every module reaches a database file through ``shared(path)`` so the whole
+# process keeps at most one connection per (file, thread).
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Union
+
+
+class Database:
+    """Per-thread reusable connections to one SQLite file.
+
+    Each thread lazily opens a single connection and keeps it, so its
+    prepared-statement cache (``cached_statements``) survives between calls.
+    Connections run in WAL mode with ``synchronous=NORMAL`` (durable on
+    checkpoint, no fsync per commit) and wait ``busy_timeout`` ms on a locked
+    database instead of failing immediately. ``mmap_size`` lets reads go
+    through a memory map of the file instead of read() syscalls.
+
+    Connections are shared: never ``close()`` the one ``connection()``
+    returns, and use ``transaction()`` for writes so an error rolls back
+    instead of leaving the thread's connection inside an open transaction.
+    ``connect()`` wraps it for code written against ``sqlite3.connect``.
+    """
+
+    def __init__(self, db_path: Union[str, Path], busy_timeout_ms: int = 5000,
+                 cached_statements: int = 256, wal: bool = True,
+                 mmap_size: int = 64 * 1024 * 1024):
+        self.db_path = str(db_path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.wal = wal
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            # Une connexion par thread ; close() peut les fermer depuis un autre
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.wal:
+            # journal_mode est persistant dans le fichier, synchronous par connexion
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (opened on first use)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+        return conn
+
+    def connect(self) -> 'PooledConnection':
+        """Drop-in for ``sqlite3.connect(path)`` backed by this thread's connection"""
+        return PooledConnection(self.connection())
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Commit on success, roll back on error; the connection stays open"""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close(self):
+        """Close every thread's connection (shutdown)"""
+        with self._lock:
+            connections, self._connections = list(self._connections.values()), {}
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+
+class PooledConnection:
+    """sqlite3.Connection stand-in over a pooled connection.
+
+    ``close()`` hands the connection back instead of closing it, rolling
+    back whatever was not committed - what closing a private connection
+    did. ``row_factory`` only applies to cursors made through this handle,
+    so it never leaks to the next user of the connection.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self.row_factory = None
+
+    def cursor(self) -> sqlite3.Cursor:
+        cursor = self._conn.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __enter__(self) -> 'PooledConnection':
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name: str) -> Any:
+        # commit, rollback, total_changes, in_transaction...
+        return getattr(self._conn, name)
+
+
+_shared: Dict[str, Database] = {}
+_shared_lock = threading.Lock()
+
+
+def shared(db_path: Union[str, Path]) -> Database:
+    """The process-wide Database of a file (created on first use)"""
+    key = str(db_path)
+    with _shared_lock:
+        database = _shared.get(key)
+        if database is None:
+            database = _shared[key] = Database(key)
+        return database
+
+
+def close_all():
+    """Close every shared database (shutdown)"""
+    with _shared_lock:
+        databases = list(_shared.values())
+    for database in databases:
+        database.close()
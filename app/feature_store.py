@@ -0,0 +1,351 @@
+# feature_store.py - Append-only memory-mapped feature records, one per decision
+#
+#   python -m app.feature_store rebuild [--db /config/moderation.db] [--path /config/features.bin]
+#   python -m app.feature_store stats
+#
+# rebuild refuse de tourner pendant que le serveur a le store ouvert (<path>.lock) :
+# arrêter le serveur, ou utiliser /admin/cleanup-duplicates qui reconstruit en place.
+
+import argparse
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.rules_batch import DECISION_CODES, MAX_GENRES, RecordBatch, parse_year
+from app.rules_validator import RulesValidator
+from app.similarity import is_content_decision
+
+DB_PATH = "/config/moderation.db"
+FEATURES_PATH = "/config/features.bin"
+
+# Enregistrement fixe (64 octets) ; ajouter un champ ou un flag = nouvelle VERSION
+VERSION = 2
+RECORD_DTYPE = np.dtype([
+    ('request_id', '<i8'),
+    ('decided_at', '<f8'),      # epoch secondes
+    ('rating', '<f8'),
+    ('popularity', '<f8'),
+    ('genre_bits', '<u8'),      # bit i = genres[i] du fichier .json
+    ('confidence', '<f4'),
+    ('episode_count', '<i4'),
+    ('season_count', '<i4'),
+    ('user_age_days', '<i4'),
+    ('year', '<i2'),            # 0 = inconnue
+    ('media_type', 'i1'),       # 0 movie, 1 tv
+    ('decision', 'i1'),         # DECISION_CODES, -1 = autre
+    ('flags', 'u1'),
+], align=True)
+
+FLAG_MANUAL = 1         # rule_matched == 'manual_staff'
+FLAG_ACTION_FAILED = 2  # rule_matched == 'overseerr_action_failed'
+FLAG_NOT_CONTENT = 4    # not similarity.is_content_decision (bibliothèque, réutilisation, trust, budget...)
+RULE_FLAGS = {'manual_staff': FLAG_MANUAL, 'overseerr_action_failed': FLAG_ACTION_FAILED}
+
+
+class StoreLockedError(RuntimeError):
+    """Another process has the store open for writing"""
+
+
+def rule_flags(rule_matched: Optional[str]) -> int:
+    flags = RULE_FLAGS.get(rule_matched or '', 0)
+    if not is_content_decision(rule_matched):
+        flags |= FLAG_NOT_CONTENT
+    return flags
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class FeatureStore:
+    """Fixed-width NumPy record per decided request, appended to a flat file.
+
+    ``<path>`` holds RECORD_DTYPE rows in decision order and is read through
+    ``np.memmap`` (zero-copy); ``<path>.json`` holds the genre vocabulary,
+    which only ever grows so existing ``genre_bits`` stay valid. An
+    in-memory index maps request_id to its latest row.
+
+    ``readonly`` opens an existing store for offline jobs (replay, batch
+    scoring) without touching the files the server appends to. A writable
+    store holds an exclusive ``flock`` on ``<path>.lock`` until ``close``:
+    a second writer (e.g. the CLI ``rebuild`` while the server runs) gets
+    StoreLockedError instead of swapping the file under its append handle.
+    """
+
+    def __init__(self, path: str = FEATURES_PATH, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self.meta_path = f"{path}.json"
+        self._lock = threading.Lock()
+        self.genres: List[str] = []
+        self._genre_index: Dict[str, int] = {}
+        self._index: Dict[int, int] = {}
+        self._count = 0
+        self._mapped: Optional[np.ndarray] = None
+        self._file = None
+        self._lock_file = None
+        self._overflow_warned = False
+        if not readonly:
+            self._acquire()
+        self.open()
+
+    def _acquire(self):
+        lock_file = open(f"{self.path}.lock", 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            owner = lock_file.read().strip() or '?'
+            lock_file.close()
+            raise StoreLockedError(f"{self.path} is opened for writing by pid {owner}")
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+
+    # ----- file handling -----
+
+    def open(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('version') != VERSION or meta.get('itemsize') != RECORD_DTYPE.itemsize:
+                if self.readonly:
+                    raise ValueError(f"{self.path}: feature store version {meta.get('version')} != {VERSION}")
+                # Ancien format : vidé ici, reconstruit depuis decisions au démarrage
+                print(f"⚠️  Feature store version {meta.get('version')} != {VERSION}, discarding {self.path}")
+                open(self.path, 'wb').close()
+                meta = {}
+            self.genres = list(meta.get('genres', []))
+        self._genre_index = {genre: i for i, genre in enumerate(self.genres)}
+
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self.readonly:
+            # Un enregistrement partiel (écriture en cours) est simplement ignoré
+            self._count = size // RECORD_DTYPE.itemsize
+        else:
+            if size % RECORD_DTYPE.itemsize:
+                # Écriture interrompue : on retire l'enregistrement partiel
+                with open(self.path, 'r+b') as f:
+                    f.truncate(size - size % RECORD_DTYPE.itemsize)
+            self._file = open(self.path, 'ab')
+            self._count = os.path.getsize(self.path) // RECORD_DTYPE.itemsize
+            self._write_meta()
+        self._mapped = None
+
+        ids = self.records()['request_id']
+        # Dernière ligne par request_id
+        self._index = dict(zip(ids.tolist(), range(len(ids))))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                # Fermer le descripteur libère le flock
+                self._lock_file.close()
+                self._lock_file = None
+            self._mapped = None
+
+    def _write_meta(self):
+        tmp = f"{self.meta_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'version': VERSION, 'itemsize': RECORD_DTYPE.itemsize, 'genres': self.genres}, f)
+        os.replace(tmp, self.meta_path)
+
+    # ----- writing -----
+
+    def _genre_bits(self, genres) -> int:
+        bits = 0
+        for genre in genres or []:
+            if not isinstance(genre, str) or not genre:
+                continue
+            genre = RulesValidator.GENRE_MAPPING.get(genre, genre)
+            index = self._genre_index.get(genre)
+            if index is None:
+                if len(self.genres) >= MAX_GENRES:
+                    if not self._overflow_warned:
+                        print(f"⚠️  Feature store: more than {MAX_GENRES} genres, '{genre}' not stored")
+                        self._overflow_warned = True
+                    continue
+                index = self._genre_index[genre] = len(self.genres)
+                self.genres.append(genre)
+                self._write_meta()
+            bits |= 1 << index
+        return bits
+
+    def _values(self, request_id: int, request_data: Dict[str, Any], decision: str,
+                confidence: float, rule_matched: Optional[str], decided_at: Optional[float]) -> tuple:
+        """One record as a tuple in RECORD_DTYPE field order"""
+        return (
+            int(request_id),
+            decided_at if decided_at is not None else time.time(),
+            _number(request_data.get('rating')),
+            _number(request_data.get('popularity')),
+            self._genre_bits(request_data.get('genres')),
+            _number(confidence),
+            int(_number(request_data.get('episode_count'))),
+            int(_number(request_data.get('season_count'))),
+            int(_number(request_data.get('user_age_days'))),
+            parse_year(request_data.get('year', '')),
+            1 if request_data.get('media_type') == 'tv' else 0,
+            DECISION_CODES.get(decision, -1),
+            rule_flags(rule_matched),
+        )
+
+    def append(self, request_id: int, request_data: Dict[str, Any], decision: str,
+               confidence: float, rule_matched: Optional[str] = None,
+               decided_at: Optional[float] = None) -> int:
+        """Append the features of one decision; returns its row number"""
+        if self.readonly:
+            raise ValueError(f"{self.path} is opened read-only")
+        with self._lock:
+            values = self._values(request_id, request_data or {}, decision, confidence,
+                                  rule_matched, decided_at)
+            self._file.write(np.array([values], dtype=RECORD_DTYPE).tobytes())
+            self._file.flush()
+            row = self._count
+            self._count += 1
+            self._index[int(request_id)] = row
+        return row
+
+    def backfill(self, db_path: str = DB_PATH, chunk_size: int = 5000) -> int:
+        """Fill an empty store from the decisions history (one-off json.loads pass)"""
+        if self.readonly:
+            raise ValueError(f"{self.path} is opened read-only")
+        if self._count:
+            return 0
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        added = 0
+        try:
+            cursor = conn.execute("""
+                SELECT request_id, decision, confidence, rule_matched, request_data, timestamp
+                FROM decisions ORDER BY id
+            """)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                with self._lock:
+                    chunk = []
+                    for request_id, decision, confidence, rule_matched, request_data_json, timestamp in rows:
+                        try:
+                            request_data = json.loads(request_data_json) if request_data_json else {}
+                        except (TypeError, ValueError):
+                            request_data = {}
+                        try:
+                            decided_at = datetime.fromisoformat(str(timestamp)).timestamp()
+                        except ValueError:
+                            decided_at = 0.0
+                        if not isinstance(request_data, dict):
+                            request_data = {}
+                        chunk.append(self._values(request_id or 0, request_data, decision,
+                                                  confidence, rule_matched, decided_at))
+                    self._file.write(np.array(chunk, dtype=RECORD_DTYPE).tobytes())
+                    self._file.flush()
+                    for values in chunk:
+                        self._index[values[0]] = self._count
+                        self._count += 1
+                added += len(rows)
+        finally:
+            conn.close()
+        return added
+
+    def rebuild(self, db_path: str = DB_PATH) -> int:
+        """Rewrite the store from decisions (after rows were deleted there).
+
+        The new file is built aside and renamed over the old one, so arrays
+        already mapped by readers stay valid; appends wait meanwhile.
+        """
+        if self.readonly:
+            raise ValueError(f"{self.path} is opened read-only")
+        tmp_path = f"{self.path}.rebuild"
+        for leftover in (tmp_path, f"{tmp_path}.json", f"{tmp_path}.lock"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        with self._lock:
+            fresh = FeatureStore(tmp_path)
+            added = fresh.backfill(db_path)
+            fresh.close()
+            os.remove(f"{tmp_path}.lock")
+            self._file.close()
+            os.replace(f"{tmp_path}.json", self.meta_path)
+            os.replace(tmp_path, self.path)
+            self.genres = []
+            self.open()
+        return added
+
+    # ----- reading (zero-copy) -----
+
+    def __len__(self) -> int:
+        return self._count
+
+    def records(self) -> np.ndarray:
+        """Structured array over every complete row (memory-mapped, read-only)"""
+        count = self._count
+        if count == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        mapped = self._mapped
+        if mapped is None or len(mapped) < count:
+            # shape explicite : un enregistrement partiel en fin de fichier
+            # (lecteur readonly pendant une écriture) n'est pas mappé
+            mapped = self._mapped = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', shape=(count,))
+        return mapped[:count]
+
+    def get(self, request_id: int) -> Optional[np.void]:
+        """Latest record of a request"""
+        row = self._index.get(int(request_id))
+        return None if row is None else self.records()[row]
+
+    def latest_rows(self) -> np.ndarray:
+        """Row numbers of the latest record per request, in row order"""
+        return np.fromiter(sorted(self._index.values()), dtype=np.int64, count=len(self._index))
+
+    def batch(self, records: np.ndarray, genre_vocab: Optional[Sequence[str]] = None) -> RecordBatch:
+        """RecordBatch (rules_batch) straight from stored records, no JSON"""
+        return RecordBatch.from_feature_records(records, self.genres, genre_vocab)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'records': self._count,
+            'requests': len(self._index),
+            'bytes': self._count * RECORD_DTYPE.itemsize,
+            'record_size': RECORD_DTYPE.itemsize,
+            'genres': len(self.genres),
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Feature store maintenance")
+    parser.add_argument('command', choices=['rebuild', 'stats'])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--path', default=FEATURES_PATH)
+    args = parser.parse_args(argv)
+
+    # stats en lecture seule : ne tronque rien et ne réécrit pas le .json sous le serveur
+    try:
+        store = FeatureStore(args.path, readonly=args.command == 'stats')
+    except StoreLockedError as e:
+        raise SystemExit(f"❌ {e}: stop the server first, or use /admin/cleanup-duplicates")
+    if args.command == 'rebuild':
+        started = time.perf_counter()
+        added = store.rebuild(args.db)
+        print(f"Rebuilt from {added} decisions in {time.perf_counter() - started:.1f}s")
+    print(json.dumps(store.get_stats(), indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
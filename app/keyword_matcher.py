@@ -0,0 +1,147 @@
+# keyword_matcher.py - Aho-Corasick keyword matching (case-folded, word boundaries)
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# Champs texte scannés par défaut ; 'keywords' (mots-clés TMDB) est une liste
+TEXT_FIELDS = ('title', 'original_title', 'overview')
+LIST_FIELDS = ('keywords',)
+
+# Titres seuls : pour les listes de rejet (CAM, LEAK...) un synopsis qui
+# contient "leak" ou "cam" ne doit pas suffire à rejeter
+TITLE_FIELDS = ('title', 'original_title')
+
+# Séparateur entre champs : jamais un caractère de mot, donc une frontière
+SEPARATOR = '\n'
+
+
+class KeywordHit(NamedTuple):
+    keyword: str   # keyword as written in config.yaml
+    field: str     # title / original_title / overview / keywords
+    start: int     # offset in the (case-folded) field
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a fixed keyword list.
+
+    Built once from config; a scan is a single pass over the text whatever
+    the number of keywords. Matching is case-insensitive (``str.casefold``)
+    and a hit must start and end on a word boundary, so ``CAM`` matches
+    "Cam rip" but not "Cameron".
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: Tuple[str, ...] = tuple(
+            dict.fromkeys(str(k).strip() for k in keywords or [] if str(k).strip())
+        )
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._lengths: List[int] = []
+        self._build()
+
+    def _build(self):
+        outputs: List[List[int]] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            folded = keyword.casefold()
+            self._lengths.append(len(folded))
+            state = 0
+            for char in folded:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # Liens d'échec en largeur (BFS), sorties héritées du suffixe
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                outputs[nxt].extend(outputs[self._fail[nxt]])
+        self._out = [tuple(out) for out in outputs]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
+
+    def _scan(self, text: str) -> Iterable[Tuple[int, int]]:
+        """(keyword index, start offset) of every bounded hit in folded text"""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        last = len(text) - 1
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            for index in out[state]:
+                start = position - lengths[index] + 1
+                keyword = self.keywords[index]
+                if _is_word_char(keyword[0]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(keyword[-1]) and position < last and _is_word_char(text[position + 1]):
+                    continue
+                yield index, start
+
+    def find_all(self, text: str) -> List[KeywordHit]:
+        """Every keyword occurrence in a single string"""
+        if not self.keywords or not text:
+            return []
+        return [KeywordHit(self.keywords[i], 'text', start) for i, start in self._scan(text.casefold())]
+
+    def scan(self, request_data: Dict[str, Any], text_fields: Sequence[str] = TEXT_FIELDS,
+             list_fields: Sequence[str] = LIST_FIELDS) -> List[KeywordHit]:
+        """Every hit across the request's text fields and TMDB keywords, in one pass"""
+        if not self.keywords:
+            return []
+
+        parts, bounds = [], []
+        offset = 0
+        for field in text_fields:
+            value = request_data.get(field)
+            if value:
+                parts.append((field, str(value)))
+        for field in list_fields:
+            for value in request_data.get(field) or []:
+                if value:
+                    parts.append((field, str(value)))
+        if not parts:
+            return []
+
+        chunks = []
+        for field, value in parts:
+            folded = value.casefold()
+            bounds.append((offset, offset + len(folded), field))
+            chunks.append(folded)
+            offset += len(folded) + len(SEPARATOR)
+        text = SEPARATOR.join(chunks)
+
+        hits = []
+        part = 0
+        for index, start in self._scan(text):
+            while start >= bounds[part][1]:
+                part += 1
+            part_start, _, field = bounds[part]
+            hits.append(KeywordHit(self.keywords[index], field, start - part_start))
+        return hits
+
+    @staticmethod
+    def matched_keywords(hits: Iterable[KeywordHit]) -> List[str]:
+        """Distinct keywords of a hit list, in order of first appearance"""
+        return list(dict.fromkeys(hit.keyword for hit in hits))
@@ -0,0 +1,147 @@
+# library_index.py - Local index of media already in the library (auto_reject.duplicate_check)
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.db import shared
+
+
+# Overseerr MediaStatus
+PARTIALLY_AVAILABLE = 4
+AVAILABLE = 5
+STATUS_NAMES = {PARTIALLY_AVAILABLE: 'partially_available', AVAILABLE: 'available'}
+
+
+class LibraryIndex:
+    """tmdb/tvdb ids of available media, bulk-synced from Overseerr.
+
+    The sync pages through ``/api/v1/media`` and replaces the ``library_media``
+    table in one transaction; lookups hit in-memory dicts that are swapped as
+    a whole afterwards, so the pre-check never waits on SQLite or the network.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._tmdb: Dict[tuple, int] = {}
+        self._tvdb: Dict[int, int] = {}
+        self.last_sync: Optional[Dict[str, Any]] = None
+        self.init_database()
+        self.load()
+
+    def init_database(self):
+        conn = shared(self.db_path).connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS library_media (
+                media_type TEXT NOT NULL,
+                tmdb_id INTEGER NOT NULL,
+                tvdb_id INTEGER,
+                status INTEGER NOT NULL,
+                synced_at DATETIME,
+                PRIMARY KEY (media_type, tmdb_id)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_library_media_tvdb ON library_media(tvdb_id)")
+        conn.commit()
+        conn.close()
+
+    def load(self) -> int:
+        conn = shared(self.db_path).connect()
+        try:
+            rows = conn.execute("SELECT media_type, tmdb_id, tvdb_id, status FROM library_media").fetchall()
+        finally:
+            conn.close()
+        self._swap(rows)
+        return len(rows)
+
+    def _swap(self, rows):
+        tmdb = {(media_type, tmdb_id): status for media_type, tmdb_id, _, status in rows}
+        tvdb = {tvdb_id: status for _, _, tvdb_id, status in rows if tvdb_id}
+        with self._lock:
+            self._tmdb, self._tvdb = tmdb, tvdb
+
+    # ----- lookups -----
+
+    def status(self, media_type: str, tmdb_id: Optional[int] = None,
+               tvdb_id: Optional[int] = None) -> Optional[int]:
+        """Library status of a title (None = not in the library)"""
+        status = self._tmdb.get((media_type, tmdb_id)) if tmdb_id else None
+        if status is None and tvdb_id and media_type == 'tv':
+            status = self._tvdb.get(tvdb_id)
+        return status
+
+    def is_duplicate(self, media_type: str, tmdb_id: Optional[int] = None,
+                     tvdb_id: Optional[int] = None) -> bool:
+        """Fully available only: requesting missing seasons of a partial show is legit"""
+        return self.status(media_type, tmdb_id, tvdb_id) == AVAILABLE
+
+    # ----- sync -----
+
+    def sync(self, base_url: str, api_key: str, page_size: int = 100,
+             http_client: Optional[httpx.Client] = None) -> Dict[str, Any]:
+        """Replace the index with Overseerr's available / partially available media"""
+        started = time.perf_counter()
+        client = http_client or httpx.Client(timeout=30.0)
+        rows = {}
+        pages = 0
+        try:
+            skip = 0
+            while True:
+                response = client.get(
+                    f"{base_url}/api/v1/media",
+                    headers={"X-Api-Key": api_key},
+                    params={"take": page_size, "skip": skip, "filter": "allavailable"},
+                )
+                response.raise_for_status()
+                data = response.json()
+                results = data.get('results', [])
+                pages += 1
+                for media in results:
+                    status = media.get('status')
+                    tmdb_id = media.get('tmdbId')
+                    if status not in STATUS_NAMES or not tmdb_id:
+                        continue
+                    media_type = 'tv' if media.get('mediaType') == 'tv' else 'movie'
+                    rows[(media_type, tmdb_id)] = (media_type, tmdb_id, media.get('tvdbId'), status)
+                skip += len(results)
+                total = (data.get('pageInfo') or {}).get('results')
+                if len(results) < page_size or (total is not None and skip >= total):
+                    break
+        finally:
+            if http_client is None:
+                client.close()
+
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        conn = shared(self.db_path).connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM library_media")
+                conn.executemany("""
+                    INSERT INTO library_media (media_type, tmdb_id, tvdb_id, status, synced_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [row + (now,) for row in rows.values()])
+        finally:
+            conn.close()
+        self._swap(list(rows.values()))
+
+        self.last_sync = {
+            'synced_at': now,
+            'pages': pages,
+            'media': len(rows),
+            'available': sum(1 for row in rows.values() if row[3] == AVAILABLE),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+        print(f"📚 Library index synced: {len(rows)} media in {pages} page(s)")
+        return self.last_sync
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = list(self._tmdb.values())
+        return {
+            'media': len(statuses),
+            **{name: statuses.count(status) for status, name in STATUS_NAMES.items()},
+            'last_sync': self.last_sync,
+        }
@@ -7,6 +7,9 @@ from datetime import datetime, timedelta
 import sqlite3
 from pathlib import Path
 import json
+import asyncio
+import threading
+import yaml
 
 # ===== CONFIGURATION GLOBALE (EN PREMIER) =====
 # 🆕 Définir TOUTES les variables AVANT les imports de modules
@@ -17,6 +20,7 @@ OVERSEERR_API_KEY = os.getenv("OVERSEERR_API_KEY", "")
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "")
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # 🆕 Optionnel pour sécuriser le webhook
 DB_PATH = "/config/moderation.db"
+FEATURES_PATH = "/config/features.bin"
 
 # Validation des variables requises
 if not OVERSEERR_API_KEY:
@@ -40,10 +44,22 @@ print(f"💾 Database Path: {DB_PATH}")
 print(f"{'='*60}\n")
 
 # ✨ IMPORTS - Système AI-First (APRÈS la config)
-from app.config_loader import ConfigManager, SmartModerator, ModerationDecision
+from app.config_loader import ConfigManager, SmartModerator, ModerationDecision, validate_config
 from app.ml_feedback import FeedbackDatabase, EnhancedModerator
-from app.openai_moderator import OpenAIModerator
+from app.openai_moderator import OpenAIModerator, model_cost
 from app.rules_validator import RulesValidator
+from app.similarity import SimilarityIndex, is_content_decision
+from app.speculative import STABLE_FIELDS, SpeculativeAI
+from app.budget import TokenBudgetGovernor
+from app.replay import replay as replay_decisions
+from app.rule_metrics import RuleMetrics
+from app.trust import TrustTiers
+from app.pending_quota import PendingQuota, account_age_days
+from app.library_index import LibraryIndex
+from app.processed_requests import ProcessedRequests
+from app.feature_store import FeatureStore
+from app.db import close_all as close_databases, shared as shared_database
+from app.migrations import migrate
 
 # ===== INITIALISATION FASTAPI =====
 app = FastAPI(title="PlexStaffAI", version="1.6.0")
@@ -61,6 +77,9 @@ moderator = EnhancedModerator(config, feedback_db)
 # Rules Validator (TOUJOURS actif)
 rules_validator = RulesValidator(config)
 
+# 🆕 Trust tiers (ai_rules.user_trust_levels), cache mémoire de user_stats
+trust_tiers = TrustTiers(config, feedback_db)
+
 # 🆕 OpenAI Moderator (FACULTATIF)
 openai_moderator = None
 if OPENAI_ENABLED and OPENAI_API_KEY:
@@ -74,12 +93,53 @@ if OPENAI_ENABLED and OPENAI_API_KEY:
 else:
     print("ℹ️  OpenAI moderation disabled (Rules-Only mode)")
 
+# 🆕 Budget governor (tokens OpenAI par heure / jour glissants)
+budget_governor = TokenBudgetGovernor(config, DB_PATH)
+if openai_moderator:
+    openai_moderator.usage_callback = budget_governor.record
+
+# 🆕 Speculative AI calls (performance.speculative_ai)
+speculative_ai = SpeculativeAI(max_workers=config.get('performance.speculative_ai.max_workers', 4))
+speculative_ai.waste_callback = budget_governor.record_speculative_waste
+
+# 🆕 Compteurs par règle + timings échantillonnés par phase (metrics)
+rule_metrics = RuleMetrics(
+    DB_PATH,
+    sample_rate=config.get('metrics.timing_sample_rate', 0.1),
+    flush_interval=config.get('metrics.flush_interval_seconds', 300),
+)
+
+
+def apply_metrics_config(cfg: ConfigManager):
+    rule_metrics.sample_rate = float(cfg.get('metrics.timing_sample_rate', 0.1))
+
+
+def apply_ml_config(cfg: ConfigManager):
+    feedback_db.configure(
+        int(cfg.get('machine_learning.retrain_threshold', 100)),
+        float(cfg.get('machine_learning.retrain_interval_minutes', 60)) * 60,
+    )
+    feedback_db.naive_bayes.alpha = float(cfg.get('machine_learning.naive_bayes.alpha', 1.0))
+    feedback_db.naive_bayes.min_samples = int(cfg.get('machine_learning.naive_bayes.min_samples', 30))
+
+
+# 🆕 Hot-reload de config.yaml : règles et automates recompilés à chaque snapshot
+config.subscribe(rules_validator.recompile)
+config.subscribe(moderator.smart_moderator.recompile)
+config.subscribe(apply_metrics_config)
+config.subscribe(apply_ml_config)
+apply_ml_config(config)
+
 print("✅ PlexStaffAI initialization complete\n")
 
 
+# Connexions SQLite partagées (une par thread, WAL) pour moderation.db
+moderation_db = shared_database(DB_PATH)
+
+
 def init_db():
     """Initialize database with all tables"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     # Decisions table (historique)
@@ -95,7 +155,8 @@ def init_db():
             confidence REAL DEFAULT 1.0,
             rule_matched TEXT DEFAULT 'legacy',
             request_data JSON,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            config_version INTEGER               -- version du snapshot config.yaml
         )
     """)
     
@@ -131,6 +192,13 @@ def init_db():
         except:
             pass
     
+    if 'config_version' not in existing_columns:
+        try:
+            cursor.execute("ALTER TABLE decisions ADD COLUMN config_version INTEGER")
+            print("✅ Added config_version column to decisions table")
+        except:
+            pass
+    
     # Pending reviews table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS pending_reviews (
@@ -175,10 +243,62 @@ def init_db():
     
     conn.commit()
     conn.close()
+    
+    # Migrations versionnées (PRAGMA user_version) : index des requêtes chaudes
+    migrate(moderation_db.connection())
 
 
 init_db()
 
+# 🆕 Compteur de reviews en attente par utilisateur (max_pending_requests)
+pending_quota = PendingQuota(DB_PATH)
+
+# 🆕 request_ids déjà décidés (dédoublonnage webhook sans relire tout l'historique)
+processed_requests = ProcessedRequests(DB_PATH)
+print(f"🗂️  Processed requests: {processed_requests.get_stats()['requests']} loaded")
+
+# 🆕 Index local de la bibliothèque (auto_reject.duplicate_check)
+library_index = LibraryIndex(DB_PATH)
+print(f"📚 Library index: {library_index.load()} media loaded")
+
+# 🆕 Similarity index (réutilise les décisions de quasi-doublons)
+similarity_index = SimilarityIndex(dimensions=config.get('similarity.dimensions', 2048))
+if config.get('similarity.enabled', True):
+    print(f"🔎 Similarity index: {similarity_index.load_from_db(DB_PATH)} past decisions indexed")
+
+
+# 🆕 Feature store : vecteur numérique fixe par décision (replay / batch sans json.loads)
+feature_store = FeatureStore(FEATURES_PATH)
+try:
+    _decision_rows = moderation_db.connection().execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+    # Fichier neuf, supprimé ou décalé (doublons purgés, crash entre commit et append)
+    if len(feature_store) != _decision_rows:
+        print(f"🧮 Feature store: rebuilding from {_decision_rows} decisions...")
+        feature_store.rebuild(DB_PATH)
+    print(f"🧮 Feature store: {len(feature_store)} records")
+except Exception as e:
+    print(f"⚠️  Feature store rebuild failed: {e}")
+
+
+def index_decision(request_id: int, request_data: dict, decision: str, confidence: float,
+                   rule_matched: str, title: str = None, media_type: str = None):
+    """Ajoute une décision sauvegardée aux requêtes traitées, au feature store et à l'index de similarité"""
+    processed_requests.add(request_id)
+    try:
+        feature_store.append(request_id, request_data, decision, confidence, rule_matched)
+    except Exception as e:
+        print(f"⚠️  Feature store append failed: {e}")
+    if not config.get('similarity.enabled', True):
+        return
+    if not is_content_decision(rule_matched):
+        # La dernière décision (staff, bibliothèque...) remplace l'ancien voisin
+        similarity_index.remove(request_id)
+        return
+    try:
+        similarity_index.add(request_id, request_data, decision, confidence, title, media_type)
+    except Exception as e:
+        print(f"⚠️  Similarity index update failed: {e}")
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -266,7 +386,7 @@ def decline_overseerr_request(request_id: int) -> bool:
 
 def cleanup_stale_reviews():
     """Remove reviews for requests that no longer exist in Overseerr"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -276,8 +396,9 @@ def cleanup_stale_reviews():
     """)
     
     reviews = cursor.fetchall()
-    removed = 0
+    stale = []
     
+    # Appels Overseerr hors transaction : les écritures ne sont pas bloquées pendant ce temps
     for review_id, request_id, title in reviews:
         # Vérifie si la requête existe dans Overseerr
         try:
@@ -289,21 +410,23 @@ def cleanup_stale_reviews():
             
             if response.status_code == 404:
                 # Requête n'existe plus, supprimer la review
-                cursor.execute("""
-                    UPDATE pending_reviews 
-                    SET status = 'stale' 
-                    WHERE id = ?
-                """, (review_id,))
-                removed += 1
+                stale.append((review_id,))
                 print(f"🗑️  Removed stale review #{review_id}: {title} (request {request_id} no longer exists)")
                 
         except Exception as e:
             print(f"⚠️  Error checking request {request_id}: {e}")
     
-    conn.commit()
+    with conn:
+        cursor.executemany("""
+            UPDATE pending_reviews 
+            SET status = 'stale' 
+            WHERE id = ?
+        """, stale)
     conn.close()
+    removed = len(stale)
     
     if removed > 0:
+        pending_quota.load()
         print(f"🧹 Cleaned up {removed} stale review(s)")
     
     return removed
@@ -316,13 +439,6 @@ async def cleanup_reviews_endpoint():
     return {"removed": removed, "message": f"Cleaned up {removed} stale reviews"}
 
 
-# Appeler automatiquement au démarrage
-@app.on_event("startup")
-async def startup_cleanup():
-    """Cleanup stale reviews on startup"""
-    print("🧹 Cleaning up stale reviews...")
-    cleanup_stale_reviews()
-
 def enrich_from_tmdb(tmdb_id: int, media_type: str) -> dict:
     """Enrichit les données depuis TMDB API si disponible"""
     if not TMDB_API_KEY:
@@ -334,7 +450,7 @@ def enrich_from_tmdb(tmdb_id: int, media_type: str) -> dict:
         
         response = httpx.get(
             endpoint,
-            params={"api_key": TMDB_API_KEY, "language": "fr-FR"},
+            params={"api_key": TMDB_API_KEY, "language": "fr-FR", "append_to_response": "keywords"},
             timeout=5.0
         )
         response.raise_for_status()
@@ -354,6 +470,11 @@ def enrich_from_tmdb(tmdb_id: int, media_type: str) -> dict:
             'season_count': data.get('number_of_seasons', 0),
             'seasons': data.get('seasons', []),
             'status': data.get('status', ''),
+            # Films : keywords.keywords, séries : keywords.results
+            'keywords': [
+                k.get('name', '') for k in
+                (data.get('keywords') or {}).get('keywords', (data.get('keywords') or {}).get('results', []))
+            ],
         }
     except Exception as e:
         print(f"❌ TMDB enrichment failed: {e}")
@@ -388,6 +509,9 @@ def run_moderation(request_id: int, request_details: dict, extracted_info: dict
     Overseerr's polling API and webhook payloads use different field names;
     normalize both forms here so every entry point follows the same path.
     """
+    # Un seul snapshot de config.yaml pour toute la requête : un hot reload
+    # en cours de route ne mélange pas deux versions des règles / seuils.
+    cfg = config.snapshot()
     try:
         request_obj = request_details.get('request') or request_details
         media = request_details.get('media') or request_obj.get('media') or {}
@@ -409,17 +533,7 @@ def run_moderation(request_id: int, request_details: dict, extracted_info: dict
             tmdb_id = int(tmdb_id) if tmdb_id else None
         except (TypeError, ValueError):
             tmdb_id = None
-        tmdb_data = enrich_from_tmdb(tmdb_id, media_type) if tmdb_id else {}
-
-        title = (
-            (extracted_info or {}).get('title')
-            or media.get('title')
-            or media.get('name')
-            or tmdb_data.get('title')
-            or tmdb_data.get('original_title')
-            or request_details.get('subject')
-            or f'Request #{request_id}'
-        )
+        tvdb_id = media.get('tvdbId') or media.get('tvdb_id')
         username = (
             (extracted_info or {}).get('username')
             or request_obj.get('requestedBy_username')
@@ -428,28 +542,124 @@ def run_moderation(request_id: int, request_details: dict, extracted_info: dict
             or 'Unknown'
         )
 
-        moderation_data = {
-            **tmdb_data,
-            'title': title,
-            'media_type': media_type,
-            'requested_by': username,
-            'user_id': requested_by.get('id') or request_obj.get('requestedById'),
-            # Missing account age must not accidentally classify a user as new.
-            'user_age_days': request_details.get('user_age_days', 999),
-            'genres': tmdb_data.get('genres') or media.get('genres') or [],
-            'rating': tmdb_data.get('rating', media.get('voteAverage', 0)),
-            'popularity': tmdb_data.get('popularity', media.get('popularity', 0)),
-            'year': tmdb_data.get('year') or str(media.get('releaseDate') or '')[:4],
-            'episode_count': tmdb_data.get('episode_count', 0),
-            'season_count': tmdb_data.get('season_count', 0),
-        }
+        # Missing account age must not accidentally classify a user as new.
+        user_age_days = request_details.get('user_age_days')
+        if user_age_days is None:
+            user_age_days = account_age_days(requested_by.get('createdAt'))
+        if user_age_days is None:
+            user_age_days = 999
+
+        # 🆕 Quota de reviews en attente (nouveaux utilisateurs) : vérifié en
+        # mémoire avant TMDB / OpenAI. La requête reste en attente dans Overseerr
+        # et sera reprise au prochain passage une fois des reviews traitées.
+        over_quota = pending_quota.check(username, user_age_days, cfg)
+        if over_quota:
+            reason = (
+                f"New user {username} already has {over_quota['pending']} pending review(s) "
+                f"(max {over_quota['limit']}), deferred"
+            )
+            print(f"⏸️  #{request_id}: {reason}")
+            return {'decision': 'DEFERRED', 'reason': reason, 'rule_matched': 'max_pending_requests',
+                    'saved': False, **over_quota}
+
+        # 🆕 Trust tier : lecture en mémoire, avant tout enrichissement / appel AI.
+        # Les webhooks n'ont que requestedBy_username : repli sur le nom, et sans
+        # identité du tout ni tier ni stats (plus de ligne 'None' partagée).
+        requester_id = requested_by.get('id') or request_obj.get('requestedById')
+        trust_tiers.remember(requester_id, username)
+        stats_key = trust_tiers.key(requester_id, username if username != 'Unknown' else None)
+        tier = trust_tiers.tier(stats_key, cfg)
+        rules_only = trust_tiers.rules_only(tier, cfg)
+        trust_path = False
+
+        # 🆕 Déjà dans la bibliothèque : rejet sans TMDB ni OpenAI (index en mémoire)
+        in_library = (
+            cfg.get('ai_rules.auto_reject.duplicate_check', False)
+            and not trust_tiers.benefits(tier, cfg).get('skip_duplicate_check')
+            and library_index.is_duplicate(media_type, tmdb_id, tvdb_id)
+        )
+
+        def build_moderation_data(tmdb_data: dict) -> dict:
+            title = (
+                (extracted_info or {}).get('title')
+                or media.get('title')
+                or media.get('name')
+                or tmdb_data.get('title')
+                or tmdb_data.get('original_title')
+                or request_details.get('subject')
+                or f'Request #{request_id}'
+            )
+            return {
+                **tmdb_data,
+                'title': title,
+                'media_type': media_type,
+                'requested_by': username,
+                'user_id': requester_id,
+                'user_age_days': user_age_days,
+                'genres': tmdb_data.get('genres') or media.get('genres') or [],
+                'rating': tmdb_data.get('rating', media.get('voteAverage', 0)),
+                'popularity': tmdb_data.get('popularity', media.get('popularity', 0)),
+                'year': tmdb_data.get('year') or str(media.get('releaseDate') or '')[:4],
+                'episode_count': tmdb_data.get('episode_count', 0),
+                'season_count': tmdb_data.get('season_count', 0),
+            }
+
+        # 🆕 Speculative mode: start OpenAI as soon as the minimum fields are
+        # known from the payload, overlapping TMDB enrichment and the pre-check.
+        # Only when enrichment cannot make the verdict stale: TMDB will not run,
+        # or the payload already has every field TMDB would fill in.
+        speculation = None
+        if (openai_moderator and not rules_only and not in_library and cfg.get('performance.speculative_ai.enabled', False)
+                and budget_governor.speculation_allowed(cfg)):
+            early_data = build_moderation_data({})
+            min_fields = cfg.get('performance.speculative_ai.min_fields', ['title', 'rating', 'genres'])
+            if speculative_ai.has_fields(early_data, min_fields):
+                if not (TMDB_API_KEY and tmdb_id):
+                    speculation = speculative_ai.start(openai_moderator, early_data)
+                elif speculative_ai.is_complete(early_data):
+                    speculation = speculative_ai.start(openai_moderator, early_data, compare_fields=STABLE_FIELDS)
+                else:
+                    speculative_ai.skip()
+
+        with rule_metrics.timed('enrichment'):
+            tmdb_data = enrich_from_tmdb(tmdb_id, media_type) if tmdb_id and not in_library else {}
+        moderation_data = build_moderation_data(tmdb_data)
+        title = moderation_data['title']
 
         # Clear allow/deny cases bypass OpenAI to save cost and latency.
-        precheck = rules_validator.validate(
-            {'decision': 'PENDING', 'confidence': 0.5, 'reason': 'Rules pre-check'},
-            moderation_data,
-        )
-        if precheck['final_decision'] != 'PENDING':
+        with rule_metrics.timed('precheck'):
+            precheck = rules_validator.validate(
+                {'decision': 'PENDING', 'confidence': 0.5, 'reason': 'Rules pre-check'},
+                moderation_data,
+                plan=rules_validator.plan_for(cfg),
+            )
+        rule_metrics.record_validation(precheck, saved_call=openai_moderator is not None)
+        # Near-duplicates of already-decided content reuse that decision.
+        neighbour = None
+        if precheck['final_decision'] == 'PENDING' and not in_library and cfg.get('similarity.enabled', True):
+            with rule_metrics.timed('similarity'):
+                neighbour = similarity_index.find_reusable(
+                    moderation_data,
+                    min_similarity=cfg.get('similarity.min_similarity', 0.9),
+                    min_confidence=cfg.get('similarity.min_confidence', 0.85),
+                    request_id=request_id,
+                )
+
+        if speculation is not None and (precheck['final_decision'] != 'PENDING' or neighbour):
+            speculative_ai.discard(speculation)
+            speculation = None
+
+        if in_library:
+            result = {
+                'decision': 'REJECTED',
+                'confidence': 0.99,
+                'reason': 'Already available in the library',
+                'rule_matched': 'auto_reject.duplicate_check',
+                'source': 'library_index',
+            }
+            rule_metrics.record('library_index', 'auto_reject.duplicate_check', override=True,
+                                saved_call=openai_moderator is not None)
+        elif precheck['final_decision'] != 'PENDING':
             result = {
                 'decision': precheck['final_decision'],
                 'confidence': precheck['final_confidence'],
@@ -457,18 +667,63 @@ def run_moderation(request_id: int, request_details: dict, extracted_info: dict
                 'rule_matched': ', '.join(precheck['rules_matched']) or 'strict_rule',
                 'source': 'strict_rules',
             }
-        elif openai_moderator:
-            ai_result = openai_moderator.moderate(moderation_data)
-            validated = rules_validator.validate(ai_result, moderation_data)
+        elif neighbour:
             result = {
-                'decision': validated['final_decision'],
-                'confidence': validated['final_confidence'],
-                'reason': validated['final_reason'],
-                'rule_matched': ', '.join(validated['rules_matched']) or 'openai',
-                'source': 'openai',
+                'decision': neighbour['decision'],
+                'confidence': round(neighbour['confidence'] * neighbour['similarity'], 3),
+                'reason': (
+                    f"Near-duplicate of '{neighbour['title']}' (#{neighbour['request_id']}, "
+                    f"similarity {neighbour['similarity']:.0%}), previously {neighbour['decision']}"
+                ),
+                'rule_matched': f"similarity:#{neighbour['request_id']} ({neighbour['similarity']:.2f})",
+                'source': 'similarity',
             }
+        elif rules_only:
+            # Utilisateur trusted/veteran : règles seules + avantages du niveau, sans OpenAI
+            with rule_metrics.timed('local_rules'):
+                result = trust_tiers.resolve(tier, moderation_data, moderator, cfg)
+            rule_metrics.record_local(result, saved_call=openai_moderator is not None)
+            trust_path = True
+        elif openai_moderator:
+            # Budget running low: keep a confident enough local decision, use
+            # the cheaper model, and finally stop calling OpenAI at all.
+            budget = budget_governor.plan(cfg)
+            local_result = None
+            if budget['stage'] != TokenBudgetGovernor.NORMAL:
+                with rule_metrics.timed('local_rules'):
+                    local_result = moderator.moderate_with_learning(moderation_data, cfg)
+
+            if local_result and local_result['confidence'] >= budget['confidence_bar']:
+                rule_metrics.record_local(local_result, saved_call=True)
+                speculative_ai.discard(speculation)
+                print(f"💸 Budget {budget['stage']} ({budget['remaining']:.0%} left): local decision kept")
+                local_rule = local_result.get('rule_matched') or local_result.get('source', 'rules_only')
+                result = {
+                    **local_result,
+                    'rule_matched': f"{local_rule} (budget:{budget['stage']})",
+                }
+            else:
+                if local_result:
+                    rule_metrics.record_local(local_result)
+                with rule_metrics.timed('openai'):
+                    ai_result = speculative_ai.resolve(speculation, moderation_data)
+                    if ai_result is None:
+                        ai_result = openai_moderator.moderate(moderation_data, model=budget['model'])
+                # Post-AI: réutilise les faits du pre-check (règles évaluées une seule fois)
+                with rule_metrics.timed('post_ai'):
+                    validated = rules_validator.validate(ai_result, moderation_data, facts=precheck['facts'])
+                rule_metrics.record_validation(validated)
+                result = {
+                    'decision': validated['final_decision'],
+                    'confidence': validated['final_confidence'],
+                    'reason': validated['final_reason'],
+                    'rule_matched': ', '.join(validated['rules_matched']) or 'openai',
+                    'source': 'openai',
+                }
         else:
-            result = moderator.moderate_with_learning(moderation_data)
+            with rule_metrics.timed('local_rules'):
+                result = moderator.moderate_with_learning(moderation_data, cfg)
+            rule_metrics.record_local(result)
 
         decision = result['decision']
         reason = result['reason']
@@ -497,7 +752,14 @@ def run_moderation(request_id: int, request_details: dict, extracted_info: dict
         save_decision(
             request_id, decision, reason, confidence, rule_matched,
             moderation_data, title, username, media_type,
+            # Version du snapshot avec lequel la requête a été modérée
+            config_version=cfg.version,
         )
+        # Stats utilisateur (et cache des trust tiers) à chaque décision finale ;
+        # les NEEDS_REVIEW sont comptés quand le staff tranche. Une approbation
+        # décidée par le tier lui-même ne compte pas pour la promotion.
+        if decision in ('APPROVED', 'REJECTED') and stats_key is not None:
+            feedback_db.update_user_stats(stats_key, username, decision, count_approval=not trust_path)
         print(f"Decision #{request_id}: {decision} ({rule_matched})")
         return {
             **result,
@@ -516,7 +778,7 @@ def save_for_review(request_id: int, enriched_data: dict, ai_result: dict,
                     title: str, username: str, media_type: str):
     """Sauvegarde une requête pour révision manuelle"""
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     # Extraire les données avec fallback
@@ -543,6 +805,7 @@ def save_for_review(request_id: int, enriched_data: dict, ai_result: dict,
         ))
         
         conn.commit()
+        pending_quota.refresh([final_username])
         print(f"💾 Saved to pending_reviews: {final_title} by {final_username}")
         
     except Exception as e:
@@ -558,7 +821,7 @@ def save_decision(request_id: int, decision: str, reason: str,
                   title: str, username: str, media_type: str):  # 🆕 params
     """Sauvegarde la décision dans l'historique"""
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -585,36 +848,12 @@ def save_decision(request_id: int, decision: str, reason: str,
     print(f"💾 Saved to decisions: {title} by {username} → {decision}")
 
 
-def get_processed_request_ids() -> set:
-    """
-    Récupère les IDs de requêtes déjà traitées depuis la DB
-    
-    Returns:
-        Set d'IDs de requêtes (pour lookup O(1) rapide)
-    """
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Récupérer tous les request_id déjà dans decisions
-        cursor.execute("SELECT DISTINCT request_id FROM decisions")
-        
-        processed_ids = {row[0] for row in cursor.fetchall()}
-        
-        conn.close()
-        
-        return processed_ids
-        
-    except Exception as e:
-        print(f"⚠️  Error loading processed IDs: {e}")
-        return set()
-
 def save_decision(request_id: int, decision: str, reason: str, confidence: float, 
                   rule_matched: str, request_data: dict, title: str = None, 
-                  username: str = None, media_type: str = None):
+                  username: str = None, media_type: str = None, config_version: int = None):
     """Save moderation decision to database (avec protection anti-doublon)"""
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     # 🆕 Vérifier si déjà traité récemment (dernières 5 minutes)
@@ -677,8 +916,8 @@ def save_decision(request_id: int, decision: str, reason: str, confidence: float
         cursor.execute("""
             INSERT INTO decisions 
             (request_id, title, username, media_type, decision, reason, 
-             confidence, rule_matched, request_data, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             confidence, rule_matched, request_data, timestamp, config_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             request_id,
             title,
@@ -689,11 +928,13 @@ def save_decision(request_id: int, decision: str, reason: str, confidence: float
             confidence,
             rule_matched,
             json.dumps(request_data),
-            datetime.now().isoformat()
+            datetime.now().isoformat(),
+            config_version if config_version is not None else config.version
         ))
         
         conn.commit()
         print(f"💾 Saved to decisions: {title} by {username} → {decision}")
+        index_decision(request_id, request_data, decision, confidence, rule_matched, title, media_type)
         
     except sqlite3.IntegrityError as e:
         print(f"⚠️  Database constraint error (possible duplicate): {e}")
@@ -752,8 +993,7 @@ async def overseerr_webhook(request: Request, background_tasks: BackgroundTasks)
         request_id = int(request_id)
         print(f"🎯 REQUEST_ID EXTRACTED: {request_id}")
         
-        already_processed = get_processed_request_ids()
-        if request_id in already_processed:
+        if processed_requests.contains(request_id):
             print(f"⏭️  Request #{request_id} already processed, skipping")
             return {"status": "skipped", "request_id": request_id, "reason": "already_processed"}
         
@@ -819,7 +1059,7 @@ def process_webhook_request(request_id: int, webhook_payload: dict):
 def save_pending_review(request_id: int, title: str, username: str, media_type: str, payload: dict):
     """Save to pending_reviews with populated fields"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = moderation_db.connect()
         cursor = conn.cursor()
         
         # Delete existing
@@ -843,6 +1083,7 @@ def save_pending_review(request_id: int, title: str, username: str, media_type:
         ))
         
         conn.commit()  # ✅ CRITICAL: Commit the transaction
+        pending_quota.refresh([username])
         print(f"💾 SAVED #{request_id}: '{title}' by '{username}'")
         
     except Exception as e:
@@ -933,12 +1174,16 @@ async def manual_moderate_now(background_tasks: BackgroundTasks):
                 "processed": 0
             }
         
-        already_processed = get_processed_request_ids()
+        # Utilisateurs avec priority_processing (veterans) traités en premier
+        requests = sorted(
+            requests,
+            key=lambda r: trust_tiers.priority(trust_tiers.key((r.get('requestedBy') or {}).get('id')))
+        )
         
         pending_count = 0
         for req in requests:
             request_id = req.get('id')
-            if request_id not in already_processed:
+            if not processed_requests.contains(request_id):
                 background_tasks.add_task(process_webhook_request, request_id, req)
                 pending_count += 1
         
@@ -1126,7 +1371,7 @@ async def moderate_html():
 @app.get("/stats")
 async def stats():
     """Stats endpoint for dashboard"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     cursor.execute("SELECT decision, COUNT(*) FROM decisions GROUP BY decision")
@@ -1158,7 +1403,7 @@ async def stats():
 @app.get("/staff/report", response_class=HTMLResponse)
 async def staff_report_html():
     """Full report page with language support"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     # Stats globales
@@ -1328,7 +1573,7 @@ async def staff_report_html():
 @app.get("/history", response_class=HTMLResponse)
 async def history_html():
     """History page with decisions (no cache, fixed layout)"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     # Récupère les dernières décisions
@@ -1508,7 +1753,7 @@ async def history_html():
 @app.get("/api/history")
 async def history_data(filter: str = "all"):
     """API endpoint pour les données historique avec métadonnées complètes"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     
     if filter == "all":
@@ -1824,7 +2069,7 @@ async def health_check_html():
 @app.get("/review-dashboard", response_class=HTMLResponse)
 async def review_dashboard_html():
     """Review dashboard page with language support"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT id, request_id, request_data, ai_decision, ai_reason, ai_confidence, created_at
@@ -2003,7 +2248,7 @@ async def review_dashboard_html():
 @app.get("/staff/reviews")
 async def get_pending_reviews():
     """Get pending review requests"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     conn.row_factory = sqlite3.Row  # Pour accéder par nom de colonne
     cursor = conn.cursor()
     
@@ -2053,7 +2298,7 @@ async def get_pending_reviews():
 async def approve_review(review_id: int, request: Request = None):
     """Staff approve a NEEDS_REVIEW request"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = moderation_db.connect()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -2097,7 +2342,8 @@ async def approve_review(review_id: int, request: Request = None):
                     ai_decision=ai_decision,
                     human_decision='APPROVED',
                     human_reason='Staff approved',
-                    staff_username='admin'
+                    staff_username='admin',
+                    user_key=trust_tiers.key(request_data.get('user_id'), request_data.get('requested_by')),
                 )
             except Exception as e:
                 print(f"⚠️  Failed to record ML feedback: {e}")
@@ -2112,31 +2358,33 @@ async def approve_review(review_id: int, request: Request = None):
                 status_code=500
             )
         
-        # Update pending_reviews status
-        cursor.execute("""
-            UPDATE pending_reviews 
-            SET status = 'approved' 
-            WHERE id = ?
-        """, (review_id,))
-        
-        # 🆕 Save to decisions with title/username
-        cursor.execute("""
-            INSERT INTO decisions 
-            (request_id, title, username, media_type, decision, reason, 
-             confidence, rule_matched, request_data, timestamp)
-            VALUES (?, ?, ?, ?, 'APPROVED', 'Staff approved', 1.0, 
-                    'manual_staff', ?, ?)
-        """, (
-            request_id,
-            title,
-            username,
-            media_type,
-            json.dumps(request_data),
-            datetime.now().isoformat()
-        ))
+        # Commit ou rollback : la connexion partagée ne reste pas en transaction
+        with conn:
+            # Update pending_reviews status
+            cursor.execute("""
+                UPDATE pending_reviews 
+                SET status = 'approved' 
+                WHERE id = ?
+            """, (review_id,))
         
-        conn.commit()
+            # 🆕 Save to decisions with title/username
+            cursor.execute("""
+                INSERT INTO decisions 
+                (request_id, title, username, media_type, decision, reason, 
+                 confidence, rule_matched, request_data, timestamp)
+                VALUES (?, ?, ?, ?, 'APPROVED', 'Staff approved', 1.0, 
+                        'manual_staff', ?, ?)
+            """, (
+                request_id,
+                title,
+                username,
+                media_type,
+                json.dumps(request_data),
+                datetime.now().isoformat()
+            ))
         conn.close()
+        pending_quota.refresh([row['username']])
+        index_decision(request_id, request_data, 'APPROVED', 1.0, 'manual_staff', title, media_type)
         
         print(f"✅ Manual approval: {title} by {username}")
         
@@ -2170,7 +2418,7 @@ async def reject_review(review_id: int, request: Request = None):
         
         reason = body.get('reason', 'Staff rejected')
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = moderation_db.connect()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -2214,7 +2462,8 @@ async def reject_review(review_id: int, request: Request = None):
                     ai_decision=ai_decision,
                     human_decision='REJECTED',
                     human_reason=reason,
-                    staff_username='admin'
+                    staff_username='admin',
+                    user_key=trust_tiers.key(request_data.get('user_id'), request_data.get('requested_by')),
                 )
             except Exception as e:
                 print(f"⚠️  Failed to record ML feedback: {e}")
@@ -2229,32 +2478,34 @@ async def reject_review(review_id: int, request: Request = None):
                 status_code=500
             )
         
-        # Update pending_reviews status
-        cursor.execute("""
-            UPDATE pending_reviews 
-            SET status = 'rejected' 
-            WHERE id = ?
-        """, (review_id,))
-        
-        # 🆕 Save to decisions with title/username
-        cursor.execute("""
-            INSERT INTO decisions 
-            (request_id, title, username, media_type, decision, reason, 
-             confidence, rule_matched, request_data, timestamp)
-            VALUES (?, ?, ?, ?, 'REJECTED', ?, 1.0, 
-                    'manual_staff', ?, ?)
-        """, (
-            request_id,
-            title,
-            username,
-            media_type,
-            reason,
-            json.dumps(request_data),
-            datetime.now().isoformat()
-        ))
+        # Commit ou rollback : la connexion partagée ne reste pas en transaction
+        with conn:
+            # Update pending_reviews status
+            cursor.execute("""
+                UPDATE pending_reviews 
+                SET status = 'rejected' 
+                WHERE id = ?
+            """, (review_id,))
         
-        conn.commit()
+            # 🆕 Save to decisions with title/username
+            cursor.execute("""
+                INSERT INTO decisions 
+                (request_id, title, username, media_type, decision, reason, 
+                 confidence, rule_matched, request_data, timestamp)
+                VALUES (?, ?, ?, ?, 'REJECTED', ?, 1.0, 
+                        'manual_staff', ?, ?)
+            """, (
+                request_id,
+                title,
+                username,
+                media_type,
+                reason,
+                json.dumps(request_data),
+                datetime.now().isoformat()
+            ))
         conn.close()
+        pending_quota.refresh([row['username']])
+        index_decision(request_id, request_data, 'REJECTED', 1.0, 'manual_staff', title, media_type)
         
         print(f"❌ Manual rejection: {title} by {username}")
         
@@ -2277,7 +2528,7 @@ async def reject_review(review_id: int, request: Request = None):
 async def cleanup_duplicates():
     """Remove duplicate decisions (keep only the first one for each request_id)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = moderation_db.connect()
         cursor = conn.cursor()
         
         # Trouver les request_id avec doublons
@@ -2301,24 +2552,25 @@ async def cleanup_duplicates():
         
         total_removed = 0
         
-        for request_id, count in duplicates:
-            # Garder seulement le premier (plus ancien timestamp)
-            cursor.execute("""
-                DELETE FROM decisions
-                WHERE id NOT IN (
-                    SELECT MIN(id)
-                    FROM decisions
-                    WHERE request_id = ?
-                ) AND request_id = ?
-            """, (request_id, request_id))
+        with conn:
+            for request_id, count in duplicates:
+                # Garder seulement le premier (plus ancien timestamp)
+                cursor.execute("""
+                    DELETE FROM decisions
+                    WHERE id NOT IN (
+                        SELECT MIN(id)
+                        FROM decisions
+                        WHERE request_id = ?
+                    ) AND request_id = ?
+                """, (request_id, request_id))
             
-            removed = cursor.rowcount
-            total_removed += removed
+                removed = cursor.rowcount
+                total_removed += removed
             
-            print(f"🗑️  Request #{request_id}: Removed {removed} duplicate(s) (kept 1/{count})")
-        
-        conn.commit()
+                print(f"🗑️  Request #{request_id}: Removed {removed} duplicate(s) (kept 1/{count})")
         conn.close()
+        if total_removed:
+            feature_store.rebuild(DB_PATH)
         
         return {
             "duplicates_found": len(duplicates),
@@ -2338,7 +2590,7 @@ async def cleanup_duplicates():
 @app.get("/staff/pending-count")
 async def pending_count():
     """Count pending reviews"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = moderation_db.connect()
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM pending_reviews WHERE status = 'pending'")
     count = cursor.fetchone()[0]
@@ -2350,16 +2602,132 @@ async def pending_count():
 async def ml_stats():
     """ML system statistics"""
     feedback_count = feedback_db.get_feedback_count(unlearned_only=False)
-    unlearned = feedback_db.get_feedback_count(unlearned_only=True)
+    unlearned = feedback_db.unlearned_count
     
     return {
         'total_feedback': feedback_count,
         'unlearned': unlearned,
         'patterns_learned': feedback_count - unlearned,
-        'learning_threshold': 100
+        'learning_threshold': feedback_db.retrain_threshold,
+        'retrain_interval_minutes': feedback_db.retrain_interval / 60,
+        'last_training': feedback_db.last_training,
+        'naive_bayes': feedback_db.naive_bayes.get_stats(),
+        'trust_tiers': trust_tiers.get_stats(),
+        'pending_quota': pending_quota.get_stats(),
+        'processed_requests': processed_requests.get_stats(),
+        'feature_store': feature_store.get_stats()
     }
 
 
+@app.get("/staff/speculative-stats")
+async def speculative_stats():
+    """Speculative AI statistics (used vs wasted calls)"""
+    return {
+        'enabled': config.get('performance.speculative_ai.enabled', False),
+        'min_fields': config.get('performance.speculative_ai.min_fields', ['title', 'rating', 'genres']),
+        **speculative_ai.get_stats()
+    }
+
+
+@app.post("/admin/reload-config")
+async def reload_config():
+    """Force a config.yaml reload (the watcher does it on change)"""
+    reloaded = await asyncio.to_thread(config.reload, True)
+    return {'reloaded': reloaded, **config.get_state()}
+
+
+def sync_library() -> dict:
+    """Bulk sync of the library index from Overseerr (errors keep the old index)"""
+    try:
+        return library_index.sync(OVERSEERR_URL, OVERSEERR_API_KEY,
+                                  page_size=config.get('library_sync.page_size', 100))
+    except Exception as e:
+        print(f"❌ Library sync failed: {e}")
+        return {'error': str(e)}
+
+
+@app.get("/admin/library-sync")
+@app.post("/admin/library-sync")
+async def library_sync():
+    """Refresh the local library index (cron every hour)"""
+    result = await asyncio.to_thread(sync_library)
+    return {**result, 'index': library_index.get_stats()}
+
+
+@app.get("/staff/rule-metrics")
+async def rule_metrics_stats():
+    """Per-rule hits/overrides/adjustments, OpenAI spend saved and phase timings"""
+    # Coût moyen d'un appel : historique persisté (openai_usage), sinon session courante
+    calls = tokens = cost = 0
+    for model, model_calls, prompt_tokens, completion_tokens in budget_governor.usage_by_model():
+        calls += model_calls
+        tokens += (prompt_tokens or 0) + (completion_tokens or 0)
+        cost += model_cost(model, prompt_tokens or 0, completion_tokens or 0)
+    if not calls and openai_moderator:
+        usage = openai_moderator.get_usage_stats()
+        calls, tokens, cost = usage['total_calls'], usage['total_tokens'], usage['total_cost']
+
+    return rule_metrics.snapshot(
+        cost_per_call=cost / calls if calls else 0.0,
+        tokens_per_call=tokens / calls if calls else 0.0,
+    )
+
+
+@app.post("/staff/replay")
+async def staff_replay(request: Request):
+    """What-if: replay historic decisions through a candidate config.
+
+    Body: {"config_yaml": "<yaml>"} or {"config_path": "candidate.yaml"}
+    (a .yaml/.yml file inside the config directory), optional "chunk_size".
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+
+    try:
+        chunk_size = min(max(1, int(body.get('chunk_size', 5000))), 100000)
+    except (TypeError, ValueError):
+        return JSONResponse(content={'success': False, 'error': 'chunk_size must be an integer'}, status_code=400)
+
+    try:
+        if body.get('config_yaml'):
+            candidate_config, source = yaml.safe_load(body['config_yaml']), '<inline>'
+        elif body.get('config_path'):
+            # Seulement un YAML du dossier de config : pas de lecture de fichiers arbitraires
+            config_dir = config.config_path.parent.resolve()
+            path = (config_dir / str(body['config_path'])).resolve()
+            if path.parent != config_dir or path.suffix not in ('.yaml', '.yml') or not path.is_file():
+                return JSONResponse(
+                    content={'success': False, 'error': f'config_path must be a .yaml file in {config_dir}'},
+                    status_code=400
+                )
+            with open(path, 'r') as f:
+                candidate_config, source = yaml.safe_load(f), str(path)
+        else:
+            return JSONResponse(
+                content={'success': False, 'error': 'config_yaml or config_path is required'},
+                status_code=400
+            )
+    except yaml.YAMLError as e:
+        return JSONResponse(content={'success': False, 'error': f'Invalid YAML: {e}'}, status_code=400)
+
+    # Mêmes vérifications qu'un hot-reload : une erreur de saisie est un 400, pas un 500 au compile
+    errors = validate_config(candidate_config)
+    if errors:
+        return JSONResponse(content={'success': False, 'error': 'Invalid config', 'errors': errors}, status_code=400)
+    candidate = ConfigManager.from_dict(candidate_config, source=source)
+
+    # Lecture de tout l'historique : hors de la boucle d'événements
+    report = await asyncio.to_thread(
+        replay_decisions, candidate, config, DB_PATH, "/config/feedback.db",
+        chunk_size, FEATURES_PATH
+    )
+    return {'success': True, **report}
+
+
 @app.get("/staff/openai-stats", response_class=HTMLResponse)
 async def openai_stats_html():
     """OpenAI statistics page with language support"""
@@ -2389,6 +2757,59 @@ async def openai_stats_html():
     avg_cost = (total_cost / total_calls) if total_calls > 0 else 0
     avg_tokens = (total_tokens / total_calls) if total_calls > 0 else 0
     
+    # 🆕 Budget governor
+    budget = budget_governor.get_state()
+    budget_colors = {'normal': 'emerald', 'conserve': 'yellow', 'cheap': 'orange', 'exhausted': 'red'}
+    budget_color = budget_colors.get(budget['stage'], 'gray')
+
+    def budget_line(window: dict) -> str:
+        if not window['limit']:
+            return f"{window['used']:,} / ∞"
+        return f"{window['used']:,} / {window['limit']:,} ({window['used'] / window['limit']:.0%})"
+
+    budget_html = f"""
+            <div class="mb-12 p-6 bg-gray-800/50 rounded-2xl border border-{budget_color}-700">
+                <div class="flex justify-between items-center mb-4">
+                    <h2 class="text-2xl font-bold">💸 <span data-i18n="openaiBudget">Budget tokens</span></h2>
+                    <span class="px-4 py-1 rounded-full bg-{budget_color}-900 text-{budget_color}-300 font-bold uppercase text-sm">{budget['stage']}</span>
+                </div>
+                <div class="grid grid-cols-1 md:grid-cols-4 gap-6 text-sm">
+                    <div><div class="text-gray-400" data-i18n="openaiBudgetHour">Dernière heure</div><div class="text-lg font-semibold">{budget_line(budget['hour'])}</div></div>
+                    <div><div class="text-gray-400" data-i18n="openaiBudgetDay">Dernières 24h</div><div class="text-lg font-semibold">{budget_line(budget['day'])}</div></div>
+                    <div><div class="text-gray-400" data-i18n="openaiBudgetBar">Seuil décision locale</div><div class="text-lg font-semibold">{f"{budget['confidence_bar']:.0%}" if budget['confidence_bar'] is not None else '—'}</div></div>
+                    <div><div class="text-gray-400" data-i18n="openaiModel">Modèle</div><div class="text-lg font-semibold font-mono">{budget['model_override'] or (openai_moderator.model if openai_moderator else '—')}</div></div>
+                </div>
+            </div>
+"""
+
+    # 🆕 Structured outputs : échecs de parsing / relances
+    quality = stats.get("quality", {})
+    quality_html = ""
+    if quality:
+        quality_html = f"""
+            <div class="grid grid-cols-1 md:grid-cols-4 gap-6 mb-12">
+                <div class="bg-gray-800/50 p-6 rounded-2xl border border-gray-700">
+                    <div class="text-gray-300 mb-2 text-sm font-semibold" data-i18n="openaiParseFailureRate">Réponses invalides</div>
+                    <div class="text-3xl font-black text-white">{quality.get('parse_failure_rate', 0):.1%}</div>
+                    <div class="text-xs text-gray-400 mt-1">JSON: {quality.get('parse_failures', 0)} • schema: {quality.get('schema_violations', 0)}</div>
+                </div>
+                <div class="bg-gray-800/50 p-6 rounded-2xl border border-gray-700">
+                    <div class="text-gray-300 mb-2 text-sm font-semibold" data-i18n="openaiRetryRate">Taux de relance</div>
+                    <div class="text-3xl font-black text-white">{quality.get('retry_rate', 0):.1%}</div>
+                    <div class="text-xs text-gray-400 mt-1">{quality.get('retries', 0)} / {quality.get('requests', 0)}</div>
+                </div>
+                <div class="bg-gray-800/50 p-6 rounded-2xl border border-gray-700">
+                    <div class="text-gray-300 mb-2 text-sm font-semibold" data-i18n="openaiRetrySuccessRate">Relances réussies</div>
+                    <div class="text-3xl font-black text-emerald-300">{quality.get('retry_success_rate', 0):.1%}</div>
+                </div>
+                <div class="bg-gray-800/50 p-6 rounded-2xl border border-gray-700">
+                    <div class="text-gray-300 mb-2 text-sm font-semibold" data-i18n="openaiUnresolvedRate">Non résolues</div>
+                    <div class="text-3xl font-black text-red-300">{quality.get('unresolved_rate', 0):.1%}</div>
+                    <div class="text-xs text-gray-400 mt-1">API errors: {quality.get('api_errors', 0)}</div>
+                </div>
+            </div>
+"""
+    
     # By Model table
     by_model_html = ""
     for model, data in stats.get("by_model", {}).items():
@@ -2521,6 +2942,9 @@ async def openai_stats_html():
                 </div>
             </div>
             
+            {budget_html}
+            {quality_html}
+            
             <!-- By Model Table -->
             {'<div class="mb-12"><h2 class="text-2xl font-bold mb-6"><span data-i18n="openaiByModel">Par Modèle</span></h2><div class="overflow-x-auto bg-gray-800/50 rounded-2xl border border-gray-700"><table class="w-full"><thead class="bg-gray-700/50"><tr><th class="px-4 py-3 text-left" data-i18n="openaiModel">Modèle</th><th class="px-4 py-3 text-center" data-i18n="openaiCalls">Appels</th><th class="px-4 py-3 text-center" data-i18n="openaiTokensUsed">Tokens Utilisés</th><th class="px-4 py-3 text-center" data-i18n="openaiCost">Coût</th></tr></thead><tbody>' + by_model_html + '</tbody></table></div></div>' if by_model_html else '<div class="mb-12 text-center py-8 text-gray-400"><p data-i18n="openaiNoStats">Aucune statistique par modèle disponible</p></div>'}
             
@@ -2557,7 +2981,15 @@ async def openai_stats_html():
 async def startup_event():
     """Initialize app on startup"""
     init_db()
+    print("🧹 Cleaning up stale reviews...")
     cleanup_stale_reviews()
+    rule_metrics.start_flusher()
+    if config.get('machine_learning.enabled', True):
+        feedback_db.start_trainer()
+    if config.get('library_sync.on_startup', True):
+        threading.Thread(target=sync_library, name='library-sync', daemon=True).start()
+    if config.get('config_reload.enabled', True):
+        config.start_watcher(config.get('config_reload.interval_seconds', 5))
     
     print(f"\n🚀 {'='*60}")
     print(f"🚀 PLEXSTAFFAI v1.7.0 STARTED")
@@ -2570,6 +3002,11 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Log graceful shutdown; scheduling is handled by cron."""
+    config.stop_watcher()
+    rule_metrics.stop()
+    feedback_db.stop_trainer()
+    close_databases()
+    feature_store.close()
     print("\nPlexStaffAI stopped")
 
 
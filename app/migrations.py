@@ -0,0 +1,52 @@
+# migrations.py - Versioned schema migrations for moderation.db (PRAGMA user_version)
+
+from typing import List, Tuple
+
+# (version, description, statements) - append only, never edit a shipped entry
+MIGRATIONS: List[Tuple[int, str, Tuple[str, ...]]] = [
+    (1, "indexes for the decisions / pending_reviews hot queries", (
+        # save_decision (dernière décision d'une requête), DISTINCT/GROUP BY request_id
+        "CREATE INDEX IF NOT EXISTS idx_decisions_request_ts ON decisions(request_id, timestamp)",
+        # /history, /staff/report : ORDER BY timestamp DESC LIMIT n ; /stats : timestamp > ?
+        "CREATE INDEX IF NOT EXISTS idx_decisions_timestamp ON decisions(timestamp)",
+        # /api/history?filter= : WHERE decision = ? ORDER BY timestamp DESC ; compteurs par décision
+        "CREATE INDEX IF NOT EXISTS idx_decisions_decision_ts ON decisions(decision, timestamp)",
+        # File de review : seules les lignes 'pending' sont indexées
+        "CREATE INDEX IF NOT EXISTS idx_pending_reviews_pending ON pending_reviews(created_at) "
+        "WHERE status = 'pending'",
+        "ANALYZE",
+    )),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, migrations=MIGRATIONS) -> List[int]:
+    """Apply migrations newer than the file's user_version, one transaction each.
+
+    ``conn`` is a raw sqlite3 connection (or Database.connection()); returns
+    the versions applied.
+    """
+    applied = []
+    current = schema_version(conn)
+    for version, description, statements in migrations:
+        if version <= current:
+            continue
+        print(f"🗄️  Migration {version}: {description}...")
+        # BEGIN explicite : sqlite3 n'ouvre pas de transaction implicite pour le DDL
+        conn.execute("BEGIN")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            # PRAGMA n'accepte pas de paramètre lié
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
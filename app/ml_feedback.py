@@ -1,22 +1,51 @@
 # ml_feedback.py - Machine Learning Feedback Loop System
 
-import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 import json
 
+from app.db import shared
+from app.naive_bayes import NaiveBayes
+from app.trust import user_key as trust_user_key
+
 class FeedbackDatabase:
     """Base de données pour stocker les décisions humaines et entraîner l'IA"""
     
     def __init__(self, db_path: str = "/config/feedback.db"):
         self.db_path = Path(db_path)
+        # Connexions réutilisées par thread (WAL, synchronous=NORMAL, busy_timeout)
+        self.db = shared(self.db_path)
+        # Appelé avec (user_id, approved_requests) après chaque update_user_stats
+        self.user_stats_callback = None
+        # Meilleur pattern par (type, valeur) : (decision, confidence, occurrences)
+        self._patterns: Dict[Tuple[str, str], Tuple[str, float, int]] = {}
+        # Apprentissage en tâche de fond (start_trainer) : seuil / intervalle
+        # mis à jour depuis machine_learning.* par main.py
+        self.retrain_threshold = 100
+        self.retrain_interval = 0.0
+        self.last_training: Optional[Dict[str, Any]] = None
+        self._counter_lock = threading.Lock()
+        self._learn_lock = threading.Lock()
+        self._learn_event = threading.Event()
+        self._stop = threading.Event()
+        self._trainer: Optional[threading.Thread] = None
+        # Naive Bayes multi-features, entraîné avec les patterns
+        self.naive_bayes = NaiveBayes()
         self.init_database()
+        self.load_patterns()
+        self.load_naive_bayes()
+        self._unlearned = self.get_feedback_count(unlearned_only=True)
     
     def init_database(self):
         """Crée les tables si elles n'existent pas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db.transaction() as conn:
+            self._create_tables(conn.cursor())
+
+    def _create_tables(self, cursor):
+        NaiveBayes.init_tables(cursor)
         
         # Table des feedbacks humains
         cursor.execute("""
@@ -64,139 +93,250 @@ class FeedbackDatabase:
             )
         """)
         
-        conn.commit()
-        conn.close()
+        # Clé unique des patterns (apprentissage en ON CONFLICT) ; fusionne
+        # d'abord les doublons laissés par l'ancien SELECT puis INSERT
+        cursor.execute("""
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'index' AND name = 'idx_learned_patterns_key'
+        """)
+        if not cursor.fetchone():
+            cursor.execute("""
+                UPDATE learned_patterns
+                SET occurrences = (
+                        SELECT SUM(occurrences) FROM learned_patterns AS dup
+                        WHERE dup.pattern_type = learned_patterns.pattern_type
+                          AND dup.pattern_value = learned_patterns.pattern_value
+                          AND dup.decision = learned_patterns.decision
+                    ),
+                    last_used = (
+                        SELECT MAX(last_used) FROM learned_patterns AS dup
+                        WHERE dup.pattern_type = learned_patterns.pattern_type
+                          AND dup.pattern_value = learned_patterns.pattern_value
+                          AND dup.decision = learned_patterns.decision
+                    )
+                WHERE id IN (
+                    SELECT MIN(id) FROM learned_patterns
+                    GROUP BY pattern_type, pattern_value, decision
+                    HAVING COUNT(*) > 1
+                )
+            """)
+            cursor.execute("""
+                DELETE FROM learned_patterns
+                WHERE id NOT IN (
+                    SELECT MIN(id) FROM learned_patterns
+                    GROUP BY pattern_type, pattern_value, decision
+                )
+            """)
+            if cursor.rowcount:
+                print(f"🧹 Merged {cursor.rowcount} duplicate learned pattern(s)")
+            cursor.execute("""
+                CREATE UNIQUE INDEX idx_learned_patterns_key
+                ON learned_patterns(pattern_type, pattern_value, decision)
+            """)
+    
+    def load_patterns(self) -> int:
+        """(Re)build the in-memory best-pattern table and swap it in atomically"""
+        rows = self.db.connection().execute("""
+            SELECT pattern_type, pattern_value, decision, confidence, occurrences
+            FROM learned_patterns
+            ORDER BY occurrences ASC, id DESC
+        """).fetchall()
+        patterns = {}
+        for pattern_type, pattern_value, decision, confidence, occurrences in rows:
+            # Trié par occurrences croissantes : le dernier écrit est le meilleur
+            patterns[(pattern_type, pattern_value)] = (decision, confidence, occurrences)
+        self._patterns = patterns
+        return len(patterns)
+    
+    def load_naive_bayes(self) -> int:
+        """Load Naive Bayes counts; first run: train on already-learned feedback"""
+        conn = self.db.connection()
+        samples = self.naive_bayes.load(conn)
+        if samples == 0:
+            with self.db.transaction() as conn:
+                rows = conn.execute("""
+                    SELECT request_data, human_decision FROM human_feedback WHERE learning_applied = 1
+                """)
+                delta = self.naive_bayes.update(conn, rows)
+            self.naive_bayes.apply(delta)
+            samples = sum(delta[0].values())
+            if samples:
+                print(f"🧠 Naive Bayes bootstrapped from {samples} past feedbacks")
+        return samples
     
     def add_feedback(self, feedback_data: Dict[str, Any]) -> int:
         """Enregistre une décision humaine pour apprentissage"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO human_feedback 
-            (request_id, ai_decision, ai_confidence, ai_reason, 
-             human_decision, human_reason, staff_username, request_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            feedback_data['request_id'],
-            feedback_data.get('ai_decision'),
-            feedback_data.get('ai_confidence'),
-            feedback_data.get('ai_reason'),
-            feedback_data['human_decision'],
-            feedback_data.get('human_reason'),
-            feedback_data.get('staff_username'),
-            json.dumps(feedback_data.get('request_data', {}))
-        ))
-        
-        feedback_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO human_feedback 
+                (request_id, ai_decision, ai_confidence, ai_reason, 
+                 human_decision, human_reason, staff_username, request_data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                feedback_data['request_id'],
+                feedback_data.get('ai_decision'),
+                feedback_data.get('ai_confidence'),
+                feedback_data.get('ai_reason'),
+                feedback_data['human_decision'],
+                feedback_data.get('human_reason'),
+                feedback_data.get('staff_username'),
+                json.dumps(feedback_data.get('request_data', {}))
+            ))
+            feedback_id = cursor.lastrowid
         
-        # Déclencher apprentissage si threshold atteint
-        self.trigger_learning_if_needed()
+        # Pas d'apprentissage ici : le trainer est réveillé au seuil
+        with self._counter_lock:
+            self._unlearned += 1
+            unlearned = self._unlearned
+        if unlearned >= self.retrain_threshold:
+            self._learn_event.set()
         
         return feedback_id
     
     def get_feedback_count(self, unlearned_only: bool = True) -> int:
         """Compte les feedbacks non encore appris"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self.db.connection()
         
         if unlearned_only:
-            cursor.execute("SELECT COUNT(*) FROM human_feedback WHERE learning_applied = 0")
+            cursor = conn.execute("SELECT COUNT(*) FROM human_feedback WHERE learning_applied = 0")
         else:
-            cursor.execute("SELECT COUNT(*) FROM human_feedback")
+            cursor = conn.execute("SELECT COUNT(*) FROM human_feedback")
         
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return cursor.fetchone()[0]
     
-    def trigger_learning_if_needed(self):
-        """Déclenche apprentissage si threshold de feedbacks atteint"""
-        unlearned_count = self.get_feedback_count(unlearned_only=True)
-        threshold = 100
-        
-        if unlearned_count >= threshold:
-            print(f"🧠 Learning threshold reached ({unlearned_count} feedbacks). Training patterns...")
-            self.learn_from_feedback()
+    @property
+    def unlearned_count(self) -> int:
+        """Feedbacks not learned yet (in-memory counter, no query)"""
+        return self._unlearned
     
-    def learn_from_feedback(self):
-        """Analyse les feedbacks et crée des patterns appris"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, request_data, human_decision 
-            FROM human_feedback 
-            WHERE learning_applied = 0
-        """)
-        
-        feedbacks = cursor.fetchall()
-        patterns_learned = 0
-        
-        for feedback_id, request_data_json, decision in feedbacks:
-            request_data = json.loads(request_data_json)
+    def configure(self, retrain_threshold: int, retrain_interval: float):
+        """Nouveaux seuil / intervalle (subscriber de config) ; réveille le
+        trainer pour qu'il recalcule son attente (0 → > 0 compris)"""
+        self.retrain_threshold = retrain_threshold
+        self.retrain_interval = retrain_interval
+        self._learn_event.set()
+    
+    def start_trainer(self):
+        """Background thread running learn_from_feedback at the threshold or on schedule"""
+        if self._trainer is not None:
+            return
+        
+        def run():
+            last_run = time.monotonic()
+            while not self._stop.is_set():
+                # Intervalle relu à chaque tour : configure() réveille l'attente
+                interval = self.retrain_interval
+                timeout = max(0.0, last_run + interval - time.monotonic()) if interval else None
+                woken = self._learn_event.wait(timeout)
+                self._learn_event.clear()
+                if self._stop.is_set():
+                    break
+                if not woken:
+                    last_run = time.monotonic()
+                # Réveil (seuil ou rechargement de config) au seuil, ou
+                # intervalle écoulé avec des feedbacks en attente
+                due = self._unlearned >= self.retrain_threshold if woken else self._unlearned > 0
+                if not due:
+                    continue
+                print(f"🧠 Training patterns from {self._unlearned} new feedbacks "
+                      f"({'threshold' if woken else 'schedule'})...")
+                try:
+                    self.learn_from_feedback()
+                except Exception as e:
+                    print(f"⚠️  Background learning failed: {e}")
+                last_run = time.monotonic()
+        
+        self._trainer = threading.Thread(target=run, name='ml-trainer', daemon=True)
+        self._trainer.start()
+    
+    def stop_trainer(self):
+        self._stop.set()
+        self._learn_event.set()
+        if self._trainer is not None:
+            self._trainer.join(timeout=10)
+            self._trainer = None
+    
+    def learn_from_feedback(self) -> Dict[str, int]:
+        """Analyse les feedbacks et crée des patterns appris.
+
+        Set-based: one aggregate upsert over every unlearned feedback (genres
+        expanded with json_each) and one bulk flag update, in a single
+        transaction. Both are bounded by the highest unlearned id read at
+        the start, so feedback added meanwhile waits for the next run.
+        """
+        with self._learn_lock:
+            return self._learn()
+    
+    def _learn(self) -> Dict[str, int]:
+        started = time.perf_counter()
+        with self.db.transaction() as conn:
+            max_id, feedbacks = conn.execute("""
+                SELECT MAX(id), COUNT(*) FROM human_feedback WHERE learning_applied = 0
+            """).fetchone()
+            if not feedbacks:
+                return {'feedbacks': 0, 'patterns': 0}
             
-            # Pattern: Genre
-            genres = request_data.get('genres', [])
-            for genre in genres:
-                self.upsert_pattern('genre', genre, decision, conn)
-                patterns_learned += 1
+            # Pattern: Genre (nouveau pattern = nombre d'occurrences du lot)
+            patterns_learned = conn.execute("""
+                INSERT INTO learned_patterns
+                (pattern_type, pattern_value, decision, confidence, occurrences)
+                SELECT 'genre', genre.value, feedback.human_decision, 0.7, COUNT(*)
+                FROM human_feedback AS feedback,
+                     json_each(feedback.request_data, '$.genres') AS genre
+                WHERE feedback.learning_applied = 0 AND feedback.id <= ?
+                  AND json_valid(feedback.request_data) AND genre.type = 'text'
+                GROUP BY genre.value, feedback.human_decision
+                ON CONFLICT(pattern_type, pattern_value, decision) DO UPDATE SET
+                    occurrences = occurrences + excluded.occurrences,
+                    last_used = CURRENT_TIMESTAMP
+            """, (max_id,)).rowcount
             
-            # Marquer feedback comme appris
-            cursor.execute("""
+            # Naive Bayes : O(features) par feedback, même transaction
+            nb_delta = self.naive_bayes.update(conn, conn.execute("""
+                SELECT request_data, human_decision FROM human_feedback
+                WHERE learning_applied = 0 AND id <= ?
+            """, (max_id,)))
+            
+            # Marquer les feedbacks comme appris
+            conn.execute("""
                 UPDATE human_feedback 
                 SET learning_applied = 1 
-                WHERE id = ?
-            """, (feedback_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✅ Learned {patterns_learned} patterns from {len(feedbacks)} feedbacks")
+                WHERE learning_applied = 0 AND id <= ?
+            """, (max_id,))
+        
+        self.load_patterns()
+        self.naive_bayes.apply(nb_delta)
+        with self._counter_lock:
+            self._unlearned = max(0, self._unlearned - feedbacks)
+        self.last_training = {
+            'at': datetime.now().isoformat(),
+            'feedbacks': feedbacks,
+            'patterns': patterns_learned,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+        print(f"✅ Learned {patterns_learned} patterns from {feedbacks} feedbacks")
+        return {'feedbacks': feedbacks, 'patterns': patterns_learned}
     
     def upsert_pattern(self, pattern_type: str, pattern_value: str, decision: str, conn):
         """Insère ou met à jour un pattern appris"""
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, occurrences FROM learned_patterns 
-            WHERE pattern_type = ? AND pattern_value = ? AND decision = ?
-        """, (pattern_type, pattern_value, decision))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            pattern_id, occurrences = existing
-            cursor.execute("""
-                UPDATE learned_patterns 
-                SET occurrences = ?, last_used = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (occurrences + 1, pattern_id))
-        else:
-            cursor.execute("""
-                INSERT INTO learned_patterns 
-                (pattern_type, pattern_value, decision, confidence)
-                VALUES (?, ?, ?, ?)
-            """, (pattern_type, pattern_value, decision, 0.7))
+        conn.execute("""
+            INSERT INTO learned_patterns 
+            (pattern_type, pattern_value, decision, confidence)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(pattern_type, pattern_value, decision) DO UPDATE SET
+                occurrences = occurrences + 1,
+                last_used = CURRENT_TIMESTAMP
+        """, (pattern_type, pattern_value, decision, 0.7))
     
     def get_learned_decision(self, request_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Récupère une décision basée sur patterns appris"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """Récupère une décision basée sur patterns appris (table en mémoire, sans I/O)"""
+        patterns = self._patterns
         matched_patterns = []
         
         # Check genres
         genres = request_data.get('genres', [])
         for genre in genres:
-            cursor.execute("""
-                SELECT decision, confidence, occurrences 
-                FROM learned_patterns 
-                WHERE pattern_type = 'genre' AND pattern_value = ?
-                ORDER BY occurrences DESC LIMIT 1
-            """, (genre,))
-            match = cursor.fetchone()
+            match = patterns.get(('genre', genre)) if isinstance(genre, str) else None
             if match:
                 matched_patterns.append({
                     'type': 'genre',
@@ -205,8 +345,6 @@ class FeedbackDatabase:
                     'occurrences': match[2]
                 })
         
-        conn.close()
-        
         if not matched_patterns:
             return None
         
@@ -220,42 +358,35 @@ class FeedbackDatabase:
             'source': 'machine_learning'
         }
     
-    def update_user_stats(self, user_id: str, username: str, decision: str):
-        """Met à jour les stats utilisateur"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT total_requests FROM user_stats WHERE user_id = ?", (user_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute("""
-                UPDATE user_stats 
-                SET total_requests = total_requests + 1,
-                    approved_requests = approved_requests + ?,
-                    rejected_requests = rejected_requests + ?,
-                    last_request = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (
-                1 if decision == 'APPROVED' else 0,
-                1 if decision == 'REJECTED' else 0,
-                user_id
-            ))
-        else:
-            cursor.execute("""
+    def update_user_stats(self, user_id: str, username: str, decision: str,
+                          count_approval: bool = True):
+        """Met à jour les stats utilisateur.
+
+        ``count_approval=False`` : la requête est comptée mais l'approbation ne
+        fait pas progresser le trust tier (décision prise par ce même tier).
+        """
+        with self.db.transaction() as conn:
+            # Un seul upsert au lieu de SELECT puis UPDATE / INSERT
+            approved = conn.execute("""
                 INSERT INTO user_stats 
                 (user_id, username, account_created, total_requests, 
                  approved_requests, rejected_requests, last_request)
                 VALUES (?, ?, CURRENT_TIMESTAMP, 1, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    total_requests = total_requests + 1,
+                    approved_requests = approved_requests + excluded.approved_requests,
+                    rejected_requests = rejected_requests + excluded.rejected_requests,
+                    last_request = CURRENT_TIMESTAMP
+                RETURNING approved_requests
             """, (
                 user_id,
                 username,
-                1 if decision == 'APPROVED' else 0,
+                1 if decision == 'APPROVED' and count_approval else 0,
                 1 if decision == 'REJECTED' else 0
-            ))
+            )).fetchone()[0]
         
-        conn.commit()
-        conn.close()
+        if self.user_stats_callback:
+            self.user_stats_callback(user_id, approved)
 
 
 # Intégration dans main.py
@@ -269,18 +400,42 @@ class EnhancedModerator:
         self.feedback = feedback_db
         self.smart_moderator = SmartModerator(config_manager)
     
-    def moderate_with_learning(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Modération avec apprentissage ML"""
+    def moderate_with_learning(self, request_data: Dict[str, Any], config=None) -> Dict[str, Any]:
+        """Modération avec apprentissage ML (``config`` : snapshot de la requête)"""
+        config = config or self.config
         
-        # 1. Check learned patterns first
-        ml_enabled = self.config.get('machine_learning.enabled', True)
+        # 1. Check learned model first
+        ml_enabled = config.get('machine_learning.enabled', True)
         if ml_enabled:
-            learned_decision = self.feedback.get_learned_decision(request_data)
-            if learned_decision and learned_decision['confidence'] > 0.75:
-                return learned_decision
+            threshold = config.get('machine_learning.confidence_threshold', 0.75)
+            prediction = None
+            if config.get('machine_learning.naive_bayes.enabled', True):
+                prediction = self.feedback.naive_bayes.predict(request_data)
+            if prediction:
+                # Assez de feedbacks : le Naive Bayes remplace les patterns de genre.
+                # Ses postérieurs (indépendance naïve) sont trop sûrs d'eux : seuil
+                # dédié, et jamais avant les rejets / déclencheurs de review config.
+                min_confidence = config.get('machine_learning.naive_bayes.min_confidence', 0.9)
+                if (prediction['confidence'] >= min_confidence
+                        and not self.smart_moderator.should_auto_reject(request_data, config)
+                        and not self.smart_moderator.needs_human_review(request_data, config)):
+                    return {
+                        'decision': prediction['decision'],
+                        'confidence': round(min(prediction['confidence'], 0.95), 3),
+                        'reason': (
+                            f"Naive Bayes over {prediction['samples']} staff decisions "
+                            f"({', '.join(prediction['features']) or 'priors'})"
+                        ),
+                        'rule_matched': 'naive_bayes',
+                        'source': 'machine_learning'
+                    }
+            else:
+                learned_decision = self.feedback.get_learned_decision(request_data)
+                if learned_decision and learned_decision['confidence'] > threshold:
+                    return learned_decision
         
         # 2. Apply config rules
-        decision = self.smart_moderator.moderate(request_data)
+        decision = self.smart_moderator.moderate(request_data, config)
         
         return {
             'decision': decision.decision,
@@ -292,8 +447,9 @@ class EnhancedModerator:
     
     def record_human_decision(self, request_id: int, request_data: Dict[str, Any],
                              ai_decision: str, human_decision: str, 
-                             human_reason: str, staff_username: str):
-        """Enregistre décision humaine pour apprentissage"""
+                             human_reason: str, staff_username: str,
+                             user_key: Optional[str] = None):
+        """Enregistre décision humaine pour apprentissage (stats sous ``user_key``)"""
         
         feedback_data = {
             'request_id': request_id,
@@ -306,9 +462,11 @@ class EnhancedModerator:
         
         feedback_id = self.feedback.add_feedback(feedback_data)
         
-        # Update user stats
-        user_id = str(request_data.get('user_id', 'unknown'))
+        # Update user stats (pas de ligne partagée quand le demandeur est inconnu)
         username = request_data.get('requested_by', 'unknown')
-        self.feedback.update_user_stats(user_id, username, human_decision)
+        if user_key is None:
+            user_key = trust_user_key(request_data.get('user_id'), username)
+        if user_key is not None:
+            self.feedback.update_user_stats(user_key, username, human_decision)
         
         return feedback_id
@@ -0,0 +1,417 @@
+# mock_openai.py - OpenAI-compatible chat-completions stand-in
+#
+# Lets OpenAIModerator (and the whole run_moderation pipeline, by pointing
+# OPENAI_BASE_URL at it) be load-tested and benchmarked without paying for
+# real completions. Everything is driven by a "profile" dict:
+#
+#   {
+#     "seed": 42,
+#     "deterministic": true,          # same prompt → same verdict/latency
+#     "model": "gpt-4o-mini",
+#     "verdicts": {"APPROVED": 0.6, "REJECTED": 0.2, "NEEDS_REVIEW": 0.2},
+#     "confidence": [0.6, 0.98],
+#     "latency": {"distribution": "lognormal", "mean_ms": 800, "stddev_ms": 300,
+#                 "min_ms": 50, "max_ms": 5000},
+#     "errors": {"malformed_json": 0.02, "schema_violation": 0.01,
+#                "rate_limit": 0.01, "server_error": 0.01}
+#   }
+#
+# Usage:
+#   python -m app.mock_openai serve --port 8089 [--profile profile.json]
+#   OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=mock ...
+#
+#   python -m app.mock_openai bench -n 500 -c 16 [--profile profile.json]
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+DECISIONS = ('APPROVED', 'REJECTED', 'NEEDS_REVIEW')
+
+DEFAULT_PROFILE: Dict[str, Any] = {
+    'seed': 42,
+    'deterministic': True,
+    'model': None,  # None = echo the requested model
+    'verdicts': {'APPROVED': 0.6, 'REJECTED': 0.2, 'NEEDS_REVIEW': 0.2},
+    'confidence': [0.6, 0.98],
+    'latency': {
+        'distribution': 'fixed',
+        'mean_ms': 0,
+        'stddev_ms': 0,
+        'min_ms': 0,
+        'max_ms': 30000,
+    },
+    'errors': {
+        'malformed_json': 0.0,
+        'schema_violation': 0.0,
+        'rate_limit': 0.0,
+        'server_error': 0.0,
+    },
+}
+
+
+def load_profile(profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Merge a (partial) profile over DEFAULT_PROFILE.
+
+    Falls back to the MOCK_OPENAI_PROFILE env var (inline JSON or a path).
+    """
+    if profile is None:
+        raw = os.getenv('MOCK_OPENAI_PROFILE', '')
+        if raw and os.path.exists(raw):
+            with open(raw, 'r') as f:
+                profile = json.load(f)
+        elif raw:
+            profile = json.loads(raw)
+        else:
+            profile = {}
+
+    merged = json.loads(json.dumps(DEFAULT_PROFILE))
+    for key, value in profile.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key].update(value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough OpenAI token estimate (~4 chars per token)"""
+    return max(1, len(text) // 4)
+
+
+class MockChatBackend:
+    """Generates chat.completion responses (or errors) from a profile.
+
+    The backend is transport-agnostic: ``complete()`` returns
+    ``(status_code, body, headers, delay_seconds)`` and is wrapped either by
+    an httpx.MockTransport (in-process, no sockets) or the FastAPI app below.
+    """
+
+    def __init__(self, profile: Optional[Dict[str, Any]] = None):
+        self.profile = load_profile(profile)
+        self._rng = random.Random(self.profile.get('seed'))
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'ok': 0,
+            'malformed_json': 0,
+            'schema_violation': 0,
+            'rate_limit': 0,
+            'server_error': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+        }
+
+    # ----- randomness -----
+
+    def _rng_for(self, payload: Dict[str, Any]) -> random.Random:
+        """Per-request RNG: prompt-keyed when deterministic, shared otherwise."""
+        if self.profile.get('deterministic'):
+            digest = hashlib.sha256(
+                f"{self.profile.get('seed')}|{json.dumps(payload.get('messages', []), sort_keys=True)}".encode()
+            ).digest()
+            return random.Random(int.from_bytes(digest[:8], 'big'))
+        with self._lock:
+            return random.Random(self._rng.getrandbits(64))
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        """Latency in seconds, clamped to [min_ms, max_ms]"""
+        latency = self.profile['latency']
+        dist = latency.get('distribution', 'fixed')
+        mean = float(latency.get('mean_ms', 0))
+        stddev = float(latency.get('stddev_ms', 0))
+
+        if dist == 'uniform':
+            value = rng.uniform(mean - stddev, mean + stddev)
+        elif dist == 'normal':
+            value = rng.gauss(mean, stddev)
+        elif dist == 'lognormal' and mean > 0:
+            # Parametrise so the distribution has the requested mean/stddev
+            sigma2 = math.log(1 + (stddev / mean) ** 2)
+            value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        elif dist == 'exponential' and mean > 0:
+            value = rng.expovariate(1.0 / mean)
+        else:
+            value = mean
+
+        value = max(float(latency.get('min_ms', 0)), min(float(latency.get('max_ms', 30000)), value))
+        return value / 1000.0
+
+    def _pick_outcome(self, rng: random.Random) -> str:
+        roll = rng.random()
+        cumulative = 0.0
+        for outcome in ('rate_limit', 'server_error', 'malformed_json', 'schema_violation'):
+            cumulative += float(self.profile['errors'].get(outcome, 0.0))
+            if roll < cumulative:
+                return outcome
+        return 'ok'
+
+    def _pick_verdict(self, rng: random.Random) -> Tuple[str, float]:
+        weights = self.profile['verdicts']
+        decisions = [d for d in DECISIONS if weights.get(d, 0) > 0] or ['NEEDS_REVIEW']
+        decision = rng.choices(decisions, weights=[weights.get(d, 1) for d in decisions])[0]
+        low, high = self.profile['confidence']
+        return decision, round(rng.uniform(low, high), 3)
+
+    # ----- responses -----
+
+    def _verdict_content(self, decision: str, confidence: float, rng: random.Random) -> str:
+        return json.dumps({
+            'decision': decision,
+            'confidence': confidence,
+            'reason': f'Mock verdict: {decision.lower()}',
+            'detailed_reasoning': 'Deterministic mock response generated offline',
+            'risk_factors': {
+                'quality_risk': rng.randint(0, 10),
+                'storage_risk': rng.randint(0, 10),
+                'appropriateness_risk': rng.randint(0, 10),
+                'user_trust_risk': rng.randint(0, 10),
+            },
+            'value_score': rng.randint(0, 10),
+        })
+
+    @staticmethod
+    def _error(status: int, message: str, error_type: str, code: str) -> Dict[str, Any]:
+        return {'error': {'message': message, 'type': error_type, 'param': None, 'code': code}}
+
+    def complete(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str], float]:
+        """Build the response for one POST /v1/chat/completions body"""
+        rng = self._rng_for(payload)
+        delay = self._sample_latency(rng)
+        outcome = self._pick_outcome(rng)
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats[outcome] += 1
+
+        if outcome == 'rate_limit':
+            body = self._error(429, 'Rate limit reached (mock)', 'requests', 'rate_limit_exceeded')
+            return 429, body, {'retry-after': '1'}, delay
+        if outcome == 'server_error':
+            status = rng.choice([500, 502, 503])
+            body = self._error(status, 'The server had an error (mock)', 'server_error', 'server_error')
+            return status, body, {}, delay
+
+        decision, confidence = self._pick_verdict(rng)
+        if outcome == 'malformed_json':
+            content = self._verdict_content(decision, confidence, rng)[:-7] + '...'
+        elif outcome == 'schema_violation':
+            content = json.dumps({'decision': 'MAYBE', 'confidence': 'high'})
+        else:
+            content = self._verdict_content(decision, confidence, rng)
+
+        # max_tokens respecté comme l'API : réponse coupée, finish_reason 'length'
+        finish_reason = 'stop'
+        max_tokens = payload.get('max_tokens')
+        if max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[:max_tokens * 4]
+            finish_reason = 'length'
+
+        prompt_text = ''.join(str(m.get('content', '')) for m in payload.get('messages', []))
+        prompt_tokens = estimate_tokens(prompt_text)
+        completion_tokens = estimate_tokens(content)
+        with self._lock:
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['completion_tokens'] += completion_tokens
+
+        body = {
+            'id': f'chatcmpl-mock-{uuid.UUID(int=rng.getrandbits(128)).hex[:24]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': self.profile.get('model') or payload.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'logprobs': None,
+                'finish_reason': finish_reason,
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+            'system_fingerprint': 'mock',
+        }
+        return 200, body, {}, delay
+
+    # ----- transports -----
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """httpx.MockTransport handler (sync, sleeps for the sampled latency)"""
+        if not request.url.path.endswith('/chat/completions'):
+            return httpx.Response(404, json=self._error(404, 'Not found (mock)', 'invalid_request_error', 'not_found'))
+        status, body, headers, delay = self.complete(json.loads(request.content or b'{}'))
+        if delay:
+            time.sleep(delay)
+        return httpx.Response(status, json=body, headers=headers)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+
+def create_app(backend: Optional[MockChatBackend] = None):
+    """FastAPI app exposing the backend as an OpenAI-compatible server"""
+    import asyncio
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    backend = backend or MockChatBackend()
+    mock_app = FastAPI(title="PlexStaffAI mock OpenAI")
+
+    @mock_app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        status, body, headers, delay = backend.complete(await request.json())
+        if delay:
+            await asyncio.sleep(delay)
+        return JSONResponse(content=body, status_code=status, headers=headers)
+
+    @mock_app.get("/v1/models")
+    async def models():
+        return {'object': 'list', 'data': [{'id': backend.profile.get('model') or 'gpt-4o-mini', 'object': 'model'}]}
+
+    @mock_app.get("/mock/stats")
+    async def mock_stats():
+        return {'profile': backend.profile, 'stats': backend.stats}
+
+    return mock_app
+
+
+# ===== LOAD TEST =====
+
+SAMPLE_GENRES = [
+    'Action', 'Comedy', 'Drama', 'Documentary', 'Horror', 'Animation',
+    'Science Fiction', 'Thriller', 'Romance', 'Family', 'Crime', 'Fantasy',
+]
+
+
+def synthetic_requests(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Synthetic moderation_data dicts shaped like run_moderation's"""
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        is_tv = rng.random() < 0.4
+        requests.append({
+            'title': f'Synthetic {"Show" if is_tv else "Movie"} {i}',
+            'media_type': 'tv' if is_tv else 'movie',
+            'year': str(rng.randint(1960, 2025)),
+            'rating': round(rng.uniform(0, 10), 1),
+            'popularity': round(rng.expovariate(1 / 40), 1),
+            'genres': rng.sample(SAMPLE_GENRES, rng.randint(1, 3)),
+            'season_count': rng.randint(1, 15) if is_tv else 0,
+            'episode_count': rng.randint(6, 300) if is_tv else 0,
+            'requested_by': f'user{rng.randint(1, 50)}',
+            'user_age_days': rng.randint(0, 2000),
+        })
+    return requests
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load_test(count: int = 200, concurrency: int = 8,
+                  profile: Optional[Dict[str, Any]] = None,
+                  max_retries: int = 0, quiet: bool = True) -> Dict[str, Any]:
+    """Drive OpenAIModerator against an in-process mock; return a report"""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.openai_moderator import OpenAIModerator
+
+    backend = MockChatBackend(profile)
+    http_client = httpx.Client(transport=backend.transport())
+    previous_retries = os.environ.get('OPENAI_MAX_RETRIES')
+    os.environ['OPENAI_MAX_RETRIES'] = str(max_retries)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            moderator = OpenAIModerator(api_key='mock', base_url='http://mock-openai/v1',
+                                        http_client=http_client)
+    finally:
+        if previous_retries is None:
+            os.environ.pop('OPENAI_MAX_RETRIES', None)
+        else:
+            os.environ['OPENAI_MAX_RETRIES'] = previous_retries
+
+    def one(request_data):
+        start = time.perf_counter()
+        result = moderator.moderate(request_data)
+        return time.perf_counter() - start, result
+
+    requests = synthetic_requests(count)
+    sink = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext(), \
+            contextlib.redirect_stderr(sink) if quiet else contextlib.nullcontext():
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, requests))
+    elapsed = time.perf_counter() - started
+    http_client.close()
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    decisions: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    for _, result in outcomes:
+        decisions[result['decision']] = decisions.get(result['decision'], 0) + 1
+        if result.get('error'):
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+
+    return {
+        'requests': count,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 50) * 1000, 2),
+            'p90': round(_percentile(latencies, 90) * 1000, 2),
+            'p99': round(_percentile(latencies, 99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        'decisions': decisions,
+        'client_errors': errors,
+        'server': backend.stats,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server / load test")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help='Run the mock as an HTTP server')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=8089)
+    serve.add_argument('--profile', help='Profile JSON file')
+
+    bench = sub.add_parser('bench', help='Load-test OpenAIModerator in-process')
+    bench.add_argument('-n', '--requests', type=int, default=200)
+    bench.add_argument('-c', '--concurrency', type=int, default=8)
+    bench.add_argument('--retries', type=int, default=0, help='OpenAI client max_retries')
+    bench.add_argument('--profile', help='Profile JSON file')
+
+    args = parser.parse_args(argv)
+    profile = None
+    if args.profile:
+        with open(args.profile, 'r') as f:
+            profile = json.load(f)
+
+    if args.command == 'serve':
+        import uvicorn
+        uvicorn.run(create_app(MockChatBackend(profile)), host=args.host, port=args.port)
+    else:
+        report = run_load_test(args.requests, args.concurrency, profile, max_retries=args.retries)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# mock_overseerr.py - Overseerr API stand-in (media library + pending requests)
+#
+# Serves the endpoints PlexStaffAI calls so the library sync and the
+# moderation loop can be exercised without a real Overseerr:
+#
+#   GET  /api/v1/media?take=&skip=&filter=allavailable|available|partial
+#   GET  /api/v1/request?take=&skip=&filter=pending
+#   GET  /api/v1/request/{id}
+#   POST /api/v1/request/{id}/approve | /decline
+#
+# Usage:
+#   python -m app.mock_overseerr serve --port 5055 [--movies 5000 --shows 1000]
+#   OVERSEERR_API_URL=http://localhost:5055 OVERSEERR_API_KEY=mock ...
+
+import argparse
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.library_index import AVAILABLE, PARTIALLY_AVAILABLE
+
+PENDING_MEDIA = 2
+MEDIA_FILTERS = {
+    'allavailable': (AVAILABLE, PARTIALLY_AVAILABLE),
+    'available': (AVAILABLE,),
+    'partial': (PARTIALLY_AVAILABLE,),
+}
+# Overseerr MediaRequestStatus
+REQUEST_STATUS = {'pending': 1, 'approved': 2, 'declined': 3}
+REQUEST_PATH = re.compile(r'/api/v1/request/(\d+)(?:/(approve|decline))?/?$')
+
+
+def synthetic_library(movies: int = 500, shows: int = 100, seed: int = 11) -> List[Dict[str, Any]]:
+    """Media items shaped like Overseerr's /api/v1/media results"""
+    rng = random.Random(seed)
+    media = []
+    for i in range(movies):
+        media.append({'id': len(media) + 1, 'mediaType': 'movie', 'tmdbId': 100000 + i,
+                      'tvdbId': None, 'status': AVAILABLE})
+    for i in range(shows):
+        media.append({'id': len(media) + 1, 'mediaType': 'tv', 'tmdbId': 200000 + i,
+                      'tvdbId': 300000 + i,
+                      'status': AVAILABLE if rng.random() < 0.7 else PARTIALLY_AVAILABLE})
+    return media
+
+
+class MockOverseerrBackend:
+    """In-memory Overseerr; wrap with ``transport()`` or ``create_app()``"""
+
+    def __init__(self, media: Optional[List[Dict[str, Any]]] = None,
+                 requests: Optional[List[Dict[str, Any]]] = None, api_key: Optional[str] = None):
+        self.media = list(media if media is not None else synthetic_library())
+        self.requests = {r['id']: r for r in (requests or [])}
+        self.api_key = api_key
+        self._lock = threading.Lock()
+        self.stats = {'media_pages': 0, 'approved': 0, 'declined': 0}
+
+    def add_request(self, request_id: int, tmdb_id: int, media_type: str = 'movie',
+                    user_id: int = 1, username: str = 'mock', tvdb_id: Optional[int] = None):
+        self.requests[request_id] = {
+            'id': request_id,
+            'status': REQUEST_STATUS['pending'],
+            'media': {'mediaType': media_type, 'tmdbId': tmdb_id, 'tvdbId': tvdb_id, 'status': PENDING_MEDIA},
+            'requestedBy': {'id': user_id, 'displayName': username},
+        }
+
+    @staticmethod
+    def _page(items: List[Dict[str, Any]], take: int, skip: int) -> Dict[str, Any]:
+        take = max(take, 1)
+        return {
+            'pageInfo': {'pages': (len(items) + take - 1) // take, 'pageSize': take,
+                         'results': len(items), 'page': skip // take + 1},
+            'results': items[skip:skip + take],
+        }
+
+    def route(self, method: str, path: str, params: Dict[str, str],
+              api_key: Optional[str]) -> Tuple[int, Dict[str, Any]]:
+        if self.api_key and api_key != self.api_key:
+            return 403, {'message': 'You do not have permission to access this endpoint'}
+        take = int(params.get('take', 20))
+        skip = int(params.get('skip', 0))
+
+        if method == 'GET' and path.endswith('/api/v1/media'):
+            statuses = MEDIA_FILTERS.get(params.get('filter', 'allavailable'))
+            items = [m for m in self.media if statuses is None or m['status'] in statuses]
+            with self._lock:
+                self.stats['media_pages'] += 1
+            return 200, self._page(items, take, skip)
+
+        if method == 'GET' and path.endswith('/api/v1/request'):
+            wanted = REQUEST_STATUS.get(params.get('filter', 'pending'))
+            items = [r for r in self.requests.values() if wanted is None or r['status'] == wanted]
+            return 200, self._page(items, take, skip)
+
+        match = REQUEST_PATH.search(path)
+        if match:
+            request = self.requests.get(int(match.group(1)))
+            if request is None:
+                return 404, {'message': 'Request not found'}
+            action = match.group(2)
+            if method == 'GET' and action is None:
+                return 200, request
+            if method == 'POST' and action in ('approve', 'decline'):
+                status = 'approved' if action == 'approve' else 'declined'
+                with self._lock:
+                    request['status'] = REQUEST_STATUS[status]
+                    self.stats[status] += 1
+                return 200, request
+
+        return 404, {'message': 'Not found'}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """httpx.MockTransport handler"""
+        status, body = self.route(request.method, request.url.path, dict(request.url.params),
+                                  request.headers.get('X-Api-Key'))
+        return httpx.Response(status, json=body)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+
+def create_app(backend: Optional[MockOverseerrBackend] = None):
+    """FastAPI app exposing the backend as an Overseerr-compatible server"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    backend = backend or MockOverseerrBackend()
+    mock_app = FastAPI(title="PlexStaffAI mock Overseerr")
+
+    @mock_app.api_route("/api/v1/{path:path}", methods=["GET", "POST"])
+    async def api(path: str, request: Request):
+        status, body = backend.route(request.method, request.url.path, dict(request.query_params),
+                                     request.headers.get('X-Api-Key'))
+        return JSONResponse(content=body, status_code=status)
+
+    @mock_app.get("/mock/stats")
+    async def mock_stats():
+        return {'media': len(backend.media), 'requests': len(backend.requests), 'stats': backend.stats}
+
+    return mock_app
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Mock Overseerr API server")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='Run the mock as an HTTP server')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=5055)
+    serve.add_argument('--movies', type=int, default=500)
+    serve.add_argument('--shows', type=int, default=100)
+    serve.add_argument('--api-key', help='Require this X-Api-Key')
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    backend = MockOverseerrBackend(synthetic_library(args.movies, args.shows), api_key=args.api_key)
+    uvicorn.run(create_app(backend), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# naive_bayes.py - Incremental Naive Bayes over discretized request features
+
+import json
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Seuils des buckets (bornes hautes incluses)
+EPISODE_BUCKETS = (0, 13, 26, 50, 100)
+MAX_POPULARITY_BUCKET = 12
+
+
+def features(request_data: Dict[str, Any]) -> List[str]:
+    """Discrete ``name=value`` features of a request (one per genre)"""
+    media_type = request_data.get('media_type') or 'movie'
+    result = [f'media={media_type}']
+
+    rating = request_data.get('rating') or 0
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        rating = 0.0
+    result.append(f'rating={min(int(rating), 9)}' if rating > 0 else 'rating=none')
+
+    try:
+        popularity = max(float(request_data.get('popularity') or 0), 0.0)
+    except (TypeError, ValueError):
+        popularity = 0.0
+    result.append(f'pop={min(int(math.log2(popularity + 1)), MAX_POPULARITY_BUCKET)}')
+
+    year = str(request_data.get('year') or '')[:4]
+    result.append(f'decade={year[:3]}0' if year.isdigit() else 'decade=none')
+
+    if media_type == 'tv':
+        try:
+            episodes = int(request_data.get('episode_count') or 0)
+        except (TypeError, ValueError):
+            episodes = 0
+        bucket = next((str(b) for b in EPISODE_BUCKETS if episodes <= b), f'{EPISODE_BUCKETS[-1]}+')
+        result.append(f'episodes={bucket}')
+
+    for genre in dict.fromkeys(request_data.get('genres') or []):
+        if isinstance(genre, str) and genre:
+            result.append(f'genre={genre}')
+
+    requester = request_data.get('user_id') or request_data.get('requested_by')
+    if requester not in (None, '', 'unknown', 'Unknown'):
+        result.append(f'user={requester}')
+    return result
+
+
+class NaiveBayes:
+    """Naive Bayes over binary features with Laplace smoothing, trained incrementally.
+
+    Only the features present in a request are scored (absent ones add
+    nothing), each as P(feature | decision) from per-class counts.
+    Counts live in two small WITHOUT ROWID tables of feedback.db
+    (``nb_class_counts``, ``nb_feature_counts``) and in memory. ``update``
+    adds one batch of feedback inside the caller's transaction - O(features)
+    per row - and ``apply`` swaps the in-memory counts once it committed.
+    Scoring only touches dicts: class and feature counts are published
+    together as one ``(classes, features)`` tuple that is never mutated
+    after the swap, so a prediction always sees a consistent pair.
+    """
+
+    def __init__(self, alpha: float = 1.0, min_samples: int = 30):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self._lock = threading.Lock()   # sérialise les writers (load / apply)
+        self._tables: Tuple[Dict[str, int], Dict[str, Dict[str, int]]] = ({}, {})
+
+    # ----- persistence -----
+
+    @staticmethod
+    def init_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS nb_class_counts (
+                decision TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS nb_feature_counts (
+                feature TEXT NOT NULL,
+                decision TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (feature, decision)
+            ) WITHOUT ROWID
+        """)
+
+    def load(self, conn) -> int:
+        classes = dict(conn.execute("SELECT decision, count FROM nb_class_counts").fetchall())
+        feature_counts: Dict[str, Dict[str, int]] = {}
+        for feature, decision, count in conn.execute("SELECT feature, decision, count FROM nb_feature_counts"):
+            feature_counts.setdefault(feature, {})[decision] = count
+        with self._lock:
+            self._tables = (classes, feature_counts)
+        return sum(classes.values())
+
+    def update(self, conn, rows: Iterable[Tuple[Any, str]]) -> Tuple[Dict[str, int], Dict[Tuple[str, str], int]]:
+        """Add (request_data, decision) rows to the count tables (caller commits)"""
+        class_delta: Dict[str, int] = {}
+        feature_delta: Dict[Tuple[str, str], int] = {}
+        for request_data, decision in rows:
+            if isinstance(request_data, str):
+                try:
+                    request_data = json.loads(request_data)
+                except ValueError:
+                    continue
+            if not decision or not isinstance(request_data, dict):
+                continue
+            class_delta[decision] = class_delta.get(decision, 0) + 1
+            for feature in features(request_data):
+                key = (feature, decision)
+                feature_delta[key] = feature_delta.get(key, 0) + 1
+
+        conn.executemany("""
+            INSERT INTO nb_class_counts (decision, count) VALUES (?, ?)
+            ON CONFLICT(decision) DO UPDATE SET count = count + excluded.count
+        """, class_delta.items())
+        conn.executemany("""
+            INSERT INTO nb_feature_counts (feature, decision, count) VALUES (?, ?, ?)
+            ON CONFLICT(feature, decision) DO UPDATE SET count = count + excluded.count
+        """, [(feature, decision, count) for (feature, decision), count in feature_delta.items()])
+        return class_delta, feature_delta
+
+    def apply(self, delta: Tuple[Dict[str, int], Dict[Tuple[str, str], int]]):
+        """Merge a committed ``update`` into fresh in-memory tables and swap them in.
+
+        Copy-on-write per feature: only the count dicts the delta touches are
+        copied; the others are shared with the previous tables. The outer
+        dict is still copied (a shallow copy, references only).
+        """
+        class_delta, feature_delta = delta
+        with self._lock:
+            current_classes, current_features = self._tables
+            classes = dict(current_classes)
+            feature_counts = dict(current_features)
+            for decision, count in class_delta.items():
+                classes[decision] = classes.get(decision, 0) + count
+            copied = set()
+            for (feature, decision), count in feature_delta.items():
+                if feature not in copied:
+                    feature_counts[feature] = dict(current_features.get(feature, ()))
+                    copied.add(feature)
+                counts = feature_counts[feature]
+                counts[decision] = counts.get(decision, 0) + count
+            # Une seule affectation : les lecteurs voient l'ancienne paire ou la nouvelle
+            self._tables = (classes, feature_counts)
+
+    # ----- scoring -----
+
+    def predict(self, request_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Most probable decision and its posterior (None without enough evidence)"""
+        classes, feature_counts = self._tables
+        total = sum(classes.values())
+        if total < self.min_samples or len(classes) < 2:
+            return None
+
+        alpha = self.alpha
+        scores = {decision: math.log(count / total) for decision, count in classes.items()}
+        evidence = []
+        for feature in features(request_data):
+            counts = feature_counts.get(feature)
+            if not counts:
+                continue  # jamais vu : n'informe aucune classe
+            for decision, class_count in classes.items():
+                scores[decision] += math.log((counts.get(decision, 0) + alpha) / (class_count + 2 * alpha))
+            evidence.append(feature)
+
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        posterior = 1.0 / sum(math.exp(score - top) for score in scores.values())
+
+        # Features pesant le plus vers la décision retenue (pour la raison)
+        def lift(feature):
+            counts = feature_counts[feature]
+            best_rate = (counts.get(best, 0) + alpha) / (classes[best] + 2 * alpha)
+            other = sum(counts.values()) - counts.get(best, 0)
+            other_rate = (other + alpha) / (total - classes[best] + 2 * alpha)
+            return best_rate / other_rate
+
+        return {
+            'decision': best,
+            'confidence': posterior,
+            'samples': total,
+            'features': sorted(evidence, key=lift, reverse=True)[:3],
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        classes, feature_counts = self._tables
+        return {
+            'samples': sum(classes.values()),
+            'classes': dict(classes),
+            'features': len(feature_counts),
+            'min_samples': self.min_samples,
+            'alpha': self.alpha,
+        }
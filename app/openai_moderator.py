@@ -1,24 +1,132 @@
 from openai import OpenAI
 import os
 import json
-from typing import Dict
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+DECISIONS = ('APPROVED', 'REJECTED', 'NEEDS_REVIEW')
+
+# JSON schema imposé via Structured Outputs (strict = toutes les clés requises)
+VERDICT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'decision': {'type': 'string', 'enum': list(DECISIONS)},
+        'confidence': {'type': 'number'},
+        'reason': {'type': 'string'},
+        'detailed_reasoning': {'type': 'string'},
+        'risk_factors': {
+            'type': 'object',
+            'properties': {
+                'quality_risk': {'type': 'number'},
+                'storage_risk': {'type': 'number'},
+                'appropriateness_risk': {'type': 'number'},
+                'user_trust_risk': {'type': 'number'},
+            },
+            'required': ['quality_risk', 'storage_risk', 'appropriateness_risk', 'user_trust_risk'],
+            'additionalProperties': False,
+        },
+        'value_score': {'type': 'number'},
+    },
+    'required': ['decision', 'confidence', 'reason', 'detailed_reasoning', 'risk_factors', 'value_score'],
+    'additionalProperties': False,
+}
+
+# $ / 1M tokens (input, output) - même tarifs que /staff/openai-stats
+MODEL_PRICING = {
+    'gpt-4o-mini': (0.150, 0.600),
+    'gpt-4o': (2.50, 10.00),
+}
+
+
+def model_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a call (longest matching MODEL_PRICING prefix, gpt-4o-mini otherwise)"""
+    pricing = next(
+        (price for name, price in sorted(MODEL_PRICING.items(), key=lambda kv: -len(kv[0]))
+         if (model or '').startswith(name)),
+        MODEL_PRICING['gpt-4o-mini']
+    )
+    return (prompt_tokens * pricing[0] + completion_tokens * pricing[1]) / 1_000_000
+
+
+class VerdictSchemaError(ValueError):
+    """AI response is valid JSON but does not match VERDICT_SCHEMA"""
+
+
+def parse_verdict(content: str) -> Dict:
+    """Parse + validate an AI verdict (raises JSONDecodeError / VerdictSchemaError)"""
+    result = json.loads(content)
+    if not isinstance(result, dict):
+        raise VerdictSchemaError(f"expected an object, got {type(result).__name__}")
+
+    decision = result.get('decision')
+    if decision not in DECISIONS:
+        raise VerdictSchemaError(f"invalid decision: {decision!r}")
+
+    confidence = result.get('confidence')
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+        raise VerdictSchemaError(f"invalid confidence: {confidence!r}")
+
+    reason = result.get('reason')
+    if not isinstance(reason, str) or not reason.strip():
+        raise VerdictSchemaError("missing reason")
+
+    risk_factors = result.get('risk_factors')
+    if not isinstance(risk_factors, dict):
+        risk_factors = {
+            'quality_risk': 5,
+            'storage_risk': 5,
+            'appropriateness_risk': 5,
+            'user_trust_risk': 5
+        }
+
+    value_score = result.get('value_score', 5.0)
+    if isinstance(value_score, bool) or not isinstance(value_score, (int, float)):
+        value_score = 5.0
+
+    detailed_reasoning = result.get('detailed_reasoning')
+    if not isinstance(detailed_reasoning, str):
+        detailed_reasoning = reason
+
+    return {
+        'decision': decision,
+        'confidence': max(0.0, min(1.0, float(confidence))),
+        'reason': reason[:150],
+        'detailed_reasoning': detailed_reasoning[:300],
+        'risk_factors': risk_factors,
+        'value_score': float(value_score),
+    }
+
 
 class OpenAIModerator:
     """OpenAI-powered primary content moderation with deep reasoning"""
     
-    def __init__(self, api_key: str = None):  # 🆕 Accepte api_key optionnel
+    def __init__(self, api_key: str = None, base_url: str = None, http_client=None):
         """
         Initialize OpenAI Moderator
         
         Args:
             api_key: OpenAI API key (optional, falls back to env var)
+            base_url: OpenAI-compatible endpoint (optional, falls back to
+                OPENAI_BASE_URL; used to target app.mock_openai offline)
+            http_client: custom httpx.Client (e.g. with a MockTransport)
         """
         # 🆕 Utilise api_key passé OU variable d'environnement
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
         
         if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
-            print("✅ OpenAI client initialized")
+            client_kwargs = {
+                'api_key': self.api_key,
+                'max_retries': int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+            }
+            if self.base_url:
+                client_kwargs['base_url'] = self.base_url
+            if http_client is not None:
+                client_kwargs['http_client'] = http_client
+            self.client = OpenAI(**client_kwargs)
+            print(f"✅ OpenAI client initialized{f' ({self.base_url})' if self.base_url else ''}")
         else:
             self.client = None
             print("⚠️  OpenAI API key not provided")
@@ -26,10 +134,44 @@ class OpenAIModerator:
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # 🆕 Configurable
         self.temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))  # 🆕 Configurable
         self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "300"))  # 🆕 Configurable
+        # Structured Outputs (json_schema strict); "false" → legacy json_object
+        self.structured_outputs = os.getenv("OPENAI_STRUCTURED_OUTPUTS", "true").lower() == "true"
+        # Retry budget for schema violations (capped at 1, shorter prompt)
+        self.schema_retries = max(0, min(1, int(os.getenv("OPENAI_SCHEMA_RETRIES", "1"))))
+        # Plafond de max_tokens quand une réponse tronquée (finish_reason 'length') est relancée
+        self.max_tokens_ceiling = max(self.max_tokens, int(os.getenv("OPENAI_MAX_TOKENS_CEILING", "1200")))
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,            # moderate() calls reaching the API
+            'api_calls': 0,           # completions incl. retries
+            'api_errors': 0,
+            'parse_failures': 0,      # JSONDecodeError
+            'schema_violations': 0,   # valid JSON, invalid verdict
+            'refusals': 0,
+            'truncations': 0,         # finish_reason 'length' (max_tokens reached)
+            'retries': 0,
+            'retry_successes': 0,
+            'unresolved': 0,          # still invalid after the retry budget
+        }
+        self.usage = {'total_calls': 0, 'total_tokens': 0, 'total_cost': 0.0, 'by_model': {}}
+        self.recent_calls = deque(maxlen=50)
+        # Optional hook(model, prompt_tokens, completion_tokens), e.g. the budget governor
+        self.usage_callback = None
     
-    def moderate(self, request_data: Dict) -> Dict:
+    def moderate(self, request_data: Dict, model: str = None) -> Dict:
         """
         Analyse primaire avec OpenAI - raisonnement complet
+
+        Args:
+            model: override du modèle pour cet appel (ex: modèle moins cher
+                imposé par le budget governor)
+
+        Le verdict est contraint par VERDICT_SCHEMA (Structured Outputs). Une
+        réponse non parsable ou hors schéma déclenche au plus une relance
+        avec un prompt court avant de tomber en NEEDS_REVIEW. Une réponse
+        tronquée (finish_reason 'length') est relancée avec un max_tokens
+        doublé (plafonné à ``max_tokens_ceiling``), jamais réduit.
         
         Returns:
             {
@@ -39,7 +181,9 @@ class OpenAIModerator:
                 'detailed_reasoning': str,
                 'risk_factors': {...},
                 'value_score': float,
-                'model_used': str
+                'model_used': str,
+                'tokens_used': int,
+                'attempts': int
             }
         """
         if not self.client:
@@ -50,32 +194,126 @@ class OpenAIModerator:
                 'detailed_reasoning': 'API key missing',
                 'model_used': 'none'
             }
-        
+
+        model = model or self.model
+        self._bump('requests')
+        tokens_used = 0
+        attempts = 0
+        last_error = None
+
         try:
-            # Prépare contexte riche
-            title = request_data.get('title', 'Unknown')
-            media_type = request_data.get('media_type', 'unknown')
-            year = request_data.get('year', 'N/A')
-            rating = request_data.get('rating', 0)
-            popularity = request_data.get('popularity', 0)
-            genres = ', '.join(request_data.get('genres', []))
-            seasons = request_data.get('season_count', 0)
-            episodes = request_data.get('episode_count', 0)
-            user = request_data.get('requested_by', 'Unknown')
-            user_age_days = request_data.get('user_age_days', 0)
-            
-            # Classification utilisateur
-            if user_age_days < 7:
-                user_trust = "NEW (less than 1 week)"
-            elif user_age_days < 30:
-                user_trust = "RECENT (less than 1 month)"
-            elif user_age_days < 365:
-                user_trust = "ESTABLISHED (less than 1 year)"
-            else:
-                user_trust = "TRUSTED (over 1 year)"
-            
-            # 🎯 Prompt Engineering - Analyse Profonde
-            system_prompt = """You are an expert media content curator and moderator for a personal Plex server.
+            system_prompt, user_prompt = self.build_prompts(request_data)
+            max_tokens = self.max_tokens
+
+            truncated = False
+
+            while attempts <= self.schema_retries:
+                attempts += 1
+                if attempts > 1:
+                    self._bump('retries')
+                    system_prompt, user_prompt = self.build_retry_prompts(request_data)
+                    if truncated:
+                        # Même schéma strict : il faut plus de place, pas moins
+                        max_tokens = min(max_tokens * 2, self.max_tokens_ceiling)
+                    print(f"🔁 Retrying OpenAI with short prompt ({last_error}, max_tokens={max_tokens})")
+
+                # ✨ Appel OpenAI avec nouvelle API
+                print(f"\n🤖 {'='*60}")
+                print(f"🤖 CONSULTING OPENAI {model.upper()}...")
+                print(f"🤖 {'='*60}")
+
+                content, refusal, tokens, finish_reason = self._complete(
+                    model, system_prompt, user_prompt, max_tokens)
+                tokens_used += tokens
+                truncated = finish_reason == 'length'
+
+                try:
+                    if truncated:
+                        # Réponse coupée à max_tokens : pas une erreur de schéma
+                        self._bump('truncations')
+                        last_error = f"truncated at max_tokens={max_tokens}"
+                        print(f"❌ OpenAI response truncated (max_tokens={max_tokens})")
+                        continue
+                    if refusal:
+                        self._bump('refusals')
+                        raise VerdictSchemaError(f"model refusal: {refusal[:80]}")
+                    verdict = parse_verdict(content)
+                except json.JSONDecodeError as e:
+                    self._bump('parse_failures')
+                    last_error = f"JSON parse error: {e}"
+                    print(f"❌ OpenAI JSON parse error: {e}")
+                    print(f"Raw response: {content}")
+                    continue
+                except VerdictSchemaError as e:
+                    self._bump('schema_violations')
+                    last_error = f"schema violation: {e}"
+                    print(f"❌ OpenAI schema violation: {e}")
+                    continue
+
+                if attempts > 1:
+                    self._bump('retry_successes')
+                self._log_verdict(verdict)
+                return {
+                    **verdict,
+                    'model_used': model,
+                    'tokens_used': tokens_used,
+                    'attempts': attempts
+                }
+
+            self._bump('unresolved')
+            return {
+                'decision': 'NEEDS_REVIEW',
+                'confidence': 0.0,
+                'reason': 'AI response parse error',
+                'detailed_reasoning': last_error or 'Invalid AI response',
+                'model_used': model,
+                'tokens_used': tokens_used,
+                'attempts': attempts,
+                'error': 'parse'
+            }
+
+        except Exception as e:
+            self._bump('api_errors')
+            print(f"❌ OpenAI error: {e}")
+            import traceback
+            traceback.print_exc()  # 🆕 Pour debug
+            return {
+                'decision': 'NEEDS_REVIEW',
+                'confidence': 0.0,
+                'reason': f'AI error: {str(e)[:50]}',
+                'detailed_reasoning': str(e),
+                'model_used': model,
+                'tokens_used': tokens_used,
+                'attempts': attempts,
+                'error': 'api'
+            }
+
+    def build_prompts(self, request_data: Dict) -> Tuple[str, str]:
+        """Prompt complet (system, user) pour la première tentative"""
+        # Prépare contexte riche
+        title = request_data.get('title', 'Unknown')
+        media_type = request_data.get('media_type', 'unknown')
+        year = request_data.get('year', 'N/A')
+        rating = request_data.get('rating', 0)
+        popularity = request_data.get('popularity', 0)
+        genres = ', '.join(request_data.get('genres', []))
+        seasons = request_data.get('season_count', 0)
+        episodes = request_data.get('episode_count', 0)
+        user = request_data.get('requested_by', 'Unknown')
+        user_age_days = request_data.get('user_age_days', 0)
+        
+        # Classification utilisateur
+        if user_age_days < 7:
+            user_trust = "NEW (less than 1 week)"
+        elif user_age_days < 30:
+            user_trust = "RECENT (less than 1 month)"
+        elif user_age_days < 365:
+            user_trust = "ESTABLISHED (less than 1 year)"
+        else:
+            user_trust = "TRUSTED (over 1 year)"
+        
+        # 🎯 Prompt Engineering - Analyse Profonde
+        system_prompt = """You are an expert media content curator and moderator for a personal Plex server.
 
 Your role is to evaluate content requests with nuanced judgment, considering:
 
@@ -118,7 +356,7 @@ Respond with valid JSON:
   "value_score": 0-10
 }"""
 
-            user_prompt = f"""Evaluate this media request with full context:
+        user_prompt = f"""Evaluate this media request with full context:
 
 📺 CONTENT PROFILE:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -147,87 +385,135 @@ Analyze this request deeply and provide:
 
 Think step-by-step about quality, storage impact, user trust, and appropriateness."""
 
-            # ✨ Appel OpenAI avec nouvelle API
-            print(f"\n🤖 {'='*60}")
-            print(f"🤖 CONSULTING OPENAI {self.model.upper()}...")
-            print(f"🤖 {'='*60}")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                response_format={"type": "json_object"}  # Force JSON response
-            )
-            
-            # Parse réponse (nouvelle syntaxe)
-            content = response.choices[0].message.content.strip()
-            
-            result = json.loads(content)
-            
-            # Validation et extraction
-            decision = result.get('decision', 'NEEDS_REVIEW')
-            if decision not in ['APPROVED', 'REJECTED', 'NEEDS_REVIEW']:
-                decision = 'NEEDS_REVIEW'
-            
-            confidence = float(result.get('confidence', 0.5))
-            confidence = max(0.0, min(1.0, confidence))
-            
-            reason = result.get('reason', 'OpenAI analysis')[:150]
-            detailed_reasoning = result.get('detailed_reasoning', reason)[:300]
-            
-            risk_factors = result.get('risk_factors', {
-                'quality_risk': 5,
-                'storage_risk': 5,
-                'appropriateness_risk': 5,
-                'user_trust_risk': 5
-            })
-            
-            value_score = float(result.get('value_score', 5.0))
-            
-            # Logs
-            print(f"🤖 AI Decision: {decision}")
-            print(f"🤖 Confidence: {confidence:.1%}")
-            print(f"🤖 Reason: {reason}")
-            print(f"🤖 Value Score: {value_score}/10")
-            print(f"🤖 Risk Profile:")
-            print(f"   - Quality: {risk_factors.get('quality_risk', 0)}/10")
-            print(f"   - Storage: {risk_factors.get('storage_risk', 0)}/10")
-            print(f"   - Appropriateness: {risk_factors.get('appropriateness_risk', 0)}/10")
-            print(f"   - User Trust: {risk_factors.get('user_trust_risk', 0)}/10")
-            print(f"🤖 {'='*60}\n")
-            
-            return {
-                'decision': decision,
-                'confidence': confidence,
-                'reason': reason,
-                'detailed_reasoning': detailed_reasoning,
-                'risk_factors': risk_factors,
-                'value_score': value_score,
-                'model_used': self.model
-            }
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ OpenAI JSON parse error: {e}")
-            print(f"Raw response: {content if 'content' in locals() else 'N/A'}")
+        return system_prompt, user_prompt
+
+    def build_retry_prompts(self, request_data: Dict) -> Tuple[str, str]:
+        """Prompt court pour la relance après une réponse invalide"""
+        genres = ', '.join(request_data.get('genres', []))
+        system_prompt = (
+            "You moderate media requests for a personal Plex server. "
+            "Answer ONLY with a JSON object with keys: decision "
+            "(APPROVED, REJECTED or NEEDS_REVIEW), confidence (0.0-1.0), reason, "
+            "detailed_reasoning, risk_factors {quality_risk, storage_risk, "
+            "appropriateness_risk, user_trust_risk} (0-10) and value_score (0-10)."
+        )
+        user_prompt = (
+            f"{request_data.get('title', 'Unknown')} ({request_data.get('media_type', 'unknown')}, "
+            f"{request_data.get('year', 'N/A')}) | rating {request_data.get('rating', 0)}/10 | "
+            f"popularity {request_data.get('popularity', 0)} | genres: {genres} | "
+            f"{request_data.get('season_count', 0)} seasons, {request_data.get('episode_count', 0)} episodes | "
+            f"user account age {request_data.get('user_age_days', 0)} days"
+        )
+        return system_prompt, user_prompt
+
+    def _response_format(self) -> Dict:
+        if self.structured_outputs:
             return {
-                'decision': 'NEEDS_REVIEW',
-                'confidence': 0.0,
-                'reason': 'AI response parse error',
-                'detailed_reasoning': str(e),
-                'model_used': self.model
+                'type': 'json_schema',
+                'json_schema': {'name': 'moderation_verdict', 'strict': True, 'schema': VERDICT_SCHEMA}
             }
-        except Exception as e:
-            print(f"❌ OpenAI error: {e}")
-            import traceback
-            traceback.print_exc()  # 🆕 Pour debug
-            return {
-                'decision': 'NEEDS_REVIEW',
-                'confidence': 0.0,
-                'reason': f'AI error: {str(e)[:50]}',
-                'detailed_reasoning': str(e),
-                'model_used': self.model
+        return {"type": "json_object"}  # Force JSON response
+
+    def _complete(self, model: str, system_prompt: str, user_prompt: str,
+                  max_tokens: int) -> Tuple[str, Optional[str], int, Optional[str]]:
+        """One chat completion → (content, refusal, total_tokens, finish_reason)"""
+        self._bump('api_calls')
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=self.temperature,
+            max_tokens=max_tokens,
+            response_format=self._response_format()
+        )
+
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        self._record_usage(getattr(response, 'model', None) or model, prompt_tokens, completion_tokens)
+
+        choice = response.choices[0]
+        message = choice.message
+        # Parse réponse (nouvelle syntaxe)
+        content = (message.content or '').strip()
+        refusal = getattr(message, 'refusal', None)
+        return content, refusal, prompt_tokens + completion_tokens, getattr(choice, 'finish_reason', None)
+
+    def _log_verdict(self, verdict: Dict):
+        risk_factors = verdict['risk_factors']
+        # Logs
+        print(f"🤖 AI Decision: {verdict['decision']}")
+        print(f"🤖 Confidence: {verdict['confidence']:.1%}")
+        print(f"🤖 Reason: {verdict['reason']}")
+        print(f"🤖 Value Score: {verdict['value_score']}/10")
+        print(f"🤖 Risk Profile:")
+        print(f"   - Quality: {risk_factors.get('quality_risk', 0)}/10")
+        print(f"   - Storage: {risk_factors.get('storage_risk', 0)}/10")
+        print(f"   - Appropriateness: {risk_factors.get('appropriateness_risk', 0)}/10")
+        print(f"   - User Trust: {risk_factors.get('user_trust_risk', 0)}/10")
+        print(f"🤖 {'='*60}\n")
+
+    # ===== STATS =====
+
+    def _bump(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _record_usage(self, model: str, prompt_tokens: int, completion_tokens: int):
+        cost = model_cost(model, prompt_tokens, completion_tokens)
+        total_tokens = prompt_tokens + completion_tokens
+
+        with self._stats_lock:
+            self.usage['total_calls'] += 1
+            self.usage['total_tokens'] += total_tokens
+            self.usage['total_cost'] += cost
+            per_model = self.usage['by_model'].setdefault(model, {'calls': 0, 'tokens': 0, 'cost': 0.0})
+            per_model['calls'] += 1
+            per_model['tokens'] += total_tokens
+            per_model['cost'] += cost
+            self.recent_calls.appendleft({
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'model': model,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': total_tokens,
+                'cost': cost
+            })
+
+        if self.usage_callback:
+            try:
+                self.usage_callback(model, prompt_tokens, completion_tokens)
+            except Exception as e:
+                print(f"⚠️  Usage callback failed: {e}")
+
+    def get_quality_stats(self) -> Dict:
+        """Parse-failure / schema-violation / retry rates"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        requests = stats['requests'] or 1
+        api_calls = stats['api_calls'] or 1
+        stats.update({
+            'structured_outputs': self.structured_outputs,
+            'schema_retries': self.schema_retries,
+            'parse_failure_rate': round((stats['parse_failures'] + stats['schema_violations']) / api_calls, 4),
+            'truncation_rate': round(stats['truncations'] / api_calls, 4),
+            'retry_rate': round(stats['retries'] / requests, 4),
+            'retry_success_rate': round(stats['retry_successes'] / stats['retries'], 4) if stats['retries'] else 0.0,
+            'unresolved_rate': round(stats['unresolved'] / requests, 4),
+        })
+        return stats
+
+    def get_usage_stats(self) -> Dict:
+        """Stats consommées par /staff/openai-stats"""
+        with self._stats_lock:
+            usage = {
+                'total_calls': self.usage['total_calls'],
+                'total_tokens': self.usage['total_tokens'],
+                'total_cost': self.usage['total_cost'],
+                'by_model': {model: dict(data) for model, data in self.usage['by_model'].items()},
+                'recent_calls': list(self.recent_calls),
             }
+        usage['quality'] = self.get_quality_stats()
+        return usage
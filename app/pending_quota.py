@@ -0,0 +1,155 @@
+# pending_quota.py - Per-user pending review counter (new_user_restrictions.max_pending_requests)
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from app.db import shared
+
+
+# Triggers : le compteur bouge dans la même transaction que pending_reviews,
+# quel que soit le chemin d'écriture (save_for_review, staff, cleanup...).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_pending (
+    username TEXT PRIMARY KEY,
+    pending INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- INSERT OR REPLACE supprime l'ancienne ligne sans déclencher les triggers DELETE
+CREATE TRIGGER IF NOT EXISTS user_pending_replace
+BEFORE INSERT ON pending_reviews
+BEGIN
+    UPDATE user_pending SET pending = pending - 1
+    WHERE username = (
+        SELECT username FROM pending_reviews
+        WHERE request_id = NEW.request_id AND status = 'pending'
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_pending_insert
+AFTER INSERT ON pending_reviews
+WHEN NEW.status = 'pending' AND NEW.username IS NOT NULL
+BEGIN
+    INSERT INTO user_pending (username, pending) VALUES (NEW.username, 1)
+    ON CONFLICT(username) DO UPDATE SET pending = pending + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_pending_update
+AFTER UPDATE OF status, username ON pending_reviews
+WHEN OLD.status IS NOT NEW.status OR OLD.username IS NOT NEW.username
+BEGIN
+    UPDATE user_pending SET pending = pending - 1
+    WHERE OLD.status = 'pending' AND username = OLD.username;
+    INSERT INTO user_pending (username, pending)
+    SELECT NEW.username, 1 WHERE NEW.status = 'pending' AND NEW.username IS NOT NULL
+    ON CONFLICT(username) DO UPDATE SET pending = pending + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_pending_delete
+AFTER DELETE ON pending_reviews
+WHEN OLD.status = 'pending'
+BEGIN
+    UPDATE user_pending SET pending = pending - 1 WHERE username = OLD.username;
+END;
+"""
+
+
+def account_age_days(created_at: Any) -> Optional[int]:
+    """Age of an Overseerr account from requestedBy.createdAt (None if unknown)"""
+    if not created_at:
+        return None
+    try:
+        created = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return max((datetime.now(timezone.utc) - created).days, 0)
+
+
+class PendingQuota:
+    """Pending reviews per username, mirrored in memory.
+
+    ``user_pending`` is maintained by triggers on ``pending_reviews`` and
+    rebuilt from it at startup; the in-memory copy is refreshed after each
+    commit that touches a user's reviews, so the quota check made before
+    TMDB/OpenAI is a dict read.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self.init_database()
+        self.load()
+
+    def init_database(self):
+        conn = shared(self.db_path).connect()
+        try:
+            conn.executescript(SCHEMA)
+            # Resynchronise (reviews créées avant les triggers)
+            conn.execute("DELETE FROM user_pending")
+            conn.execute("""
+                INSERT INTO user_pending (username, pending)
+                SELECT username, COUNT(*) FROM pending_reviews
+                WHERE status = 'pending' AND username IS NOT NULL
+                GROUP BY username
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self) -> int:
+        conn = shared(self.db_path).connect()
+        try:
+            rows = conn.execute("SELECT username, pending FROM user_pending WHERE pending > 0").fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            self._pending = dict(rows)
+        return len(rows)
+
+    def refresh(self, usernames: Iterable[Optional[str]]):
+        """Re-read the counters of ``usernames`` after a committed write"""
+        usernames = [u for u in set(usernames) if u]
+        if not usernames:
+            return
+        conn = shared(self.db_path).connect()
+        try:
+            rows = dict(conn.execute(
+                f"SELECT username, pending FROM user_pending WHERE username IN ({','.join('?' * len(usernames))})",
+                usernames,
+            ).fetchall())
+        finally:
+            conn.close()
+        with self._lock:
+            for username in usernames:
+                if rows.get(username, 0) > 0:
+                    self._pending[username] = rows[username]
+                else:
+                    self._pending.pop(username, None)
+
+    def pending(self, username: str) -> int:
+        return self._pending.get(username, 0)
+
+    def check(self, username: str, user_age_days: int, config) -> Optional[Dict[str, Any]]:
+        """Over-quota details for a new user, None when the request may proceed"""
+        levels = config.get('ai_rules.user_trust_levels', {}) or {}
+        limit = (levels.get('new_user_restrictions') or {}).get('max_pending_requests')
+        if limit is None or not username or username == 'Unknown':
+            return None
+        if user_age_days >= levels.get('new_user_days', 30):
+            return None
+        pending = self.pending(username)
+        if pending < limit:
+            return None
+        return {'pending': pending, 'limit': limit}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = dict(self._pending)
+        return {
+            'users_with_pending': len(pending),
+            'pending_reviews': sum(pending.values()),
+            'top': sorted(pending.items(), key=lambda item: -item[1])[:10],
+        }
@@ -0,0 +1,68 @@
+# processed_requests.py - Which Overseerr requests already have a decision (webhook dedup)
+
+import threading
+from typing import Any, Dict, Optional, Set
+
+from app.db import shared
+
+
+class ProcessedRequests:
+    """request_ids present in ``decisions``, kept as an in-memory set.
+
+    ``load()`` fills it once (covering scan of idx_decisions_request_ts) and
+    ``add()`` is called after every committed decision insert, so a webhook
+    pays a set lookup instead of re-reading the whole history. An id missing
+    from the set is confirmed with an indexed EXISTS - rows written by
+    another process (CLI, second worker) are still seen - and cached when
+    found.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._ids: Set[int] = set()
+        self.lookups = 0
+        self.db_checks = 0
+        self.load()
+
+    def load(self) -> int:
+        conn = shared(self.db_path).connect()
+        try:
+            rows = conn.execute("SELECT DISTINCT request_id FROM decisions WHERE request_id IS NOT NULL")
+            ids = {row[0] for row in rows}
+        finally:
+            conn.close()
+        with self._lock:
+            self._ids = ids
+        return len(ids)
+
+    def add(self, request_id: Optional[int]):
+        if request_id is not None:
+            with self._lock:
+                self._ids.add(int(request_id))
+
+    def contains(self, request_id: Optional[int]) -> bool:
+        if request_id is None:
+            return False
+        request_id = int(request_id)
+        self.lookups += 1
+        if request_id in self._ids:
+            return True
+        self.db_checks += 1
+        conn = shared(self.db_path).connect()
+        try:
+            found = conn.execute(
+                "SELECT EXISTS(SELECT 1 FROM decisions WHERE request_id = ?)", (request_id,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        if found:
+            self.add(request_id)
+        return bool(found)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'requests': len(self._ids),
+            'lookups': self.lookups,
+            'db_checks': self.db_checks,
+        }
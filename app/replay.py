@@ -0,0 +1,295 @@
+# replay.py - What-if replay of historic decisions through a candidate config
+#
+#   python -m app.replay --config candidate.yaml [--baseline /config/config.yaml]
+
+import argparse
+import contextlib
+import io
+import json
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config_loader import ConfigManager
+from app.feature_store import (FLAG_ACTION_FAILED, FLAG_MANUAL, FLAG_NOT_CONTENT, FEATURES_PATH,
+                               FeatureStore)
+from app.rules_batch import (APPROVED, DECISION_NAMES, NEEDS_REVIEW, NO_RULE, REJECTED,
+                             UPCOMING_RELEASE, RecordBatch, evaluate_batch, plan_genre_vocab)
+from app.rules_validator import RulePlan
+from app.similarity import is_content_decision
+
+DB_PATH = "/config/moderation.db"
+FEEDBACK_DB_PATH = "/config/feedback.db"
+
+# Décisions qui n'ont jamais coûté d'appel OpenAI ni reflété le contenu
+# (staff, incident, bibliothèque, réutilisation, trust tier, budget local) :
+# rien à rejouer, même filtre que l'index de similarité
+OUTCOMES = ('APPROVED', 'REJECTED', 'NEEDS_REVIEW')
+NOT_REPLAYED_FLAGS = FLAG_MANUAL | FLAG_ACTION_FAILED | FLAG_NOT_CONTENT
+
+
+def _rule_name(plan: RulePlan, strict_rule: int) -> str:
+    if strict_rule == UPCOMING_RELEASE:
+        return 'upcoming_release'
+    return plan.strict_rules[strict_rule].rule_id
+
+
+class ReplayReport:
+    """Counters accumulated chunk by chunk (memory does not grow with history)"""
+
+    def __init__(self):
+        self.rows_scanned = 0
+        self.rows_replayed = 0
+        self.flips_by_rule = Counter()
+        self.transitions = Counter()
+        self.to_ai_by_rule = Counter()
+        self.from_ai_by_rule = Counter()
+        self.baseline_ai_calls = 0
+        self.candidate_ai_calls = 0
+        self.reviewed = 0
+        self.agree = Counter()
+        self.candidate_unknown = 0
+        self.source = 'decisions'
+
+    def as_dict(self, elapsed: float) -> Dict[str, Any]:
+        def rate(key: str, total: int) -> Optional[float]:
+            return round(self.agree[key] / total, 4) if total else None
+
+        candidate_known = self.reviewed - self.candidate_unknown
+        return {
+            'source': self.source,
+            'rows_scanned': self.rows_scanned,
+            'rows_replayed': self.rows_replayed,
+            'flips': {
+                'total': sum(self.flips_by_rule.values()),
+                'by_rule': dict(self.flips_by_rule.most_common()),
+                'transitions': dict(self.transitions.most_common()),
+            },
+            'openai_calls': {
+                'baseline': self.baseline_ai_calls,
+                'candidate': self.candidate_ai_calls,
+                'projected_saved': self.baseline_ai_calls - self.candidate_ai_calls,
+                # Requêtes que le candidat envoie à OpenAI (règle stricte perdue)…
+                'added_by_rule': dict(self.to_ai_by_rule.most_common()),
+                # …et celles qu'une règle stricte du candidat lui évite
+                'saved_by_rule': dict(self.from_ai_by_rule.most_common()),
+            },
+            'human_agreement': {
+                'reviewed': self.reviewed,
+                'historic': rate('historic', self.reviewed),
+                'baseline': rate('baseline', self.reviewed),
+                'candidate': rate('candidate', candidate_known),
+                'candidate_unknown': self.candidate_unknown,
+            },
+            'elapsed_s': round(elapsed, 2),
+        }
+
+
+def _stream_decisions(db_path: str, chunk_size: int) -> Iterator[List[Tuple]]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute("""
+            SELECT request_id, decision, rule_matched, request_data
+            FROM decisions
+            ORDER BY id
+        """)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def _human_decisions(conn: Optional[sqlite3.Connection], request_ids: List[int]) -> Dict[int, str]:
+    """Latest human decision per request, for one chunk"""
+    if conn is None or not request_ids:
+        return {}
+    human = {}
+    unique_ids = list(set(request_ids))
+    # SQLite limite le nombre de paramètres par requête
+    for start in range(0, len(unique_ids), 900):
+        batch = unique_ids[start:start + 900]
+        placeholders = ','.join('?' * len(batch))
+        rows = conn.execute(f"""
+            SELECT request_id, human_decision
+            FROM human_feedback
+            WHERE request_id IN ({placeholders})
+            ORDER BY id
+        """, batch)
+        for request_id, human_decision in rows:
+            human[request_id] = human_decision
+    return human
+
+
+def _decision_count(db_path: str) -> int:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _sql_chunks(db_path: str, chunk_size: int, vocab: List[str], report: 'ReplayReport'):
+    """(batch, historic, request_ids) per chunk, parsed from decisions.request_data"""
+    for rows in _stream_decisions(db_path, chunk_size):
+        report.rows_scanned += len(rows)
+        records, historic, request_ids = [], [], []
+        for request_id, decision, rule_matched, request_data_json in rows:
+            if decision not in OUTCOMES or not is_content_decision(rule_matched):
+                continue
+            try:
+                request_data = json.loads(request_data_json) if request_data_json else {}
+            except (TypeError, ValueError):
+                continue
+            records.append(request_data)
+            historic.append(decision)
+            request_ids.append(request_id)
+        if records:
+            yield RecordBatch.from_records(records, genre_vocab=vocab), historic, request_ids
+
+
+def _store_chunks(store: FeatureStore, chunk_size: int, vocab: List[str], report: 'ReplayReport'):
+    """Same chunks read zero-copy from the feature store"""
+    records = store.records()
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        report.rows_scanned += len(chunk)
+        decision = chunk['decision']
+        keep = (((decision == APPROVED) | (decision == REJECTED) | (decision == NEEDS_REVIEW))
+                & ((chunk['flags'] & NOT_REPLAYED_FLAGS) == 0))
+        chunk = chunk[keep]
+        if len(chunk):
+            historic = [DECISION_NAMES[code] for code in chunk['decision']]
+            yield store.batch(chunk, vocab), historic, chunk['request_id'].tolist()
+
+
+def replay(candidate: ConfigManager, baseline: ConfigManager, db_path: str = DB_PATH,
+           feedback_db_path: Optional[str] = FEEDBACK_DB_PATH, chunk_size: int = 5000,
+           features_path: Optional[str] = None) -> Dict[str, Any]:
+    """Replay every stored decision through ``candidate`` vs ``baseline``.
+
+    Only the strict pre-check can be re-evaluated offline (no TMDB/OpenAI
+    calls): a request keeps its historic decision unless a strict rule of
+    the config decides it. When the baseline decided it with a strict rule
+    the candidate no longer has, the outcome is unknown (it would go to
+    OpenAI) and it is not counted as a flip.
+
+    With ``features_path`` the records come from the feature store instead
+    of parsing request_data, as long as it covers every decision row. The
+    store holds no text: keyword rules are only replayed from request_data,
+    so a candidate that changes the keyword lists is read from decisions.
+    """
+    # fetchmany(0) / range(..., 0) : chunk_size doit rester >= 1
+    chunk_size = max(1, int(chunk_size))
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        baseline_plan = RulePlan.compile(baseline)
+        candidate_plan = RulePlan.compile(candidate)
+    vocab = sorted(set(plan_genre_vocab(baseline_plan)) | set(plan_genre_vocab(candidate_plan)))
+    report = ReplayReport()
+
+    feedback_conn = None
+    if feedback_db_path:
+        try:
+            feedback_conn = sqlite3.connect(f"file:{feedback_db_path}?mode=ro", uri=True)
+        except sqlite3.Error as e:
+            print(f"⚠️  Replay without human feedback: {e}")
+
+    same_keywords = (
+        baseline_plan.reject_keywords.keywords == candidate_plan.reject_keywords.keywords
+        and baseline_plan.review_keywords.keywords == candidate_plan.review_keywords.keywords
+    )
+    store = None
+    if features_path and Path(features_path).exists() and same_keywords:
+        try:
+            store = FeatureStore(features_path, readonly=True)
+        except ValueError as e:
+            print(f"⚠️  {e}, replaying from decisions")
+        if store is not None and len(store) != _decision_count(db_path):
+            print(f"⚠️  Feature store out of sync ({len(store)} records), replaying from decisions")
+            store = None
+    chunks = (_store_chunks(store, chunk_size, vocab, report) if store is not None
+              else _sql_chunks(db_path, chunk_size, vocab, report))
+    report.source = 'feature_store' if store is not None else 'decisions'
+
+    try:
+        for batch, historic, request_ids in chunks:
+            base = evaluate_batch(baseline_plan, batch)
+            cand = evaluate_batch(candidate_plan, batch)
+            human = _human_decisions(feedback_conn, request_ids)
+            _accumulate(report, baseline_plan, candidate_plan, base, cand, historic, request_ids, human)
+    finally:
+        if feedback_conn is not None:
+            feedback_conn.close()
+
+    return report.as_dict(time.perf_counter() - started)
+
+
+def _accumulate(report: ReplayReport, baseline_plan: RulePlan, candidate_plan: RulePlan,
+                base, cand, historic: List[str], request_ids: List[int], human: Dict[int, str]):
+    base_strict = base.strict_rule != NO_RULE
+    cand_strict = cand.strict_rule != NO_RULE
+    report.rows_replayed += len(historic)
+    report.baseline_ai_calls += int((~base_strict).sum())
+    report.candidate_ai_calls += int((~cand_strict).sum())
+
+    # Seules les lignes où une des deux configs applique une règle stricte
+    # peuvent changer : on ne boucle en Python que sur celles-là.
+    for i in np.flatnonzero(base_strict | cand_strict):
+        if base_strict[i] and not cand_strict[i]:
+            report.to_ai_by_rule[_rule_name(baseline_plan, base.strict_rule[i])] += 1
+        elif cand_strict[i] and not base_strict[i]:
+            report.from_ai_by_rule[_rule_name(candidate_plan, cand.strict_rule[i])] += 1
+
+        if not cand_strict[i]:
+            continue
+        before = DECISION_NAMES[base.decision[i]] if base_strict[i] else historic[i]
+        after = DECISION_NAMES[cand.decision[i]]
+        if before != after:
+            report.flips_by_rule[_rule_name(candidate_plan, cand.strict_rule[i])] += 1
+            report.transitions[f"{before}→{after}"] += 1
+
+    for i, request_id in enumerate(request_ids):
+        human_decision = human.get(request_id)
+        if human_decision is None:
+            continue
+        report.reviewed += 1
+        baseline_decision = DECISION_NAMES[base.decision[i]] if base_strict[i] else historic[i]
+        report.agree['historic'] += historic[i] == human_decision
+        report.agree['baseline'] += baseline_decision == human_decision
+        if cand_strict[i]:
+            report.agree['candidate'] += DECISION_NAMES[cand.decision[i]] == human_decision
+        elif base_strict[i]:
+            report.candidate_unknown += 1
+        else:
+            report.agree['candidate'] += historic[i] == human_decision
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay historic decisions through a candidate config.yaml")
+    parser.add_argument('--config', required=True, help='candidate config.yaml')
+    parser.add_argument('--baseline', default='/config/config.yaml', help='current config.yaml')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--feedback-db', default=FEEDBACK_DB_PATH)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--features', default=FEATURES_PATH,
+                        help="feature store to read instead of request_data ('' to disable)")
+    args = parser.parse_args()
+    if not Path(args.config).exists():
+        parser.error(f"candidate config not found: {args.config}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        candidate = ConfigManager(args.config)
+        baseline = ConfigManager(args.baseline)
+    report = replay(candidate, baseline, args.db, args.feedback_db, args.chunk_size, args.features)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
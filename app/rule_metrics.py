@@ -0,0 +1,288 @@
+# rule_metrics.py - Per-rule counters and sampled phase timings
+
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from app.db import shared
+
+
+# Histogrammes en puissances de 2 de microsecondes : bucket i = [2^(i-1), 2^i) µs
+BUCKETS = 26
+
+# source d'une décision locale → composant des compteurs
+LOCAL_COMPONENTS = {'config_rules': 'smart_moderator', 'trust_tier': 'trust_tiers'}
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class _PhaseTimer:
+    __slots__ = ('metrics', 'phase', 'started')
+
+    def __init__(self, metrics: 'RuleMetrics', phase: str):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record_timing(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+class RuleMetrics:
+    """Always-on rule counters plus sampled timing histograms per phase.
+
+    Counters are keyed by (component, rule_id) - component is
+    ``rules_validator`` or ``smart_moderator`` since both use the same rule
+    ids - and track hits, decision overrides, confidence adjustments and
+    OpenAI calls the rule made unnecessary. Totals survive restarts: they
+    are loaded at startup and flushed to SQLite every ``flush_interval``.
+    """
+
+    def __init__(self, db_path: str, sample_rate: float = 0.1, flush_interval: float = 300):
+        self.db_path = db_path
+        self.sample_rate = float(sample_rate)
+        self.flush_interval = float(flush_interval)
+        self._lock = threading.Lock()
+        self._rules: Dict[tuple, Dict[str, float]] = defaultdict(self._new_counters)
+        self._timings: Dict[str, Dict[str, Any]] = defaultdict(self._new_histogram)
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.last_flush: Optional[float] = None
+        self.init_database()
+        self.load()
+
+    @staticmethod
+    def _new_counters() -> Dict[str, float]:
+        return {'hits': 0, 'overrides': 0, 'adjustments': 0, 'adjustment_sum': 0.0, 'saved_calls': 0}
+
+    @staticmethod
+    def _new_histogram() -> Dict[str, Any]:
+        # count inclut l'historique persisté ; session_* depuis le démarrage
+        return {'count': 0, 'session_count': 0, 'total_us': 0.0, 'max_us': 0.0, 'buckets': [0] * BUCKETS}
+
+    # ----- persistence -----
+
+    def init_database(self):
+        conn = shared(self.db_path).connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rule_metrics (
+                component TEXT NOT NULL,
+                rule_id TEXT NOT NULL,
+                hits INTEGER DEFAULT 0,
+                overrides INTEGER DEFAULT 0,
+                adjustments INTEGER DEFAULT 0,
+                adjustment_sum REAL DEFAULT 0,
+                saved_calls INTEGER DEFAULT 0,
+                updated_at DATETIME,
+                PRIMARY KEY (component, rule_id)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS phase_timings (
+                phase TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (phase, bucket)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def load(self):
+        """Resume totals persisted by a previous run"""
+        conn = shared(self.db_path).connect()
+        try:
+            rules = conn.execute("""
+                SELECT component, rule_id, hits, overrides, adjustments, adjustment_sum, saved_calls
+                FROM rule_metrics
+            """).fetchall()
+            timings = conn.execute("SELECT phase, bucket, count FROM phase_timings").fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for component, rule_id, hits, overrides, adjustments, adjustment_sum, saved_calls in rules:
+                self._rules[(component, rule_id)].update({
+                    'hits': hits, 'overrides': overrides, 'adjustments': adjustments,
+                    'adjustment_sum': adjustment_sum, 'saved_calls': saved_calls,
+                })
+            for phase, bucket, count in timings:
+                if 0 <= bucket < BUCKETS:
+                    histogram = self._timings[phase]
+                    histogram['buckets'][bucket] = count
+                    histogram['count'] += count
+
+    def flush(self):
+        """Write current totals (absolute values, idempotent)"""
+        with self._lock:
+            rules = [(component, rule_id, dict(c)) for (component, rule_id), c in self._rules.items()]
+            timings = [(phase, list(h['buckets'])) for phase, h in self._timings.items()]
+
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        conn = shared(self.db_path).connect()
+        try:
+            conn.executemany("""
+                INSERT INTO rule_metrics
+                (component, rule_id, hits, overrides, adjustments, adjustment_sum, saved_calls, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(component, rule_id) DO UPDATE SET
+                    hits = excluded.hits,
+                    overrides = excluded.overrides,
+                    adjustments = excluded.adjustments,
+                    adjustment_sum = excluded.adjustment_sum,
+                    saved_calls = excluded.saved_calls,
+                    updated_at = excluded.updated_at
+            """, [
+                (component, rule_id, c['hits'], c['overrides'], c['adjustments'],
+                 c['adjustment_sum'], c['saved_calls'], now)
+                for component, rule_id, c in rules
+            ])
+            conn.executemany("""
+                INSERT INTO phase_timings (phase, bucket, count) VALUES (?, ?, ?)
+                ON CONFLICT(phase, bucket) DO UPDATE SET count = excluded.count
+            """, [
+                (phase, bucket, count)
+                for phase, buckets in timings
+                for bucket, count in enumerate(buckets) if count
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        self.last_flush = time.time()
+
+    def start_flusher(self):
+        if self._flusher is not None or self.flush_interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(self.flush_interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️  Rule metrics flush failed: {e}")
+
+        self._flusher = threading.Thread(target=run, name='rule-metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    # ----- recording -----
+
+    def record(self, component: str, rule_id: str, hit: bool = True, override: bool = False,
+               adjustment: Optional[float] = None, saved_call: bool = False):
+        with self._lock:
+            counters = self._rules[(component, rule_id)]
+            if hit:
+                counters['hits'] += 1
+            if override:
+                counters['overrides'] += 1
+            if adjustment is not None:
+                counters['adjustments'] += 1
+                counters['adjustment_sum'] += adjustment
+            if saved_call:
+                counters['saved_calls'] += 1
+
+    def record_validation(self, result: Dict[str, Any], saved_call: bool = False):
+        """Count a RulesValidator.validate result (pre-check or post-AI)"""
+        override_rule = result.get('override_rule') if result.get('rule_override') else None
+        for rule_id in result.get('rules_matched', []):
+            self.record('rules_validator', rule_id, override=rule_id == override_rule,
+                        saved_call=saved_call and rule_id == override_rule)
+        for adjustment in result.get('confidence_adjustments', []):
+            self.record('rules_validator', adjustment.get('rule_id', adjustment['rule']), hit=False,
+                        adjustment=adjustment['adjustment'])
+
+    def record_local(self, result: Dict[str, Any], saved_call: bool = False):
+        """Count a local decision (config rule, learned pattern or trust tier)"""
+        component = LOCAL_COMPONENTS.get(result.get('source'), 'learned_patterns')
+        rule_id = result.get('rule_matched') or 'fallback'
+        self.record(component, rule_id, override=rule_id != 'fallback', saved_call=saved_call)
+
+    def timed(self, phase: str):
+        """Context manager timing ``phase`` for a sample of calls"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return _NO_TIMER
+        return _PhaseTimer(self, phase)
+
+    def record_timing(self, phase: str, seconds: float):
+        micros = seconds * 1e6
+        bucket = min(int(micros).bit_length(), BUCKETS - 1)
+        with self._lock:
+            histogram = self._timings[phase]
+            histogram['count'] += 1
+            histogram['session_count'] += 1
+            histogram['total_us'] += micros
+            histogram['max_us'] = max(histogram['max_us'], micros)
+            histogram['buckets'][bucket] += 1
+
+    # ----- reporting -----
+
+    @staticmethod
+    def _percentile(buckets, count: int, q: float) -> Optional[float]:
+        """Upper bound (µs) of the bucket holding the q-quantile"""
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bucket, n in enumerate(buckets):
+            seen += n
+            if seen >= rank:
+                return float(1 << bucket)
+        return float(1 << (len(buckets) - 1))
+
+    def snapshot(self, cost_per_call: float = 0.0, tokens_per_call: float = 0.0) -> Dict[str, Any]:
+        with self._lock:
+            rules = {key: dict(c) for key, c in self._rules.items()}
+            timings = {phase: {**h, 'buckets': list(h['buckets'])} for phase, h in self._timings.items()}
+
+        by_component: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        for (component, rule_id), c in sorted(rules.items()):
+            by_component[component][rule_id] = {
+                'hits': int(c['hits']),
+                'overrides': int(c['overrides']),
+                'adjustments': int(c['adjustments']),
+                'avg_adjustment': round(c['adjustment_sum'] / c['adjustments'], 4) if c['adjustments'] else None,
+                'saved_calls': int(c['saved_calls']),
+                'saved_tokens': int(c['saved_calls'] * tokens_per_call),
+                'saved_cost': round(c['saved_calls'] * cost_per_call, 4),
+            }
+
+        phases = {}
+        for phase, h in sorted(timings.items()):
+            count = h['count']
+            phases[phase] = {
+                'samples': count,
+                # Moyenne / max : depuis le démarrage seulement (non persistés)
+                'mean_us': round(h['total_us'] / h['session_count'], 1) if h['session_count'] else None,
+                'max_us': round(h['max_us'], 1) if h['max_us'] else None,
+                'p50_us': self._percentile(h['buckets'], count, 0.50),
+                'p90_us': self._percentile(h['buckets'], count, 0.90),
+                'p99_us': self._percentile(h['buckets'], count, 0.99),
+                'buckets': {f"<{1 << i}us": n for i, n in enumerate(h['buckets']) if n},
+            }
+
+        return {
+            'rules': dict(by_component),
+            'phases': phases,
+            'sample_rate': self.sample_rate,
+            'cost_per_call': round(cost_per_call, 6),
+            'tokens_per_call': round(tokens_per_call, 1),
+            'last_flush': self.last_flush,
+        }
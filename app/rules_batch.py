@@ -0,0 +1,272 @@
+# rules_batch.py - Vectorized RulesValidator evaluation over columnar batches
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.keyword_matcher import LIST_FIELDS, TEXT_FIELDS, TITLE_FIELDS
+from app.rules_validator import RulePlan, RulesValidator
+
+# Codes de décision (int8) utilisés dans les tableaux de résultats
+PENDING, APPROVED, REJECTED, NEEDS_REVIEW = 0, 1, 2, 3
+DECISION_NAMES = ('PENDING', 'APPROVED', 'REJECTED', 'NEEDS_REVIEW')
+DECISION_CODES = {name: code for code, name in enumerate(DECISION_NAMES)}
+
+# strict_rule : index dans plan.strict_rules, ou l'une de ces valeurs
+NO_RULE = -1
+UPCOMING_RELEASE = -2
+
+MAX_GENRES = 64
+
+
+class RecordBatch:
+    """Columnar batch of moderation records.
+
+    Every column is a 1-D NumPy array of the same length; ``genre_bits`` is a
+    uint64 bitset over ``genre_vocab`` (normalised genre names, at most 64).
+    Missing values follow RulesValidator's defaults (0); an unknown or
+    unparsable year is 0. ``texts`` holds, per record, the fields keyword
+    rules scan; without it (feature store batches) keyword rules never hold.
+    """
+
+    def __init__(self, rating: np.ndarray, popularity: np.ndarray, year: np.ndarray,
+                 episode_count: np.ndarray, user_age_days: np.ndarray,
+                 genre_bits: np.ndarray, genre_vocab: Sequence[str],
+                 texts: Optional[List[Dict[str, Any]]] = None):
+        if len(genre_vocab) > MAX_GENRES:
+            raise ValueError(f"genre_vocab has {len(genre_vocab)} genres (max {MAX_GENRES})")
+        self.rating = np.asarray(rating, dtype=np.float64)
+        self.popularity = np.asarray(popularity, dtype=np.float64)
+        self.year = np.asarray(year, dtype=np.int32)
+        self.episode_count = np.asarray(episode_count, dtype=np.float64)
+        self.user_age_days = np.asarray(user_age_days, dtype=np.float64)
+        self.genre_bits = np.asarray(genre_bits, dtype=np.uint64)
+        self.genre_vocab = tuple(genre_vocab)
+        self.texts = texts
+        lengths = {len(column) for column in (
+            self.rating, self.popularity, self.year, self.episode_count,
+            self.user_age_days, self.genre_bits)}
+        if texts is not None:
+            lengths.add(len(texts))
+        if len(lengths) != 1:
+            raise ValueError(f"columns have different lengths: {sorted(lengths)}")
+
+    def __len__(self) -> int:
+        return len(self.rating)
+
+    def genre_mask(self, genres: Iterable[str]) -> np.uint64:
+        """Bitmask of the given genres (genres absent from the vocab are ignored)"""
+        mask = 0
+        for genre in genres:
+            if genre in self.genre_vocab:
+                mask |= 1 << self.genre_vocab.index(genre)
+        return np.uint64(mask)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]],
+                     genre_vocab: Optional[Sequence[str]] = None) -> 'RecordBatch':
+        """Build a batch from request_data dicts (as stored in decisions).
+
+        Without ``genre_vocab`` every genre seen is given a bit; pass
+        ``plan_genre_vocab(plan)`` to only keep the genres rules can match.
+        """
+        records = list(records)
+        count = len(records)
+        rating = np.zeros(count)
+        popularity = np.zeros(count)
+        year = np.zeros(count, dtype=np.int32)
+        episode_count = np.zeros(count)
+        user_age_days = np.zeros(count)
+        genre_bits = np.zeros(count, dtype=np.uint64)
+
+        vocab: Dict[str, int] = {}
+        fixed_vocab = genre_vocab is not None
+        if fixed_vocab:
+            vocab = {genre: i for i, genre in enumerate(genre_vocab)}
+
+        mapping = RulesValidator.GENRE_MAPPING
+        texts = []
+        for i, record in enumerate(records):
+            texts.append({field: record.get(field) for field in TEXT_FIELDS + LIST_FIELDS})
+            rating[i] = record.get('rating', 0) or 0
+            popularity[i] = record.get('popularity', 0) or 0
+            year[i] = parse_year(record.get('year', ''))
+            episode_count[i] = record.get('episode_count', 0) or 0
+            user_age_days[i] = record.get('user_age_days', 0) or 0
+
+            bits = 0
+            for genre in record.get('genres', []) or []:
+                genre = mapping.get(genre, genre)
+                index = vocab.get(genre)
+                if index is None:
+                    if fixed_vocab:
+                        continue
+                    if len(vocab) >= MAX_GENRES:
+                        raise ValueError(f"more than {MAX_GENRES} distinct genres, pass genre_vocab")
+                    index = vocab[genre] = len(vocab)
+                bits |= 1 << index
+            genre_bits[i] = bits
+
+        return cls(rating, popularity, year, episode_count, user_age_days, genre_bits,
+                   sorted(vocab, key=vocab.get), texts)
+
+    @classmethod
+    def from_feature_records(cls, records: np.ndarray, store_genres: Sequence[str],
+                             genre_vocab: Optional[Sequence[str]] = None) -> 'RecordBatch':
+        """Build a batch from FeatureStore records (no JSON parsing).
+
+        ``store_genres`` is the store's own genre list; bits are remapped onto
+        ``genre_vocab`` (genres outside it are dropped) when one is given.
+        """
+        genre_bits = np.asarray(records['genre_bits'], dtype=np.uint64)
+        if genre_vocab is None:
+            genre_vocab = store_genres
+        elif list(genre_vocab) != list(store_genres)[:len(genre_vocab)]:
+            target = {genre: i for i, genre in enumerate(genre_vocab)}
+            remapped = np.zeros(len(genre_bits), dtype=np.uint64)
+            for source, genre in enumerate(store_genres):
+                index = target.get(genre)
+                if index is not None:
+                    bit = (genre_bits >> np.uint64(source)) & np.uint64(1)
+                    remapped |= bit << np.uint64(index)
+            genre_bits = remapped
+        else:
+            # Même préfixe : il suffit de masquer les genres en trop
+            genre_bits = genre_bits & np.uint64((1 << len(genre_vocab)) - 1)
+        return cls(records['rating'], records['popularity'], records['year'],
+                   records['episode_count'], records['user_age_days'], genre_bits, genre_vocab)
+
+
+class BatchResult:
+    """Decision/confidence arrays returned by evaluate_batch"""
+
+    def __init__(self, decision: np.ndarray, confidence: np.ndarray,
+                 rule_override: np.ndarray, strict_rule: np.ndarray):
+        self.decision = decision            # int8 codes (DECISION_NAMES)
+        self.confidence = confidence        # float64
+        self.rule_override = rule_override  # bool
+        self.strict_rule = strict_rule      # int8, see NO_RULE / UPCOMING_RELEASE
+
+    def __len__(self) -> int:
+        return len(self.decision)
+
+    def decision_names(self) -> List[str]:
+        return [DECISION_NAMES[code] for code in self.decision]
+
+    def counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.decision, minlength=len(DECISION_NAMES))
+        return {name: int(counts[code]) for code, name in enumerate(DECISION_NAMES)}
+
+
+def parse_year(value: Any) -> int:
+    """int(year) like RulesValidator, 0 when missing or unparsable"""
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def plan_genre_vocab(plan: RulePlan) -> List[str]:
+    """Genres that can affect a rule decision"""
+    return sorted(plan.approve_genres | plan.reject_genres)
+
+
+def keyword_mask(matcher, batch: RecordBatch, **fields) -> np.ndarray:
+    """Records where ``matcher`` finds a keyword (all False without texts)"""
+    mask = np.zeros(len(batch), dtype=bool)
+    if matcher and batch.texts is not None:
+        for i, text in enumerate(batch.texts):
+            mask[i] = bool(matcher.scan(text, **fields))
+    return mask
+
+
+def evaluate_batch(plan: RulePlan, batch: RecordBatch,
+                   ai_decision: Optional[np.ndarray] = None,
+                   ai_confidence: Optional[np.ndarray] = None,
+                   current_year: Optional[int] = None) -> BatchResult:
+    """Vectorized equivalent of RulesValidator.validate.
+
+    Without ``ai_decision`` this is the PENDING pre-check (first strict rule
+    wins, otherwise PENDING/0.5). With ``ai_decision`` (int8 codes, or
+    strings) and ``ai_confidence`` it is the post-AI validation: strict
+    overrides (last match wins), confidence boosts and needs_review
+    triggers, in the same order as the scalar path. PENDING rows in
+    ``ai_decision`` are not routed to the pre-check: evaluate them separately.
+    """
+    n = len(batch)
+    current_year = current_year or datetime.now().year
+    rating = batch.rating
+
+    predicates = {
+        'auto_approve.rating_above': rating >= plan.approve_rating_above,
+        'auto_approve.genres': (batch.genre_bits & batch.genre_mask(plan.approve_genres)) != 0,
+        'auto_reject.rating_below': (rating > 0) & (rating <= plan.reject_rating_below),
+        'auto_reject.genres': (batch.genre_bits & batch.genre_mask(plan.reject_genres)) != 0,
+        # Texte : boucle Python, seulement si la liste de mots-clés n'est pas vide
+        'auto_reject.keywords': keyword_mask(plan.reject_keywords, batch,
+                                             text_fields=TITLE_FIELDS, list_fields=()),
+        'needs_review.controversial_keywords': keyword_mask(plan.review_keywords, batch),
+    }
+    upcoming = (rating == 0) & (batch.year >= current_year) & (batch.year <= current_year + 1)
+
+    strict_rule = np.full(n, NO_RULE, dtype=np.int8)
+
+    if ai_decision is None:
+        decision = np.full(n, PENDING, dtype=np.int8)
+        confidence = np.full(n, 0.5)
+        # Premier match gagne : on parcourt les règles en sens inverse
+        for index in range(len(plan.strict_rules) - 1, -1, -1):
+            rule = plan.strict_rules[index]
+            mask = predicates[rule.rule_id]
+            decision[mask] = DECISION_CODES[rule.decision]
+            confidence[mask] = rule.confidence
+            strict_rule[mask] = index
+        rule_override = strict_rule != NO_RULE
+    else:
+        ai_decision = np.asarray(ai_decision)
+        if ai_decision.dtype.kind in ('U', 'S', 'O'):
+            ai_decision = np.array([DECISION_CODES[str(d)] for d in ai_decision], dtype=np.int8)
+        ai_confidence = np.asarray(ai_confidence, dtype=np.float64)
+        decision = ai_decision.astype(np.int8).copy()
+        confidence = ai_confidence.copy()
+        rule_override = np.zeros(n, dtype=bool)
+
+        # Dernier match gagne (overrides successifs)
+        for index, rule in enumerate(plan.strict_rules):
+            mask = predicates[rule.rule_id]
+            decision[mask] = DECISION_CODES[rule.decision]
+            confidence[mask] = rule.confidence
+            strict_rule[mask] = index
+            rule_override |= mask
+
+        for boost in plan.boosts:
+            mask = predicates[boost.rule_id] & (ai_decision == DECISION_CODES[boost.ai_decision])
+            confidence[mask] = np.minimum(1.0, confidence[mask] + boost.adjustment)
+
+        # Very long series
+        mask = ((batch.episode_count > plan.review_episode_count_above)
+                & (ai_decision == APPROVED) & (ai_confidence < 0.90))
+        confidence[mask] = np.maximum(0.5, confidence[mask] - 0.15)
+        to_review = mask & (confidence < 0.75)
+        decision[to_review] = NEEDS_REVIEW
+        rule_override |= to_review
+
+        # New user + obscure content
+        mask = ((batch.user_age_days < plan.review_new_user_days)
+                & (batch.popularity < plan.review_obscure_popularity)
+                & (ai_decision == APPROVED) & (ai_confidence < 0.85))
+        confidence[mask] = np.maximum(0.5, confidence[mask] - 0.10)
+        to_review = mask & (confidence < 0.75)
+        decision[to_review] = NEEDS_REVIEW
+        rule_override |= to_review
+
+    # Upcoming release : priorité absolue dans les deux modes
+    decision[upcoming] = NEEDS_REVIEW
+    confidence[upcoming] = 0.80
+    rule_override[upcoming] = True
+    strict_rule[upcoming] = UPCOMING_RELEASE
+
+    return BatchResult(decision, confidence, rule_override, strict_rule)
@@ -1,6 +1,198 @@
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
 from datetime import datetime
 from app.config_loader import ConfigManager, ModerationDecision
+from app.keyword_matcher import TITLE_FIELDS, KeywordHit, KeywordMatcher
+
+
+@dataclass(frozen=True)
+class StrictRule:
+    """One strict (pre-emptive) rule of the compiled plan"""
+    rule_id: str
+    decision: str
+    confidence: float
+    predicate: Callable[['RuleFacts'], bool]
+    reason: Callable[['RuleFacts'], str]
+
+
+@dataclass(frozen=True)
+class ConfidenceBoost:
+    """Post-AI adjustment applied when the strict rule ``rule_id`` holds and
+    agrees with the AI decision"""
+    rule_id: str
+    name: str
+    ai_decision: str
+    adjustment: float
+    reason: Callable[['RuleFacts'], str]
+    log: str
+
+
+@dataclass(frozen=True)
+class RulePlan:
+    """Immutable, pre-resolved view of ``ai_rules`` used by RulesValidator.
+
+    Compiled once from the config: thresholds are plain floats, genre lists
+    are frozensets, keyword lists are Aho-Corasick automata and rules are
+    ordered tuples of predicates over the RuleFacts computed for a request.
+    In the pre-check the first strict rule that holds decides.
+    """
+    approve_rating_above: float
+    approve_genres: FrozenSet[str]
+    reject_rating_below: float
+    reject_genres: FrozenSet[str]
+    review_episode_count_above: float
+    review_new_user_days: float
+    review_obscure_popularity: float
+    # auto_reject.keywords (titres seuls) / needs_review.controversial_keywords
+    reject_keywords: KeywordMatcher = field(compare=False, repr=False)
+    review_keywords: KeywordMatcher = field(compare=False, repr=False)
+    strict_rules: Tuple[StrictRule, ...]
+    boosts: Tuple[ConfidenceBoost, ...]
+    config_version: int = 0
+    # (index, predicate) of strict_rules, for the hot loop of compute_facts
+    strict_predicates: Tuple[Tuple[int, Callable[['RuleFacts'], bool]], ...] = ()
+    # tuple(raw genres) → (normalised, whitelisted, blacklisted); owned by the
+    # plan so a recompile never serves matches made against the old lists
+    genre_cache: Dict[Tuple, Tuple[List[str], List[str], List[str]]] = field(
+        default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def compile(cls, config: ConfigManager) -> 'RulePlan':
+        # config.yaml stores these rules under ``ai_rules``. Keep the root
+        # lookup as a compatibility fallback for older user configurations.
+        auto_approve = config.get('ai_rules.auto_approve', config.get('auto_approve', {})) or {}
+        auto_reject = config.get('ai_rules.auto_reject', config.get('auto_reject', {})) or {}
+        needs_review = config.get('ai_rules.needs_review', config.get('needs_review', {})) or {}
+
+        approve_rating_above = float(auto_approve.get('rating_above', 999))
+        reject_rating_below = float(auto_reject.get('rating_below', 0))
+
+        strict_rules = (
+            # Marqueurs de release (CAM, LEAK...) : avant tout le reste
+            StrictRule(
+                'auto_reject.keywords', 'REJECTED', 0.97,
+                lambda f: bool(f.reject_keywords),
+                lambda f: f"OVERRIDE: Banned keyword(s) {', '.join(f.reject_keywords)} in title (auto-reject)",
+            ),
+            StrictRule(
+                'auto_approve.rating_above', 'APPROVED', 0.95,
+                lambda f: f.rating >= approve_rating_above,
+                lambda f: f"OVERRIDE: Excellent rating ({f.rating}/10) triggers auto-approve",
+            ),
+            StrictRule(
+                'auto_approve.genres', 'APPROVED', 0.90,
+                lambda f: bool(f.approved_genres),
+                lambda f: f"OVERRIDE: Genre {f.approved_genres} is whitelisted (auto-approve)",
+            ),
+            StrictRule(
+                'auto_reject.rating_below', 'REJECTED', 0.95,
+                lambda f: 0 < f.rating <= reject_rating_below,
+                lambda f: f"OVERRIDE: Low rating ({f.rating}/10) triggers auto-reject",
+            ),
+            StrictRule(
+                'auto_reject.genres', 'REJECTED', 0.95,
+                lambda f: bool(f.blacklisted_genres),
+                lambda f: f"OVERRIDE: Genre {f.blacklisted_genres} is blacklisted (auto-reject)",
+            ),
+            # Déclencheur de review : seulement si aucune règle d'approbation/rejet ne tranche
+            StrictRule(
+                'needs_review.controversial_keywords', 'NEEDS_REVIEW', 0.75,
+                lambda f: bool(f.review_hits),
+                lambda f: (
+                    f"Controversial keyword(s) {', '.join(KeywordMatcher.matched_keywords(f.review_hits))} "
+                    f"found in {', '.join(dict.fromkeys(hit.field for hit in f.review_hits))} - requires human review"
+                ),
+            ),
+        )
+
+        boosts = (
+            ConfidenceBoost(
+                'auto_approve.rating_above', 'rating_above', 'APPROVED', +0.1,
+                lambda f: f"High rating ({f.rating}) supports AI decision",
+                "✅ Rule rating_above: Supports AI decision (+10% confidence)",
+            ),
+            ConfidenceBoost(
+                'auto_approve.genres', 'whitelisted_genre', 'APPROVED', +0.05,
+                lambda f: f"Preferred genre: {f.approved_genres}",
+                "✅ Rule genres: Supports AI decision (+5% confidence)",
+            ),
+            ConfidenceBoost(
+                'auto_reject.rating_below', 'rating_below', 'REJECTED', +0.1,
+                lambda f: f"Very low rating ({f.rating}) supports rejection",
+                "✅ Rule rating_below: Supports AI decision (+10% confidence)",
+            ),
+            ConfidenceBoost(
+                'auto_reject.genres', 'blacklisted_genre', 'REJECTED', +0.1,
+                lambda f: f"Blacklisted genre: {f.blacklisted_genres}",
+                "✅ Rule genres: Supports AI decision (+10% confidence)",
+            ),
+        )
+
+        return cls(
+            approve_rating_above=approve_rating_above,
+            approve_genres=frozenset(auto_approve.get('genres', []) or []),
+            reject_rating_below=reject_rating_below,
+            reject_genres=frozenset(auto_reject.get('genres', []) or []),
+            review_episode_count_above=float(needs_review.get('episode_count_above', 999)),
+            review_new_user_days=float(needs_review.get('new_user_days', 999)),
+            review_obscure_popularity=float(needs_review.get('obscure_popularity_threshold', 0)),
+            reject_keywords=KeywordMatcher(auto_reject.get('keywords', []) or []),
+            review_keywords=KeywordMatcher(needs_review.get('controversial_keywords', []) or []),
+            strict_rules=strict_rules,
+            boosts=boosts,
+            strict_predicates=tuple((i, rule.predicate) for i, rule in enumerate(strict_rules)),
+            config_version=getattr(config, 'version', 0),
+        )
+
+
+class RuleFacts:
+    """What the rules know about one request, computed once by the pre-check.
+
+    Post-AI validation consumes the same object, so genres are normalised,
+    lists matched and thresholds tested exactly once per request, against
+    the plan that was current when the request started. A plain slotted
+    class: it is built on every request and a frozen dataclass ``__init__``
+    costs more than the rules themselves. Treat it as read-only.
+    """
+    __slots__ = (
+        'plan', 'rating', 'popularity', 'episodes', 'user_age_days', 'genres',
+        'approved_genres', 'blacklisted_genres', 'upcoming_year',
+        'reject_keywords',    # auto_reject.keywords found in the titles
+        'review_hits',        # KeywordHit of controversial_keywords
+        'strict_hits',        # indexes in plan.strict_rules, in plan order
+        'rules_hit',          # rule_id of those strict rules
+        'long_series', 'new_user_obscure',
+    )
+
+    def __init__(self, plan: RulePlan, rating: Any, popularity: Any, episodes: Any,
+                 user_age_days: Any, genres: List[str], approved_genres: List[str],
+                 blacklisted_genres: List[str], upcoming_year: Optional[int],
+                 reject_keywords: List[str], review_hits: List[KeywordHit],
+                 strict_hits: Tuple[int, ...], rules_hit: FrozenSet[str],
+                 long_series: bool, new_user_obscure: bool):
+        self.plan = plan
+        self.rating = rating
+        self.popularity = popularity
+        self.episodes = episodes
+        self.user_age_days = user_age_days
+        self.genres = genres
+        self.approved_genres = approved_genres
+        self.blacklisted_genres = blacklisted_genres
+        self.upcoming_year = upcoming_year
+        self.reject_keywords = reject_keywords
+        self.review_hits = review_hits
+        self.strict_hits = strict_hits
+        self.rules_hit = rules_hit
+        self.long_series = long_series
+        self.new_user_obscure = new_user_obscure
+
+    def __repr__(self) -> str:
+        return f"RuleFacts(rating={self.rating!r}, genres={self.genres!r}, rules_hit={sorted(self.rules_hit)!r})"
+
+
+NO_RULES: FrozenSet[str] = frozenset()
+NO_KEYWORDS: Tuple = ()
+
 
 class RulesValidator:
     """Validates and potentially overrides AI decisions based on strict rules"""
@@ -35,6 +227,23 @@ class RulesValidator:
 
     def __init__(self, config: ConfigManager):
         self.config = config
+        self.plan = RulePlan.compile(config)
+
+    def recompile(self, config: ConfigManager = None) -> RulePlan:
+        """Recompile the rule plan after the config changed (config subscriber).
+
+        The new plan replaces the old one in a single assignment; requests
+        already past the pre-check keep theirs through ``RuleFacts.plan``.
+        """
+        self.plan = RulePlan.compile(self.config)
+        return self.plan
+
+    def plan_for(self, config) -> RulePlan:
+        """Plan of a config snapshot: the current one unless a reload raced it"""
+        plan = self.plan
+        if plan.config_version == getattr(config, 'version', plan.config_version):
+            return plan
+        return RulePlan.compile(config)
 
     def normalize_genres(self, genres: List[str]) -> List[str]:
         """
@@ -53,7 +262,117 @@ class RulesValidator:
             normalized.append(normalized_genre)
         return normalized
 
-    def validate(self, ai_result: Dict, request_data: Dict) -> Dict:
+    @staticmethod
+    def _result(final_decision: str, final_confidence: float, final_reason: str,
+                ai_decision: str, ai_confidence: float, rule_override: bool,
+                override_reason: str, rules_matched: List[str],
+                confidence_adjustments: List[Dict], facts: RuleFacts,
+                override_rule: str = '') -> Dict:
+        return {
+            'final_decision': final_decision,
+            'final_confidence': final_confidence,
+            'final_reason': final_reason,
+            'ai_original_decision': ai_decision,
+            'ai_original_confidence': ai_confidence,
+            'rule_override': rule_override,
+            'override_reason': override_reason,
+            'override_rule': override_rule if rule_override else '',
+            'rules_matched': rules_matched,
+            'confidence_adjustments': confidence_adjustments,
+            'facts': facts
+        }
+
+    # Au-delà, le cache de genres est vidé (listes de genres TMDB : quelques centaines)
+    GENRE_CACHE_SIZE = 4096
+
+    def _match_genres(self, plan: RulePlan, genres_raw) -> Tuple[List[str], List[str], List[str]]:
+        """Normalised genres and their whitelist / blacklist matches, cached per genre list"""
+        try:
+            key = tuple(genres_raw)
+            return plan.genre_cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            key = None  # genre non hashable : pas de cache
+
+        # NORMALISER LES GENRES FR → EN (loggé à la première rencontre de la liste)
+        genres = self.normalize_genres(genres_raw)
+        if genres != genres_raw:
+            print(f"🌍 Genre normalization: {genres_raw} → {genres}")
+        matched = (
+            genres,
+            [g for g in genres if g in plan.approve_genres],
+            [g for g in genres if g in plan.reject_genres],
+        )
+        if key is not None:
+            if len(plan.genre_cache) >= self.GENRE_CACHE_SIZE:
+                plan.genre_cache.clear()
+            plan.genre_cache[key] = matched
+        return matched
+
+    def compute_facts(self, request_data: Dict, plan: Optional[RulePlan] = None) -> RuleFacts:
+        """Evaluate every rule condition for a request (no decision yet)"""
+        plan = plan or self.plan
+
+        rating = request_data.get('rating', 0)
+        popularity = request_data.get('popularity', 0)
+        genres_raw = request_data.get('genres', [])
+        episodes = request_data.get('episode_count', 0)
+        user_age_days = request_data.get('user_age_days', 0)
+        year = request_data.get('year', '')
+
+        genres, approved_genres, blacklisted_genres = self._match_genres(plan, genres_raw)
+
+        # Film qui sort cette année ou l'année prochaine, sans rating (pas encore sorti)
+        upcoming_year = None
+        if year and rating == 0:
+            try:
+                year_int = int(year)
+            except (TypeError, ValueError):
+                year_int = None
+            current_year = datetime.now().year
+            if year_int is not None and current_year <= year_int <= current_year + 1:
+                upcoming_year = year_int
+
+        facts = RuleFacts(
+            plan=plan,
+            rating=rating,
+            popularity=popularity,
+            episodes=episodes,
+            user_age_days=user_age_days,
+            genres=genres,
+            approved_genres=approved_genres,
+            blacklisted_genres=blacklisted_genres,
+            upcoming_year=upcoming_year,
+            reject_keywords=NO_KEYWORDS,
+            review_hits=NO_KEYWORDS,
+            strict_hits=(),
+            rules_hit=NO_RULES,
+            long_series=(episodes or 0) > plan.review_episode_count_above,
+            new_user_obscure=((user_age_days or 0) < plan.review_new_user_days
+                              and (popularity or 0) < plan.review_obscure_popularity),
+        )
+        if upcoming_year is not None:
+            # Priorité absolue : aucune autre règle n'est évaluée
+            return facts
+
+        # Mots-clés : un seul passage Aho-Corasick par liste (rien si liste vide)
+        if plan.reject_keywords:
+            facts.reject_keywords = KeywordMatcher.matched_keywords(
+                plan.reject_keywords.scan(request_data, text_fields=TITLE_FIELDS, list_fields=()))
+        if plan.review_keywords:
+            facts.review_hits = plan.review_keywords.scan(request_data)
+
+        # Prédicats évalués une fois, sur les faits ci-dessus (pas de copie)
+        strict_hits = [i for i, predicate in plan.strict_predicates if predicate(facts)]
+        if strict_hits:
+            strict_rules = plan.strict_rules
+            facts.strict_hits = tuple(strict_hits)
+            facts.rules_hit = frozenset([strict_rules[i].rule_id for i in strict_hits])
+        return facts
+
+    def validate(self, ai_result: Dict, request_data: Dict, facts: Optional[RuleFacts] = None,
+                 plan: Optional[RulePlan] = None) -> Dict:
         """
         Valide la décision AI avec les règles configurées
 
@@ -61,6 +380,10 @@ class RulesValidator:
         on check seulement les règles STRICTES (auto-approve/reject)
         pour le pre-check (avant OpenAI)
 
+        Passer ``facts`` (renvoyé par le pre-check) évite de ré-évaluer
+        les règles après l'AI ; ``plan`` (``plan_for(snapshot)``) fixe les
+        règles utilisées quand ``facts`` est absent.
+
         Returns:
             {
                 'final_decision': str,
@@ -68,38 +391,20 @@ class RulesValidator:
                 'final_reason': str,
                 'rule_override': bool,
                 'override_reason': str,
+                'override_rule': str,
                 'rules_matched': List[str],
-                'confidence_adjustments': List[Dict]
+                'confidence_adjustments': List[Dict],
+                'facts': RuleFacts
             }
         """
+        if facts is None:
+            facts = self.compute_facts(request_data, plan)
+        plan = facts.plan
 
         ai_decision = ai_result['decision']
         ai_confidence = ai_result['confidence']
         ai_reason = ai_result['reason']
 
-        # Extract data
-        rating = request_data.get('rating', 0)
-        popularity = request_data.get('popularity', 0)
-        genres_raw = request_data.get('genres', [])
-        episodes = request_data.get('episode_count', 0)
-        seasons = request_data.get('season_count', 0)
-        user_age_days = request_data.get('user_age_days', 0)
-        year = request_data.get('year', '')
-
-        # NORMALISER LES GENRES FR → EN
-        genres = self.normalize_genres(genres_raw)
-        if genres != genres_raw:
-            print(f"🌍 Genre normalization: {genres_raw} → {genres}")
-
-        # Résultats
-        final_decision = ai_decision
-        final_confidence = ai_confidence
-        final_reason = ai_reason
-        rule_override = False
-        override_reason = ""
-        rules_matched = []
-        confidence_adjustments = []
-
         # 🆕 Mode PRE-CHECK (avant OpenAI) - seulement règles STRICTES
         is_precheck = (ai_decision == 'PENDING')
 
@@ -110,227 +415,80 @@ class RulesValidator:
             print(f"🤖 AI Initial: {ai_decision} ({ai_confidence:.1%})")
 
         # 🆕 MANUAL REVIEW FOR UPCOMING RELEASES (CHECK AVANT TOUT)
-        if year:
-            try:
-                year_int = int(year)
-                current_year = datetime.now().year
-
-                # Si film sort cette année ou l'année prochaine
-                if current_year <= year_int <= current_year + 1:
-                    # Et rating = 0 (pas encore sorti)
-                    if rating == 0:
-                        print(f"🎬 Upcoming release detected: {year_int} (no rating yet)")
-                        rules_matched.append('upcoming_release')
-                        rule_override = True
-                        final_decision = 'NEEDS_REVIEW'
-                        final_confidence = 0.80
-                        override_reason = f'Upcoming release ({year_int}), no rating available yet - requires manual staff review'
-
-                        # Return immédiatement (priorité absolue)
-                        return {
-                            'final_decision': final_decision,
-                            'final_confidence': final_confidence,
-                            'final_reason': override_reason,
-                            'ai_original_decision': ai_decision,
-                            'ai_original_confidence': ai_confidence,
-                            'rule_override': True,
-                            'override_reason': override_reason,
-                            'rules_matched': rules_matched,
-                            'confidence_adjustments': []
-                        }
-            except:
-                pass
-
-        # ✅ STRICT AUTO-APPROVE RULES
-        # config.yaml stores these rules under ``ai_rules``. Keep the root
-        # lookup as a compatibility fallback for older user configurations.
-        auto_approve = self.config.get(
-            'ai_rules.auto_approve', self.config.get('auto_approve', {})
-        )
-
-        # Rule: Excellent rating (STRICT)
-        if rating >= auto_approve.get('rating_above', 999):
-            rules_matched.append('auto_approve.rating_above')
-            rule_override = True
-            final_decision = 'APPROVED'
-            final_confidence = 0.95
-            override_reason = f"OVERRIDE: Excellent rating ({rating}/10) triggers auto-approve"
-            print(f"⚠️  {override_reason}")
-
-            # En mode pre-check, return immédiatement
-            if is_precheck:
-                return {
-                    'final_decision': final_decision,
-                    'final_confidence': final_confidence,
-                    'final_reason': override_reason,
-                    'ai_original_decision': ai_decision,
-                    'ai_original_confidence': ai_confidence,
-                    'rule_override': True,
-                    'override_reason': override_reason,
-                    'rules_matched': rules_matched,
-                    'confidence_adjustments': []
-                }
-
-        # Rule: Genre whitelist (STRICT)
-        genre_whitelist = auto_approve.get('genres', [])
-        matched_approved_genres = [g for g in genres if g in genre_whitelist]
-
-        if matched_approved_genres:
-            rules_matched.append('auto_approve.genres')
-            rule_override = True
-            final_decision = 'APPROVED'
-            final_confidence = 0.90
-            override_reason = f"OVERRIDE: Genre {matched_approved_genres} is whitelisted (auto-approve)"
-            print(f"⚠️  {override_reason}")
+        if facts.upcoming_year is not None:
+            print(f"🎬 Upcoming release detected: {facts.upcoming_year} (no rating yet)")
+            override_reason = f'Upcoming release ({facts.upcoming_year}), no rating available yet - requires manual staff review'
+            # Return immédiatement (priorité absolue)
+            return self._result(
+                'NEEDS_REVIEW', 0.80, override_reason, ai_decision, ai_confidence,
+                True, override_reason, ['upcoming_release'], [], facts, 'upcoming_release'
+            )
 
-            # En mode pre-check, return immédiatement
-            if is_precheck:
-                return {
-                    'final_decision': final_decision,
-                    'final_confidence': final_confidence,
-                    'final_reason': override_reason,
-                    'ai_original_decision': ai_decision,
-                    'ai_original_confidence': ai_confidence,
-                    'rule_override': True,
-                    'override_reason': override_reason,
-                    'rules_matched': rules_matched,
-                    'confidence_adjustments': []
-                }
-
-        # ❌ STRICT AUTO-REJECT RULES
-        auto_reject = self.config.get(
-            'ai_rules.auto_reject', self.config.get('auto_reject', {})
-        )
+        # Résultats
+        final_decision = ai_decision
+        final_confidence = ai_confidence
+        rule_override = False
+        override_reason = ""
+        override_rule = ''
+        rules_matched = []
+        confidence_adjustments = []
 
-        # Rule: Very low rating (STRICT)
-        if rating > 0 and rating <= auto_reject.get('rating_below', 0):
-            rules_matched.append('auto_reject.rating_below')
+        # ✅/❌ STRICT AUTO-APPROVE / AUTO-REJECT RULES (ordre du plan)
+        for index in facts.strict_hits:
+            rule = plan.strict_rules[index]
+            rules_matched.append(rule.rule_id)
             rule_override = True
-            final_decision = 'REJECTED'
-            final_confidence = 0.95
-            override_reason = f"OVERRIDE: Low rating ({rating}/10) triggers auto-reject"
+            final_decision = rule.decision
+            final_confidence = rule.confidence
+            override_reason = rule.reason(facts)
+            override_rule = rule.rule_id
             print(f"⚠️  {override_reason}")
 
             # En mode pre-check, return immédiatement
             if is_precheck:
-                return {
-                    'final_decision': final_decision,
-                    'final_confidence': final_confidence,
-                    'final_reason': override_reason,
-                    'ai_original_decision': ai_decision,
-                    'ai_original_confidence': ai_confidence,
-                    'rule_override': True,
-                    'override_reason': override_reason,
-                    'rules_matched': rules_matched,
-                    'confidence_adjustments': []
-                }
-
-        # Rule: Blacklisted genres (STRICT)
-        genre_blacklist = auto_reject.get('genres', [])
-        matched_blacklisted_genres = [g for g in genres if g in genre_blacklist]
-
-        if matched_blacklisted_genres:
-            rules_matched.append('auto_reject.genres')
-            rule_override = True
-            final_decision = 'REJECTED'
-            final_confidence = 0.95
-            override_reason = f"OVERRIDE: Genre {matched_blacklisted_genres} is blacklisted (auto-reject)"
-            print(f"⚠️  {override_reason}")
-
-            # En mode pre-check, return immédiatement
-            if is_precheck:
-                return {
-                    'final_decision': final_decision,
-                    'final_confidence': final_confidence,
-                    'final_reason': override_reason,
-                    'ai_original_decision': ai_decision,
-                    'ai_original_confidence': ai_confidence,
-                    'rule_override': True,
-                    'override_reason': override_reason,
-                    'rules_matched': rules_matched,
-                    'confidence_adjustments': []
-                }
+                return self._result(
+                    final_decision, final_confidence, override_reason, ai_decision,
+                    ai_confidence, True, override_reason, rules_matched, [], facts, override_rule
+                )
 
         # 🆕 Si on est en pre-check et aucune règle stricte → pas d'override
         if is_precheck:
-            return {
-                'final_decision': 'PENDING',
-                'final_confidence': 0.5,
-                'final_reason': 'No strict rule matched',
-                'ai_original_decision': ai_decision,
-                'ai_original_confidence': ai_confidence,
-                'rule_override': False,
-                'override_reason': '',
-                'rules_matched': [],
-                'confidence_adjustments': []
-            }
+            return self._result(
+                'PENDING', 0.5, 'No strict rule matched', ai_decision, ai_confidence,
+                False, '', [], [], facts
+            )
 
         # ========================================================
         # À PARTIR D'ICI : Seulement si AI a déjà analysé
         # (ajustements non-stricts)
         # ========================================================
 
-        # Si rating excellent ET AI a approuvé → boost confiance
-        if rating >= auto_approve.get('rating_above', 999) and ai_decision == 'APPROVED':
-            if 'auto_approve.rating_above' not in rules_matched:
-                rules_matched.append('auto_approve.rating_above')
-            confidence_adjustments.append({
-                'rule': 'rating_above',
-                'adjustment': +0.1,
-                'reason': f'High rating ({rating}) supports AI decision'
-            })
-            final_confidence = min(1.0, final_confidence + 0.1)
-            print(f"✅ Rule rating_above: Supports AI decision (+10% confidence)")
-
-        # Si genre whitelist ET AI a approuvé → boost confiance
-        if matched_approved_genres and ai_decision == 'APPROVED':
-            if 'auto_approve.genres' not in rules_matched:
-                rules_matched.append('auto_approve.genres')
-            confidence_adjustments.append({
-                'rule': 'whitelisted_genre',
-                'adjustment': +0.05,
-                'reason': f'Preferred genre: {matched_approved_genres}'
-            })
-            final_confidence = min(1.0, final_confidence + 0.05)
-            print(f"✅ Rule genres: Supports AI decision (+5% confidence)")
-
-        # Si rating très bas ET AI a rejeté → boost confiance
-        if rating > 0 and rating <= auto_reject.get('rating_below', 0) and ai_decision == 'REJECTED':
-            if 'auto_reject.rating_below' not in rules_matched:
-                rules_matched.append('auto_reject.rating_below')
+        # Règle stricte en accord avec l'AI → boost confiance
+        for boost in plan.boosts:
+            if ai_decision != boost.ai_decision or boost.rule_id not in facts.rules_hit:
+                continue
+            if boost.rule_id not in rules_matched:
+                rules_matched.append(boost.rule_id)
             confidence_adjustments.append({
-                'rule': 'rating_below',
-                'adjustment': +0.1,
-                'reason': f'Very low rating ({rating}) supports rejection'
+                'rule': boost.name,
+                'rule_id': boost.rule_id,
+                'adjustment': boost.adjustment,
+                'reason': boost.reason(facts)
             })
-            final_confidence = min(1.0, final_confidence + 0.1)
-            print(f"✅ Rule rating_below: Supports AI decision (+10% confidence)")
-
-        # Si genre blacklist ET AI a rejeté → boost confiance
-        if matched_blacklisted_genres and ai_decision == 'REJECTED':
-            if 'auto_reject.genres' not in rules_matched:
-                rules_matched.append('auto_reject.genres')
-            confidence_adjustments.append({
-                'rule': 'blacklisted_genre',
-                'adjustment': +0.1,
-                'reason': f'Blacklisted genre: {matched_blacklisted_genres}'
-            })
-            final_confidence = min(1.0, final_confidence + 0.1)
-            print(f"✅ Rule genres: Supports AI decision (+10% confidence)")
+            final_confidence = min(1.0, final_confidence + boost.adjustment)
+            print(boost.log)
 
         # ⚠️ NEEDS_REVIEW TRIGGERS (non-stricts)
-        needs_review = self.config.get(
-            'ai_rules.needs_review', self.config.get('needs_review', {})
-        )
 
         # Rule: Very long series
-        if episodes > needs_review.get('episode_count_above', 999):
+        if facts.long_series:
             rules_matched.append('needs_review.episode_count_above')
             if ai_decision == 'APPROVED' and ai_confidence < 0.90:
                 confidence_adjustments.append({
                     'rule': 'long_series',
+                    'rule_id': 'needs_review.episode_count_above',
                     'adjustment': -0.15,
-                    'reason': f'Very long series ({episodes} eps) needs caution'
+                    'reason': f'Very long series ({facts.episodes} eps) needs caution'
                 })
                 final_confidence = max(0.5, final_confidence - 0.15)
                 print(f"⚠️  Rule episode_count: Long series reduces confidence (-15%)")
@@ -338,27 +496,29 @@ class RulesValidator:
                 if final_confidence < 0.75:
                     final_decision = 'NEEDS_REVIEW'
                     override_reason = "AI approved but long series + low confidence → human review"
+                    override_rule = 'needs_review.episode_count_above'
                     rule_override = True
                     print(f"⚠️  OVERRIDE: {override_reason}")
 
         # Rule: New user with obscure content
-        if user_age_days < needs_review.get('new_user_days', 999):
-            if popularity < needs_review.get('obscure_popularity_threshold', 0):
-                rules_matched.append('needs_review.new_user_obscure')
-                if ai_decision == 'APPROVED' and ai_confidence < 0.85:
-                    confidence_adjustments.append({
-                        'rule': 'new_user_risk',
-                        'adjustment': -0.10,
-                        'reason': 'New user + obscure content'
-                    })
-                    final_confidence = max(0.5, final_confidence - 0.10)
-                    print(f"⚠️  Rule new_user: Reduces confidence (-10%)")
-
-                    if final_confidence < 0.75:
-                        final_decision = 'NEEDS_REVIEW'
-                        override_reason = "New user + obscure content → human review"
-                        rule_override = True
-                        print(f"⚠️  OVERRIDE: {override_reason}")
+        if facts.new_user_obscure:
+            rules_matched.append('needs_review.new_user_obscure')
+            if ai_decision == 'APPROVED' and ai_confidence < 0.85:
+                confidence_adjustments.append({
+                    'rule': 'new_user_risk',
+                    'rule_id': 'needs_review.new_user_obscure',
+                    'adjustment': -0.10,
+                    'reason': 'New user + obscure content'
+                })
+                final_confidence = max(0.5, final_confidence - 0.10)
+                print(f"⚠️  Rule new_user: Reduces confidence (-10%)")
+
+                if final_confidence < 0.75:
+                    final_decision = 'NEEDS_REVIEW'
+                    override_reason = "New user + obscure content → human review"
+                    override_rule = 'needs_review.new_user_obscure'
+                    rule_override = True
+                    print(f"⚠️  OVERRIDE: {override_reason}")
 
         # Summary
         print(f"\n🎯 Validation Summary:")
@@ -368,14 +528,9 @@ class RulesValidator:
         print(f"🎯 Final: {final_decision} ({final_confidence:.1%})")
         print(f"🎯 {'='*60}\n")
 
-        return {
-            'final_decision': final_decision,
-            'final_confidence': final_confidence,
-            'final_reason': override_reason if rule_override else ai_reason,
-            'ai_original_decision': ai_decision,
-            'ai_original_confidence': ai_confidence,
-            'rule_override': rule_override,
-            'override_reason': override_reason,
-            'rules_matched': rules_matched,
-            'confidence_adjustments': confidence_adjustments
-        }
+        return self._result(
+            final_decision, final_confidence,
+            override_reason if rule_override else ai_reason,
+            ai_decision, ai_confidence, rule_override, override_reason,
+            rules_matched, confidence_adjustments, facts, override_rule
+        )
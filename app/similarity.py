@@ -0,0 +1,362 @@
+# similarity.py - Nearest-neighbour decision reuse (local TF-IDF index)
+
+import json
+import math
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.db import shared
+
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Mots vides FR/EN (les overviews TMDB sont récupérés en fr-FR)
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have he her his in is it its of on or
+she that the their they this to was were will with who when where which while
+au aux avec ce ces cette dans de des du elle en et est il ils la le les leur
+mais ne ou par pas pour qu que qui sa se ses son sont sur un une
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords / single characters"""
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class SimilarityIndex:
+    """TF-IDF index over past decisions (title, overview, genres).
+
+    Documents are hashed into a fixed number of columns, so new vocabulary
+    never re-shapes anything. Only non-zero columns are stored (a few dozen
+    per decision, not ``dimensions``): the raw term frequencies per row, and
+    the IDF-weighted, L2-normalised entries in flat (row, column, weight)
+    arrays. A full re-weighting sorts those entries by column, so a query
+    only reads the columns it shares with the index; rows inserted since
+    are appended after them with the current IDF. Removed or replaced
+    entries are zeroed, then dropped (rows renumbered) at the next full
+    re-weighting, triggered once the corpus or the dead entries have grown
+    by ``reweight_growth``.
+    """
+
+    REUSABLE_DECISIONS = ('APPROVED', 'REJECTED')
+
+    def __init__(self, dimensions: int = 2048, title_weight: float = 2.0,
+                 reweight_growth: float = 0.1):
+        self.dimensions = int(dimensions)
+        self.title_weight = float(title_weight)
+        self.reweight_growth = float(reweight_growth)
+
+        self._lock = threading.Lock()
+        self._df = np.zeros(self.dimensions, dtype=np.float64)
+        self._idf = np.ones(self.dimensions, dtype=np.float32)
+        # Par ligne : (colonnes, tf) creux, None une fois retirée ; _span =
+        # position des entrées ajoutées depuis le dernier re-weighting
+        self._tf: List[Optional[Tuple[np.ndarray, np.ndarray]]] = []
+        self._span: List[Optional[Tuple[int, int]]] = []
+        self._meta: List[Optional[Dict[str, Any]]] = []
+        self._row_by_request: Dict[int, int] = {}
+        # Entrées pondérées : [0, _sorted) triées par colonne (_col_ptr),
+        # [_sorted, _nnz) ajoutées depuis ; _dead = entrées mises à zéro
+        self._rows = np.zeros(1024, dtype=np.int32)
+        self._cols = np.zeros(1024, dtype=np.int32)
+        self._weights = np.zeros(1024, dtype=np.float32)
+        self._col_ptr = np.zeros(self.dimensions + 1, dtype=np.int64)
+        self._sorted = 0
+        self._nnz = 0
+        self._dead = 0
+        self._weighted_at = 0
+
+    # ----- vectorisation -----
+
+    def _vectorize(self, request_data: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sublinear term frequencies in hashed feature space: (columns, values)"""
+        counts: Dict[int, float] = {}
+
+        def add(tokens, prefix, weight):
+            for token in tokens:
+                column = zlib.crc32(f"{prefix}{token}".encode('utf-8')) % self.dimensions
+                counts[column] = counts.get(column, 0.0) + weight
+
+        titles = {request_data.get('title') or '', request_data.get('original_title') or ''}
+        for title in titles:
+            add(tokenize(title), 'w:', self.title_weight)
+        add(tokenize(request_data.get('overview', '')), 'w:', 1.0)
+        add([str(g).lower() for g in request_data.get('genres', []) or []], 'g:', 1.0)
+
+        columns = sorted(counts)
+        values = [1.0 + math.log(counts[c]) if counts[c] >= 1 else counts[c] for c in columns]
+        return np.array(columns, dtype=np.int32), np.array(values, dtype=np.float32)
+
+    def _recompute_idf(self):
+        n = max(len(self._row_by_request), 1)
+        self._idf = (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+
+    def _weigh(self, columns: np.ndarray, values: np.ndarray) -> np.ndarray:
+        weighted = values * self._idf[columns]
+        norm = float(np.linalg.norm(weighted))
+        return weighted / norm if norm else weighted
+
+    def _ensure_capacity(self, nnz: int):
+        capacity = len(self._rows)
+        if nnz <= capacity:
+            return
+        new_capacity = max(nnz, capacity * 2)
+        for name in ('_rows', '_cols', '_weights'):
+            grown = np.zeros(new_capacity, dtype=getattr(self, name).dtype)
+            grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def _append(self, row: int, columns: np.ndarray, values: np.ndarray):
+        start = self._nnz
+        end = start + len(columns)
+        self._ensure_capacity(end)
+        self._rows[start:end] = row
+        self._cols[start:end] = columns
+        self._weights[start:end] = self._weigh(columns, values)
+        self._span[row] = (start, end)
+        self._nnz = end
+
+    def _retire(self, row: int):
+        """Forget a row's term counts and zero its weighted entries"""
+        columns, _ = self._tf[row]
+        self._df[columns] -= 1
+        span = self._span[row]
+        if span is not None:
+            self._weights[span[0]:span[1]] = 0
+        else:
+            # Ligne de la partie triée : une entrée dans chacune de ses colonnes
+            for column in columns.tolist():
+                start, end = self._col_ptr[column], self._col_ptr[column + 1]
+                self._weights[start + np.flatnonzero(self._rows[start:end] == row)] = 0
+        self._dead += len(columns)
+
+    def _reweight(self):
+        """Full IDF re-weighting, dropping removed rows (O(non-zeros))"""
+        self._recompute_idf()
+        live = sorted(self._row_by_request.items(), key=lambda item: item[1])
+        tf = [self._tf[row] for _, row in live]
+        self._meta = [self._meta[row] for _, row in live]
+        self._tf = tf
+        self._row_by_request = {request_id: row for row, (request_id, _) in enumerate(live)}
+        self._span = [None] * len(tf)
+        self._nnz = self._dead = 0
+        if tf:
+            lengths = np.array([len(columns) for columns, _ in tf])
+            columns = np.concatenate([columns for columns, _ in tf])
+            weighted = np.concatenate([values for _, values in tf]) * self._idf[columns]
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            norms = np.sqrt(np.add.reduceat(weighted * weighted, starts))
+            norms[norms == 0] = 1.0
+            weighted /= np.repeat(norms, lengths)
+            rows = np.repeat(np.arange(len(tf), dtype=np.int32), lengths)
+
+            order = np.argsort(columns, kind='stable')
+            self._nnz = len(columns)
+            self._ensure_capacity(self._nnz)
+            self._rows[:self._nnz] = rows[order]
+            self._cols[:self._nnz] = columns[order]
+            self._weights[:self._nnz] = weighted[order]
+        self._col_ptr = np.searchsorted(self._cols[:self._nnz], np.arange(self.dimensions + 1))
+        self._sorted = self._nnz
+        self._weighted_at = len(tf)
+
+    def _maybe_reweight(self):
+        live = len(self._row_by_request)
+        if (live - self._weighted_at > max(16, self._weighted_at * self.reweight_growth)
+                or self._dead > max(1024, self._nnz * self.reweight_growth)):
+            self._reweight()
+
+    # ----- mutation -----
+
+    def add(self, request_id: int, request_data: Dict[str, Any], decision: str,
+            confidence: float, title: str = None, media_type: str = None):
+        """Index (or re-index) the latest decision for a request"""
+        columns, values = self._vectorize(request_data)
+        if not len(columns):
+            return
+
+        meta = {
+            'request_id': request_id,
+            'title': title or request_data.get('title', f'Request #{request_id}'),
+            'media_type': media_type or request_data.get('media_type'),
+            'decision': decision,
+            'confidence': float(confidence or 0.0),
+        }
+
+        with self._lock:
+            row = self._row_by_request.get(request_id)
+            if row is not None:
+                # Latest decision wins: same row number, fresh entries
+                self._retire(row)
+                self._meta[row] = meta
+            else:
+                row = len(self._meta)
+                self._meta.append(meta)
+                self._tf.append(None)
+                self._span.append(None)
+                self._row_by_request[request_id] = row
+            self._tf[row] = (columns, values)
+            self._df[columns] += 1
+            self._append(row, columns, values)
+            self._maybe_reweight()
+
+    def remove(self, request_id: int):
+        """Drop a request's row (its latest decision is not a content decision)"""
+        with self._lock:
+            row = self._row_by_request.pop(request_id, None)
+            if row is None:
+                return
+            # Entrées nulles : score 0, jamais renvoyée par query() ; la ligne
+            # disparaît au prochain re-weighting
+            self._retire(row)
+            self._tf[row] = None
+            self._meta[row] = None
+            self._maybe_reweight()
+
+    # ----- lookup -----
+
+    def query(self, request_data: Dict[str, Any], top_k: int = 1,
+              exclude_request_id: int = None) -> List[Dict[str, Any]]:
+        """Top-k neighbours by cosine similarity (highest first)"""
+        columns, values = self._vectorize(request_data)
+        if not len(columns):
+            return []
+
+        with self._lock:
+            if not self._row_by_request:
+                return []
+            rows = len(self._meta)
+            query = np.zeros(self.dimensions, dtype=np.float32)
+            query[columns] = self._weigh(columns, values)
+
+            # Partie triée : seulement les colonnes de la requête
+            starts = self._col_ptr[columns]
+            lengths = self._col_ptr[columns + 1] - starts
+            total = int(lengths.sum())
+            offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+            entries = offsets + np.arange(total)
+            scores = np.zeros(rows)
+            scores += np.bincount(
+                self._rows[entries], weights=self._weights[entries] * np.repeat(query[columns], lengths),
+                minlength=rows,
+            )
+            # Entrées ajoutées depuis le dernier re-weighting
+            tail = slice(self._sorted, self._nnz)
+            if self._nnz > self._sorted:
+                scores += np.bincount(
+                    self._rows[tail], weights=self._weights[tail] * query[self._cols[tail]], minlength=rows
+                )
+            if exclude_request_id in self._row_by_request:
+                scores[self._row_by_request[exclude_request_id]] = -1.0
+
+            k = min(top_k, rows)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {**self._meta[i], 'similarity': float(scores[i])}
+                for i in best if scores[i] > 0
+            ]
+
+    def find_reusable(self, request_data: Dict[str, Any], min_similarity: float = 0.9,
+                      min_confidence: float = 0.85, request_id: int = None) -> Optional[Dict[str, Any]]:
+        """Closest high-confidence APPROVED/REJECTED neighbour of the same media type"""
+        media_type = request_data.get('media_type')
+        for neighbour in self.query(request_data, top_k=5, exclude_request_id=request_id):
+            if neighbour['similarity'] < min_similarity:
+                break
+            if media_type and neighbour['media_type'] and neighbour['media_type'] != media_type:
+                continue
+            if neighbour['decision'] in self.REUSABLE_DECISIONS and neighbour['confidence'] >= min_confidence:
+                return neighbour
+        return None
+
+    def __len__(self) -> int:
+        return len(self._row_by_request)
+
+    # ----- bootstrap -----
+
+    def load_from_db(self, db_path: str) -> int:
+        """Index every stored decision (oldest first so the latest wins)"""
+        conn = shared(db_path).connect()
+        try:
+            cursor = conn.execute("""
+                SELECT request_id, decision, confidence, rule_matched, title, media_type, request_data
+                FROM decisions
+                ORDER BY id
+            """)
+            loaded = 0
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for request_id, decision, confidence, rule_matched, title, media_type, request_data_json in rows:
+                    if not is_content_decision(rule_matched):
+                        # Décision plus récente (staff, bibliothèque...) : l'ancienne ne vaut plus
+                        self.remove(request_id)
+                        continue
+                    try:
+                        request_data = json.loads(request_data_json) if request_data_json else {}
+                    except (TypeError, ValueError):
+                        continue
+                    self.add(request_id, request_data, decision, confidence, title, media_type)
+                    loaded += 1
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._reweight()
+        return loaded
+
+
+def is_reused_decision(rule_matched: Optional[str]) -> bool:
+    """Decisions copied from a neighbour are never used as a source (no drift)"""
+    return bool(rule_matched) and rule_matched.startswith('similarity:')
+
+
+# Décisions qui ne disent rien du contenu : déjà dans la bibliothèque, staff,
+# échec d'action Overseerr, quota. Un titre voisin pas encore possédé ne doit
+# pas hériter d'un rejet "déjà disponible".
+# manual_staff : le staff tranche une review sur le contexte de la demande
+# (demandeur, sortie à venir, stockage), pas seulement sur le titre, et à
+# confiance 1.0 chaque clic deviendrait une règle pour tous les quasi-doublons
+# sans repasser ni par l'AI ni par un humain.
+NON_CONTENT_RULES = frozenset({
+    'auto_reject.duplicate_check', 'in_library', 'manual_staff',
+    'overseerr_action_failed', 'max_pending_requests',
+})
+
+# Suffixes "(budget:<stage>)" / "(trust:<tier>)" : décision locale acceptée sous
+# un seuil de confiance abaissé, ou dépendante du demandeur
+NON_CONTENT_SUFFIXES = ('(budget:', '(trust:')
+
+
+def rule_tokens(rule_matched: str) -> List[str]:
+    """Rule ids of a stored rule_matched ("a, b (budget:cheap)" → [a, b])"""
+    rule_matched = rule_matched.split(' (', 1)[0]
+    return [token.strip() for token in rule_matched.split(',') if token.strip()]
+
+
+def is_content_decision(rule_matched: Optional[str]) -> bool:
+    """Whether a stored decision may serve as a neighbour for similar titles.
+
+    Excludes reused decisions, decisions where any rule token is one of the
+    non-content rules above, budget-gated local decisions and trust-tier
+    decisions (``trust.<tier>.*`` / ``(trust:<tier>)``), which depend on the
+    requester rather than the title.
+    """
+    if not rule_matched:
+        return True
+    if is_reused_decision(rule_matched) or any(suffix in rule_matched for suffix in NON_CONTENT_SUFFIXES):
+        return False
+    return not any(
+        token in NON_CONTENT_RULES or token.startswith('trust.')
+        for token in rule_tokens(rule_matched)
+    )
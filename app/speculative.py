@@ -0,0 +1,145 @@
+# speculative.py - Speculative OpenAI call overlapping enrichment / pre-check
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Champs qui apparaissent dans le prompt OpenAI : un verdict spéculatif n'est
+# réutilisé que si les données finales sont identiques sur ces champs.
+PROMPT_FIELDS = (
+    'title', 'media_type', 'year', 'rating', 'popularity', 'genres',
+    'season_count', 'episode_count', 'requested_by', 'user_age_days',
+)
+
+# Champs remplis ou actualisés par l'enrichissement TMDB (build_moderation_data) :
+# popularity / rating bougent presque toujours, épisodes / saisons passent de 0
+# à leur valeur pour les séries.
+ENRICHED_FIELDS = ('year', 'rating', 'popularity', 'genres', 'season_count', 'episode_count')
+
+# Champs du prompt qui ne viennent que du payload
+STABLE_FIELDS = tuple(field for field in PROMPT_FIELDS if field not in ENRICHED_FIELDS)
+
+
+class Speculation:
+    """One in-flight speculative moderation call"""
+
+    def __init__(self, future: Future, request_data: Dict[str, Any], started_at: float,
+                 compare_fields: Tuple[str, ...] = PROMPT_FIELDS):
+        self.future = future
+        self.request_data = request_data
+        self.started_at = started_at
+        self.compare_fields = compare_fields
+        self.finished_at = None
+        future.add_done_callback(self._mark_finished)
+
+    def _mark_finished(self, _future: Future):
+        self.finished_at = time.perf_counter()
+
+
+class SpeculativeAI:
+    """Starts OpenAI calls early and tracks how many of them were wasted.
+
+    ``start`` is called as soon as ``min_fields`` are known, and only when
+    enrichment cannot change the prompt: either TMDB will not run, or the
+    payload already carries every enriched field (``is_complete``), in which
+    case only ``STABLE_FIELDS`` are compared - TMDB refreshing popularity or
+    the rating does not invalidate a verdict made on complete data. The
+    pipeline then either ``discard``s the call (strict rule or reused
+    decision) or ``resolve``s it against the final data.
+
+    ``waste_callback(tokens)`` is told about every discarded call that hit the
+    API (TokenBudgetGovernor.record_speculative_waste).
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speculative-ai')
+        self._lock = threading.Lock()
+        self.stats = {
+            'started': 0,
+            'used': 0,
+            'cancelled': 0,          # discarded before the API call started
+            'wasted_preempted': 0,   # strict rule / reused decision made it useless
+            'wasted_stale': 0,       # enrichment changed the prompt data
+            'wasted_tokens': 0,
+            'skipped_incomplete': 0, # TMDB would change the prompt: not started
+            'saved_ms': 0.0,
+        }
+        self.waste_callback: Optional[Callable[[int], None]] = None
+
+    @staticmethod
+    def has_fields(request_data: Dict[str, Any], min_fields: Iterable[str]) -> bool:
+        return all(request_data.get(field) not in (None, '', [], 0) for field in min_fields)
+
+    @staticmethod
+    def is_complete(request_data: Dict[str, Any]) -> bool:
+        """Payload already has what TMDB would fill in (episodes / seasons: TV only)"""
+        fields = ENRICHED_FIELDS if request_data.get('media_type') == 'tv' else ENRICHED_FIELDS[:4]
+        return all(request_data.get(field) not in (None, '', [], 0) for field in fields)
+
+    def skip(self):
+        """Speculation not started because enrichment would make it stale"""
+        self._bump('skipped_incomplete')
+
+    def start(self, moderator, request_data: Dict[str, Any],
+              compare_fields: Tuple[str, ...] = PROMPT_FIELDS) -> Speculation:
+        snapshot = {field: request_data.get(field) for field in compare_fields}
+        started_at = time.perf_counter()
+        future = self._executor.submit(moderator.moderate, dict(request_data))
+        self._bump('started')
+        return Speculation(future, snapshot, started_at, compare_fields)
+
+    def discard(self, speculation: Optional[Speculation], stale: bool = False):
+        """Drop a speculative call; tokens are accounted once it finishes"""
+        if speculation is None:
+            return
+        if speculation.future.cancel():
+            self._bump('cancelled')
+            return
+        self._bump('wasted_stale' if stale else 'wasted_preempted')
+        speculation.future.add_done_callback(self._count_wasted_tokens)
+
+    def resolve(self, speculation: Optional[Speculation],
+                request_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Speculative verdict if it was computed on the same prompt data"""
+        if speculation is None:
+            return None
+        if any(speculation.request_data.get(field) != request_data.get(field)
+               for field in speculation.compare_fields):
+            self.discard(speculation, stale=True)
+            return None
+
+        needed_at = time.perf_counter()
+        result = speculation.future.result()
+        # Latency saved = AI time already elapsed when the verdict was needed
+        saved_ms = (min(needed_at, speculation.finished_at or needed_at) - speculation.started_at) * 1000
+        with self._lock:
+            self.stats['used'] += 1
+            self.stats['saved_ms'] += saved_ms
+        return result
+
+    def _count_wasted_tokens(self, future: Future):
+        try:
+            tokens = (future.result() or {}).get('tokens_used', 0)
+        except Exception:
+            tokens = 0
+        with self._lock:
+            self.stats['wasted_tokens'] += tokens
+        if self.waste_callback and tokens:
+            try:
+                self.waste_callback(tokens)
+            except Exception as e:
+                print(f"⚠️  Speculative waste callback failed: {e}")
+
+    def _bump(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        wasted = stats['wasted_preempted'] + stats['wasted_stale']
+        stats['waste_rate'] = round(wasted / stats['started'], 4) if stats['started'] else 0.0
+        stats['avg_saved_ms'] = round(stats['saved_ms'] / stats['used'], 1) if stats['used'] else 0.0
+        stats['saved_ms'] = round(stats['saved_ms'], 1)
+        return stats
@@ -0,0 +1,170 @@
+# trust.py - User trust tiers (ai_rules.user_trust_levels) cached from user_stats
+
+import threading
+from typing import Any, Dict, Optional
+
+STANDARD = 'standard'
+TRUSTED = 'trusted'
+VETERAN = 'veteran'
+
+
+# Valeurs qui ne désignent personne (payload webhook sans requestedBy.id, etc.)
+NO_IDENTITY = frozenset({'', 'none', 'null', 'unknown'})
+
+
+def user_key(user_id: Any, username: Optional[str] = None) -> Optional[str]:
+    """Clé user_stats : l'id Overseerr, sinon ``name:<username>``, sinon None.
+
+    Les webhooks n'envoient que ``requestedBy_username`` : sans repli ils
+    partageaient tous la ligne 'None'. None = pas d'identité, ni tier ni stats.
+    """
+    if user_id is not None and str(user_id).strip().lower() not in NO_IDENTITY:
+        return str(user_id)
+    if username and str(username).strip().lower() not in NO_IDENTITY:
+        return f"name:{str(username).strip()}"
+    return None
+
+
+class TrustTiers:
+    """In-memory approved-request counts per user, mapped to trust tiers.
+
+    Loaded once from ``user_stats`` and kept current through
+    ``FeedbackDatabase.user_stats_callback``, so looking up a tier on the
+    hot path is a dict read. Tier thresholds are read from the live config
+    on every lookup (hot-reload friendly).
+    """
+
+    def __init__(self, config, feedback_db):
+        self.config = config
+        self.feedback_db = feedback_db
+        self._lock = threading.Lock()
+        self._approved: Dict[str, int] = {}
+        self._tiers: Dict[str, str] = {}
+        # username → id Overseerr, pour rattacher un webhook à la ligne déjà connue
+        self._ids_by_username: Dict[str, str] = {}
+        self.load()
+        feedback_db.user_stats_callback = self.on_user_stats
+
+    def load(self) -> int:
+        rows = self.feedback_db.db.connection().execute(
+            "SELECT user_id, username, approved_requests, trust_level FROM user_stats"
+        ).fetchall()
+        with self._lock:
+            self._approved = {user_id: approved or 0 for user_id, _, approved, _ in rows}
+            self._tiers = {user_id: trust_level for user_id, _, _, trust_level in rows}
+            self._ids_by_username = {
+                username: user_id for user_id, username, _, _ in rows
+                # La ligne 'None' héritée des anciens webhooks n'identifie personne
+                if username and user_key(user_id) is not None and not user_id.startswith('name:')
+            }
+        return len(rows)
+
+    def key(self, user_id: Any, username: Optional[str] = None) -> Optional[str]:
+        """user_key, en retrouvant l'id d'un username déjà vu avec son id"""
+        if user_key(user_id) is None and username:
+            known = self._ids_by_username.get(str(username).strip())
+            if known is not None:
+                return known
+        return user_key(user_id, username)
+
+    def remember(self, user_id: Any, username: Optional[str]):
+        """Associe un username à son id Overseerr (payloads de l'API)"""
+        key = user_key(user_id)
+        if key is not None and username and str(username).strip().lower() not in NO_IDENTITY:
+            self._ids_by_username[str(username).strip()] = key
+
+    def _levels(self, config=None) -> Dict[str, Any]:
+        return (config or self.config).get('ai_rules.user_trust_levels', {}) or {}
+
+    def tier_for(self, approved: int, config=None) -> str:
+        levels = self._levels(config)
+        if approved >= levels.get('veteran_requests_min', 100):
+            return VETERAN
+        if approved >= levels.get('trusted_requests_min', 50):
+            return TRUSTED
+        return STANDARD
+
+    def tier(self, key: Optional[str], config=None) -> str:
+        """Tier d'une clé ``key()`` ; sans identité, toujours standard"""
+        if key is None:
+            return STANDARD
+        return self.tier_for(self._approved.get(key, 0), config)
+
+    def benefits(self, tier: str, config=None) -> Dict[str, Any]:
+        """Benefits of a tier; veterans also get the trusted benefits"""
+        levels = self._levels(config)
+        benefits: Dict[str, Any] = {}
+        if tier in (TRUSTED, VETERAN):
+            benefits.update(levels.get('trusted_user_benefits', {}) or {})
+        if tier == VETERAN:
+            benefits.update(levels.get('veteran_user_benefits', {}) or {})
+        return benefits
+
+    def rules_only(self, tier: str, config=None) -> bool:
+        """Tier resolved by rules alone (no OpenAI call)"""
+        return tier in (self._levels(config).get('rules_only_tiers', [TRUSTED, VETERAN]) or [])
+
+    def priority(self, key: Optional[str]) -> int:
+        """Sort key: 0 for users with priority_processing, 1 otherwise"""
+        return 0 if self.benefits(self.tier(key)).get('priority_processing') else 1
+
+    def on_user_stats(self, user_id: str, approved: int):
+        """FeedbackDatabase callback after every user_stats update"""
+        tier = self.tier_for(approved)
+        with self._lock:
+            self._approved[user_id] = approved
+            previous = self._tiers.get(user_id)
+            changed = previous != tier
+            self._tiers[user_id] = tier
+        if changed:
+            # Colonne trust_level gardée à jour pour le dashboard / SQL
+            with self.feedback_db.db.transaction() as conn:
+                conn.execute("UPDATE user_stats SET trust_level = ? WHERE user_id = ?", (tier, user_id))
+            if previous is not None or tier != STANDARD:
+                print(f"🏅 User {user_id} is now {tier} ({approved} approved)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            approved = dict(self._approved)
+        counts = {STANDARD: 0, TRUSTED: 0, VETERAN: 0}
+        for value in approved.values():
+            counts[self.tier_for(value)] += 1
+        return {'users': len(approved), 'tiers': counts}
+
+    def resolve(self, tier: str, request_data: Dict[str, Any], moderator,
+                config=None) -> Optional[Dict[str, Any]]:
+        """Rules-only decision for a trusted/veteran user (None = not applicable)"""
+        if not self.rules_only(tier, config):
+            return None
+        benefits = self.benefits(tier, config)
+        rating = request_data.get('rating', 0) or 0
+
+        if benefits.get('auto_approve_all'):
+            return {
+                'decision': 'APPROVED',
+                'confidence': 0.9,
+                'reason': f'{tier.capitalize()} user: auto_approve_all',
+                'rule_matched': f'trust.{tier}.auto_approve_all',
+                'source': 'trust_tier',
+            }
+
+        approve_rating = benefits.get('auto_approve_rating')
+        if approve_rating is not None and rating >= approve_rating:
+            return {
+                'decision': 'APPROVED',
+                'confidence': 0.9,
+                'reason': f'{tier.capitalize()} user, rating {rating}/10 ≥ {approve_rating}',
+                'rule_matched': f'trust.{tier}.auto_approve_rating',
+                'source': 'trust_tier',
+            }
+
+        result = moderator.moderate_with_learning(request_data, config)
+        if benefits.get('skip_episode_limit') and result.get('rule_matched') in (
+                'needs_review.episode_count', 'needs_review.season_count'):
+            # Séries longues acceptées pour ce niveau : on relance sans la limite
+            relaxed = dict(request_data, episode_count=0, season_count=0)
+            result = moderator.moderate_with_learning(relaxed, config)
+        return {
+            **result,
+            'rule_matched': f"{result.get('rule_matched') or 'rules_only'} (trust:{tier})",
+        }
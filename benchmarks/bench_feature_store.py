@@ -0,0 +1,99 @@
+# bench_feature_store.py - Replay from the feature store vs json.loads of request_data
+#
+# Writes N synthetic decisions to a temporary moderation.db, backfills a
+# FeatureStore from it, then times building RecordBatches both ways and a
+# full replay() both ways, checking the two replay reports are identical.
+#
+#   python benchmarks/bench_feature_store.py [-n 200000]
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config_loader import ConfigManager  # noqa: E402
+from app.feature_store import FeatureStore  # noqa: E402
+from app.replay import replay  # noqa: E402
+from app.rules_batch import RecordBatch  # noqa: E402
+
+from bench_rules import sample_requests  # noqa: E402
+
+DECISIONS = ['APPROVED', 'APPROVED', 'REJECTED', 'NEEDS_REVIEW']
+# Avec des décisions non rejouées (staff, bibliothèque, réutilisation, budget)
+RULES = ['openai', 'openai', 'auto_approve.genres', 'manual_staff', 'auto_reject.duplicate_check',
+         'similarity:#1 (0.95)', 'naive_bayes (budget:cheap)']
+
+
+def fill(db_path: str, count: int, seed: int = 4):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, request_id INTEGER, decision TEXT,
+            confidence REAL, rule_matched TEXT, request_data TEXT, timestamp TEXT
+        )
+    """)
+    conn.executemany("""
+        INSERT INTO decisions (request_id, decision, confidence, rule_matched, request_data, timestamp)
+        VALUES (?, ?, ?, ?, ?, '2026-01-01T00:00:00')
+    """, ((i, rng.choice(DECISIONS), 0.8, rng.choice(RULES),
+           json.dumps(record)) for i, record in enumerate(sample_requests(count))))
+    conn.commit()
+    conn.close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        db_path = os.path.join(tmp, 'moderation.db')
+        fill(db_path, args.n)
+        store = FeatureStore(os.path.join(tmp, 'features.bin'))
+        _, backfill_s = timed(lambda: store.backfill(db_path))
+        size_mb = store.get_stats()['bytes'] / 1e6
+
+        conn = sqlite3.connect(db_path)
+        blobs = [row[0] for row in conn.execute("SELECT request_data FROM decisions ORDER BY id")]
+        conn.close()
+        _, json_s = timed(lambda: RecordBatch.from_records(json.loads(blob) for blob in blobs))
+        _, store_s = timed(lambda: store.batch(store.records()))
+
+        baseline = ConfigManager(os.path.join(ROOT, 'config.yaml'))
+        candidate_config = copy.deepcopy(baseline.config)
+        candidate_config['ai_rules']['auto_approve']['rating_above'] = 6.5
+        candidate = ConfigManager.from_dict(candidate_config)
+        sql_report, sql_s = timed(lambda: replay(candidate, baseline, db_path, None))
+        store_report, replay_s = timed(lambda: replay(candidate, baseline, db_path, None,
+                                                      features_path=store.path))
+        store.close()
+
+    sources = [report.pop('source') for report in (sql_report, store_report)]
+    for report in (sql_report, store_report):
+        report.pop('elapsed_s')
+    print(f"backfill      : {args.n} decisions in {backfill_s:.2f}s ({size_mb:.1f} MB)")
+    print(f"RecordBatch   : json.loads {json_s:.2f}s, feature store {store_s * 1000:.1f}ms "
+          f"({json_s / store_s:.0f}x)")
+    print(f"replay()      : {sources[0]} {sql_s:.2f}s, {sources[1]} {replay_s:.2f}s ({sql_s / replay_s:.1f}x)")
+    print(f"identical reports: {sql_report == store_report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# bench_indexes.py - Hot moderation.db queries before/after the index migration
+#
+# Builds a synthetic moderation.db (decisions + pending_reviews, same columns
+# as init_db), then runs the dashboard / webhook queries of app/main.py
+# before and after app.migrations.migrate(), printing the EXPLAIN QUERY PLAN
+# and the median time of each.
+#
+#   python benchmarks/bench_indexes.py [-n 1000000] [--pending 20000] [--db path]
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.migrations import migrate, schema_version  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id INTEGER, title TEXT, username TEXT, media_type TEXT,
+    decision TEXT, reason TEXT, confidence REAL DEFAULT 1.0,
+    rule_matched TEXT DEFAULT 'legacy', request_data JSON,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, config_version INTEGER
+);
+CREATE TABLE pending_reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id INTEGER UNIQUE, title TEXT, username TEXT, media_type TEXT,
+    request_data JSON, ai_decision TEXT, ai_reason TEXT, ai_confidence REAL,
+    status TEXT DEFAULT 'pending', created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# (name, sql, params) - copiées de app/main.py
+QUERIES = [
+    ('save_decision: latest for request',
+     "SELECT id, decision, timestamp FROM decisions WHERE request_id = ? ORDER BY timestamp DESC LIMIT 1",
+     (123456,)),
+    ('stats: decisions in last 24h',
+     "SELECT decision, COUNT(*) FROM decisions WHERE timestamp > ? GROUP BY decision",
+     None),  # rempli avec now - 1 jour
+    ('stats/report: approved count',
+     "SELECT COUNT(*) FROM decisions WHERE decision = 'APPROVED'", ()),
+    ('report: last 10',
+     "SELECT title, username, decision, timestamp FROM decisions ORDER BY timestamp DESC LIMIT 10", ()),
+    ('/history: last 50',
+     "SELECT * FROM decisions ORDER BY timestamp DESC LIMIT 50", ()),
+    ('/api/history?filter=REJECTED',
+     "SELECT * FROM decisions WHERE decision = ? ORDER BY timestamp DESC LIMIT 100", ('REJECTED',)),
+    ('startup: processed ids (ProcessedRequests.load)',
+     "SELECT DISTINCT request_id FROM decisions WHERE request_id IS NOT NULL", ()),
+    ('webhook: processed check (set miss)',
+     "SELECT EXISTS(SELECT 1 FROM decisions WHERE request_id = ?)", (654321,)),
+    ('review dashboard: pending',
+     "SELECT * FROM pending_reviews WHERE status = 'pending' ORDER BY created_at DESC LIMIT 50", ()),
+    ('pending count',
+     "SELECT COUNT(*) FROM pending_reviews WHERE status = 'pending'", ()),
+]
+
+
+def build(db_path: str, count: int, pending: int, seed: int = 5):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    span = (datetime.now() - start).total_seconds()
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+
+    def decisions():
+        for i in range(count):
+            ts = start + timedelta(seconds=span * i / count + rng.random())
+            yield (rng.randint(1, count // 2), f'Title {i}', f'user{rng.randint(1, 500)}',
+                   rng.choice(['movie', 'tv']), rng.choice(['APPROVED', 'APPROVED', 'REJECTED', 'NEEDS_REVIEW']),
+                   'reason', 0.8, 'openai', '{"genres": ["Drama"]}', ts.isoformat())
+
+    conn.executemany("""
+        INSERT INTO decisions (request_id, title, username, media_type, decision, reason,
+                               confidence, rule_matched, request_data, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, decisions())
+    conn.executemany("""
+        INSERT INTO pending_reviews (request_id, title, username, status, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((i, f'Title {i}', f'user{i % 500}', 'pending' if i % 50 == 0 else rng.choice(['approved', 'rejected']),
+           (start + timedelta(seconds=span * i / pending)).isoformat()) for i in range(pending)))
+    conn.commit()
+    conn.close()
+
+
+def measure(conn, sql, params, repeat):
+    plan = ' | '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        times.append(time.perf_counter() - started)
+    return plan, statistics.median(times)
+
+
+def run(conn, repeat):
+    day_ago = (datetime.now() - timedelta(days=1)).isoformat()
+    return [(name, *measure(conn, sql, params if params is not None else (day_ago,), repeat))
+            for name, sql, params in QUERIES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=1000000, help='decisions rows')
+    parser.add_argument('--pending', type=int, default=20000, help='pending_reviews rows')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help='keep the synthetic database here')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'moderation.db')
+        started = time.perf_counter()
+        build(db_path, args.n, args.pending)
+        print(f"built {args.n} decisions / {args.pending} reviews in {time.perf_counter() - started:.1f}s")
+
+        conn = sqlite3.connect(db_path)
+        before = run(conn, args.repeat)
+        started = time.perf_counter()
+        migrate(conn)
+        print(f"migrated to user_version {schema_version(conn)} in {time.perf_counter() - started:.1f}s\n")
+        after = run(conn, args.repeat)
+        conn.close()
+
+    for (name, plan_before, before_s), (_, plan_after, after_s) in zip(before, after):
+        print(f"{name}: {before_s * 1000:.2f}ms → {after_s * 1000:.2f}ms ({before_s / after_s:.0f}x)")
+        print(f"    before: {plan_before}")
+        print(f"    after : {plan_after}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# bench_keywords.py - Keyword scan cost vs number of configured keywords
+#
+# KeywordMatcher (one Aho-Corasick pass over title, original title, overview
+# and TMDB keywords) against the previous per-keyword substring test, which
+# only looked at the title.
+#
+#   python benchmarks/bench_keywords.py [-n 2000]
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.keyword_matcher import KeywordMatcher  # noqa: E402
+
+WORDS = ("the family secret war night city last story love dark house river king "
+         "return journey summer world lost heart star ghost road").split()
+
+
+def sample_requests(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [{
+        'title': ' '.join(rng.choices(WORDS, k=3)).title(),
+        'original_title': ' '.join(rng.choices(WORDS, k=3)),
+        'overview': ' '.join(rng.choices(WORDS, k=80)),
+        'keywords': rng.choices(WORDS, k=8),
+    } for _ in range(count)]
+
+
+def sample_keywords(count: int, seed: int = 2):
+    rng = random.Random(seed)
+    base = ['CAM', 'LEAK', 'SCREENER', 'HDTS', 'HDCAM']
+    return base + [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+                   for _ in range(count - len(base))]
+
+
+def naive(keywords, request_data):
+    title = request_data.get('title', '').upper()
+    return [kw for kw in keywords if kw.upper() in title]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=2000)
+    args = parser.parse_args()
+
+    requests = sample_requests(args.n)
+    print(f"{'keywords':>9} {'build ms':>9} {'matcher µs/req':>15} {'naive title µs/req':>19}")
+    for count in (5, 50, 500, 2000):
+        keywords = sample_keywords(count)
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for request_data in requests:
+            matcher.scan(request_data)
+        matcher_us = (time.perf_counter() - start) / args.n * 1e6
+
+        start = time.perf_counter()
+        for request_data in requests:
+            naive(keywords, request_data)
+        naive_us = (time.perf_counter() - start) / args.n * 1e6
+        print(f"{count:>9} {build_ms:>9.1f} {matcher_us:>15.1f} {naive_us:>19.1f}")
+
+
+if __name__ == '__main__':
+    main()
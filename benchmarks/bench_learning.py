@@ -0,0 +1,105 @@
+# bench_learning.py - learn_from_feedback: set-based SQL vs the former per-row loop
+#
+# Fills two feedback databases with the same synthetic human_feedback rows,
+# trains one with FeedbackDatabase.learn_from_feedback (aggregate upsert +
+# bulk flag update) and the other with the previous SELECT/UPDATE-per-genre
+# loop, then checks both produce the same learned_patterns.
+#
+#   python benchmarks/bench_learning.py [-n 100000] [--legacy-max 20000]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.ml_feedback import FeedbackDatabase  # noqa: E402
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Documentary', 'Horror', 'Animation', 'Science Fiction',
+          'Thriller', 'Romance', 'Family', 'Crime', 'Fantasy', 'Adventure', 'History', 'War']
+DECISIONS = ['APPROVED', 'APPROVED', 'APPROVED', 'REJECTED']
+
+
+def fill(db: FeedbackDatabase, count: int, seed: int = 3):
+    rng = random.Random(seed)
+    rows = [(i, rng.choice(DECISIONS), json.dumps({'genres': rng.sample(GENRES, rng.randint(0, 3))}))
+            for i in range(count)]
+    with db.db.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO human_feedback (request_id, human_decision, request_data) VALUES (?, ?, ?)
+        """, rows)
+
+
+def legacy_learn(db_path: str):
+    """The per-row loop learn_from_feedback used before (one connection, one commit)"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, request_data, human_decision FROM human_feedback WHERE learning_applied = 0")
+    for feedback_id, request_data_json, decision in cursor.fetchall():
+        for genre in json.loads(request_data_json).get('genres', []):
+            cursor.execute("""
+                SELECT id, occurrences FROM learned_patterns
+                WHERE pattern_type = ? AND pattern_value = ? AND decision = ?
+            """, ('genre', genre, decision))
+            existing = cursor.fetchone()
+            if existing:
+                cursor.execute("UPDATE learned_patterns SET occurrences = ?, last_used = CURRENT_TIMESTAMP "
+                               "WHERE id = ?", (existing[1] + 1, existing[0]))
+            else:
+                cursor.execute("INSERT INTO learned_patterns (pattern_type, pattern_value, decision, confidence) "
+                               "VALUES (?, ?, ?, ?)", ('genre', genre, decision, 0.7))
+        cursor.execute("UPDATE human_feedback SET learning_applied = 1 WHERE id = ?", (feedback_id,))
+    conn.commit()
+    conn.close()
+
+
+def patterns(db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(conn.execute(
+            "SELECT pattern_type, pattern_value, decision, confidence, occurrences FROM learned_patterns"
+        ).fetchall())
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=100000)
+    parser.add_argument('--legacy-max', type=int, default=20000,
+                        help='Skip the per-row loop above this many rows (0 = always run it)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            new_db = FeedbackDatabase(os.path.join(tmp, 'set_based.db'))
+            legacy_db = FeedbackDatabase(os.path.join(tmp, 'legacy.db'))
+        fill(new_db, args.n)
+        fill(legacy_db, args.n)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = new_db.learn_from_feedback()
+        set_based_s = time.perf_counter() - start
+        print(f"set-based : {args.n} feedbacks → {result['patterns']} patterns in {set_based_s:.2f}s")
+
+        if args.legacy_max and args.n > args.legacy_max:
+            print(f"per-row   : skipped (n > --legacy-max {args.legacy_max})")
+            return
+        start = time.perf_counter()
+        legacy_learn(str(legacy_db.db_path))
+        legacy_s = time.perf_counter() - start
+        same = patterns(str(new_db.db_path)) == patterns(str(legacy_db.db_path))
+        print(f"per-row   : {legacy_s:.2f}s ({legacy_s / set_based_s:.1f}x), identical patterns: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+# bench_pipeline.py - Agreement, latency and cost of each decision path
+#
+# Replays labelled requests (human_feedback rows, a JSONL fixture file, or a
+# synthetic staff policy when neither is given) through every decision path
+# run_moderation can take:
+#
+#   smart_moderator  SmartModerator.moderate (config rules, 'fallback' = no decision)
+#   rules_precheck   RulesValidator strict pre-check (PENDING = no decision)
+#   learned          EnhancedModerator ML branch (Naive Bayes / genre patterns),
+#                    trained on the first --train-ratio of the items
+#   openai           OpenAIModerator against the in-process mock (app.mock_openai)
+#
+# Every path is scored on the same held-out items. The JSON report gives, per
+# path, coverage (share of items it decides), agreement with the human label
+# on those items, the per-item latency distribution and tokens/cost per 1k
+# requests; "cascades" combines the per-item results for a few path orders
+# (first path that decides wins, openai always decides).
+#
+#   python benchmarks/bench_pipeline.py [--feedback-db /config/feedback.db]
+#       [--fixtures labelled.jsonl] [-n 2000] [--profile mock_profile.json]
+#       [--order rules_precheck,learned,openai] [--out report.json]
+#
+# Fixture lines: {"request_data": {...}, "human_decision": "APPROVED"}
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config_loader import ConfigManager, SmartModerator  # noqa: E402
+from app.mock_openai import MockChatBackend, synthetic_requests  # noqa: E402
+from app.ml_feedback import EnhancedModerator, FeedbackDatabase  # noqa: E402
+from app.openai_moderator import OpenAIModerator  # noqa: E402
+from app.rules_validator import RulesValidator  # noqa: E402
+
+PATHS = ('smart_moderator', 'rules_precheck', 'learned', 'openai')
+DEFAULT_ORDERS = (
+    'rules_precheck,openai',
+    'rules_precheck,learned,openai',
+    'learned,rules_precheck,openai',
+    'smart_moderator,openai',
+)
+
+
+# ----- labelled items -----
+
+def load_feedback(db_path: str):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT request_data, human_decision FROM human_feedback ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    return [(json.loads(request_data), decision) for request_data, decision in rows
+            if request_data and decision]
+
+
+def load_fixtures(path: str):
+    items = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                items.append((row['request_data'], row.get('human_decision') or row['decision']))
+    return items
+
+
+def synthetic_items(count: int, seed: int = 11):
+    """synthetic_requests labelled by a noisy staff policy"""
+    rng = random.Random(seed)
+    items = []
+    for request_data in synthetic_requests(count, seed):
+        genres = set(request_data['genres'])
+        if 'Horror' in genres and request_data['user_age_days'] < 90:
+            decision = 'REJECTED'
+        elif request_data['rating'] >= 6.0 or genres & {'Documentary', 'Animation', 'Family'}:
+            decision = 'APPROVED'
+        elif request_data['rating'] < 4.0 or request_data['episode_count'] > 200:
+            decision = 'REJECTED'
+        else:
+            decision = 'APPROVED' if request_data['popularity'] > 30 else 'REJECTED'
+        if rng.random() < 0.05:
+            decision = 'REJECTED' if decision == 'APPROVED' else 'APPROVED'
+        items.append((request_data, decision))
+    return items
+
+
+# ----- paths -----
+
+def run_serial(decide, items):
+    """[(decision or None, seconds)] for each item"""
+    results = []
+    for request_data, _ in items:
+        start = time.perf_counter()
+        decision = decide(request_data)
+        results.append((decision, time.perf_counter() - start))
+    return results
+
+
+def smart_moderator_path(config):
+    moderator = SmartModerator(config)
+
+    def decide(request_data):
+        decision = moderator.moderate(request_data)
+        return None if decision.rule_matched == 'fallback' else decision.decision
+    return decide
+
+
+def precheck_path(config):
+    validator = RulesValidator(config)
+    pending = {'decision': 'PENDING', 'confidence': 0.0, 'reason': 'Pre-check'}
+
+    def decide(request_data):
+        decision = validator.validate(pending, request_data)['final_decision']
+        return None if decision == 'PENDING' else decision
+    return decide
+
+
+def learned_path(config, train, tmp):
+    feedback_db = FeedbackDatabase(os.path.join(tmp, 'feedback.db'))
+    for i, (request_data, decision) in enumerate(train):
+        feedback_db.add_feedback({'request_id': i, 'human_decision': decision, 'request_data': request_data})
+    feedback_db.learn_from_feedback()
+    moderator = EnhancedModerator(config, feedback_db)
+
+    def decide(request_data):
+        result = moderator.moderate_with_learning(request_data)
+        return result['decision'] if result.get('source') == 'machine_learning' else None
+    return decide, feedback_db
+
+
+def openai_path(items, profile, concurrency):
+    backend = MockChatBackend(profile)
+    http_client = httpx.Client(transport=backend.transport())
+    os.environ['OPENAI_MAX_RETRIES'] = '0'
+    moderator = OpenAIModerator(api_key='mock', base_url='http://mock-openai/v1', http_client=http_client)
+
+    def one(item):
+        start = time.perf_counter()
+        result = moderator.moderate(item[0])
+        return result['decision'], time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, items))
+    http_client.close()
+    return results, moderator.get_usage_stats()
+
+
+# ----- report -----
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+def latency_ms(seconds):
+    values = sorted(seconds)
+    return {
+        'mean': round(sum(values) / len(values) * 1000, 4) if values else 0.0,
+        'p50': round(percentile(values, 50) * 1000, 4),
+        'p90': round(percentile(values, 90) * 1000, 4),
+        'p99': round(percentile(values, 99) * 1000, 4),
+        'max': round(values[-1] * 1000, 4) if values else 0.0,
+    }
+
+
+def summarize(results, labels, usage=None):
+    decided = [(decision, label) for (decision, _), label in zip(results, labels) if decision is not None]
+    counts = {}
+    for decision, _ in decided:
+        counts[decision] = counts.get(decision, 0) + 1
+    agree = sum(decision == label for decision, label in decided)
+    summary = {
+        'decided': len(decided),
+        'coverage': round(len(decided) / len(results), 4) if results else None,
+        'agreement': round(agree / len(decided), 4) if decided else None,
+        'decisions': counts,
+        'latency_ms': latency_ms([seconds for _, seconds in results]),
+        'tokens_per_1k': 0,
+        'cost_per_1k_usd': 0.0,
+    }
+    if usage is not None:
+        summary['tokens_per_1k'] = round(usage['total_tokens'] / len(results) * 1000)
+        summary['cost_per_1k_usd'] = round(usage['total_cost'] / len(results) * 1000, 4)
+    return summary
+
+
+def cascade(order, per_path, labels, openai_usage):
+    """First path of ``order`` that decides wins; latency/cost add up along the way"""
+    per_call_cost = openai_usage['total_cost'] / len(labels)
+    per_call_tokens = openai_usage['total_tokens'] / len(labels)
+    decided_by = {name: 0 for name in order}
+    agree, unresolved, seconds, ai_calls = 0, 0, [], 0
+    for i, label in enumerate(labels):
+        elapsed = 0.0
+        decision = None
+        for name in order:
+            step, step_seconds = per_path[name][i]
+            elapsed += step_seconds
+            if name == 'openai':
+                ai_calls += 1
+            if step is not None:
+                decision = step
+                decided_by[name] += 1
+                break
+        seconds.append(elapsed)
+        agree += decision == label
+        unresolved += decision is None
+    return {
+        'agreement': round(agree / len(labels), 4),
+        'decided_by': decided_by,
+        'unresolved': unresolved,
+        'latency_ms': latency_ms(seconds),
+        'openai_calls': ai_calls,
+        'tokens_per_1k': round(ai_calls * per_call_tokens / len(labels) * 1000),
+        'cost_per_1k_usd': round(ai_calls * per_call_cost / len(labels) * 1000, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=os.path.join(ROOT, 'config.yaml'))
+    parser.add_argument('--feedback-db', help='human_feedback source (e.g. /config/feedback.db)')
+    parser.add_argument('--fixtures', help='labelled JSONL fixtures')
+    parser.add_argument('-n', type=int, default=2000, help='synthetic items when no source is given')
+    parser.add_argument('--train-ratio', type=float, default=0.7)
+    parser.add_argument('--profile', help='mock OpenAI profile JSON (latency, verdicts, errors)')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='parallel OpenAI calls')
+    parser.add_argument('--order', action='append', help='cascade to evaluate, e.g. rules_precheck,openai')
+    parser.add_argument('--out', help='write the JSON report here (default: stdout)')
+    args = parser.parse_args()
+
+    items, sources = [], {}
+    if args.feedback_db:
+        items.extend(load_feedback(args.feedback_db))
+        sources['human_feedback'] = len(items)
+    if args.fixtures:
+        before = len(items)
+        items.extend(load_fixtures(args.fixtures))
+        sources['fixtures'] = len(items) - before
+    if not items:
+        items = synthetic_items(args.n)
+        sources['synthetic'] = len(items)
+    orders = [order.split(',') for order in (args.order or DEFAULT_ORDERS)]
+    for order in orders:
+        unknown = set(order) - set(PATHS)
+        if unknown:
+            parser.error(f"unknown path(s) in --order: {', '.join(sorted(unknown))}")
+
+    profile = None
+    if args.profile:
+        with open(args.profile, 'r') as f:
+            profile = json.load(f)
+
+    split = int(len(items) * args.train_ratio)
+    train, test = items[:split], items[split:]
+    labels = [label for _, label in test]
+
+    per_path, usage = {}, None
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()), \
+            contextlib.redirect_stderr(io.StringIO()):
+        config = ConfigManager(args.config)
+        per_path['smart_moderator'] = run_serial(smart_moderator_path(config), test)
+        per_path['rules_precheck'] = run_serial(precheck_path(config), test)
+        decide, feedback_db = learned_path(config, train, tmp)
+        per_path['learned'] = run_serial(decide, test)
+        feedback_db.db.close()
+        per_path['openai'], usage = openai_path(test, profile, args.concurrency)
+
+    report = {
+        'items': len(items),
+        'sources': sources,
+        'train': len(train),
+        'test': len(test),
+        'labels': {label: labels.count(label) for label in sorted(set(labels))},
+        'paths': {
+            name: summarize(per_path[name], labels, usage if name == 'openai' else None)
+            for name in PATHS
+        },
+        'cascades': {','.join(order): cascade(order, per_path, labels, usage) for order in orders},
+        'openai_mock': {'profile': profile or 'default', 'quality': usage['quality']},
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# bench_rules.py - Per-call cost of RulesValidator.validate
+#
+# Compares the compiled RulePlan against the previous implementation (which
+# re-resolved ai_rules.* through ConfigManager.get on every call), vendored
+# in baseline_rules_validator.py. ``post-ai+facts`` is the production path:
+# validation after OpenAI reusing the RuleFacts of the pre-check.
+#
+#   python benchmarks/bench_rules.py [-n 50000] [--repeat 5]
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config_loader import ConfigManager  # noqa: E402
+from app.rules_validator import RulesValidator  # noqa: E402
+
+from baseline_rules_validator import RulesValidator as BaselineRulesValidator  # noqa: E402
+
+GENRES = ['Documentaire', 'Drame', 'Comedy', 'Action', 'Horreur', 'Science-Fiction', 'Adult', 'History']
+
+
+def sample_requests(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [{
+        'rating': round(rng.uniform(0, 10), 1),
+        'popularity': round(rng.uniform(0, 200), 1),
+        'genres': rng.sample(GENRES, rng.randint(1, 3)),
+        'episode_count': rng.choice([0, 0, 24, 150]),
+        'season_count': rng.choice([0, 2, 12]),
+        'user_age_days': rng.choice([3, 45, 999]),
+        'year': str(rng.randint(1970, 2024)),
+    } for _ in range(count)]
+
+
+def run_once(validator, requests, ai_result, facts=None) -> float:
+    """µs per call for one pass; ``facts`` = pre-check facts to reuse"""
+    start = time.perf_counter()
+    if facts is None:
+        for request_data in requests:
+            validator.validate(ai_result, request_data)
+    else:
+        for request_data, request_facts in zip(requests, facts):
+            validator.validate(ai_result, request_data, facts=request_facts)
+    return (time.perf_counter() - start) / len(requests) * 1e6
+
+
+def bench(validator, baseline, requests, ai_result, repeat, facts=None):
+    """Best of ``repeat`` passes for each side, interleaved so machine noise
+    hits both alike"""
+    current = previous = float('inf')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            current = min(current, run_once(validator, requests, ai_result, facts))
+            previous = min(previous, run_once(baseline, requests, ai_result))
+    return current, previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per mode (best is kept)')
+    parser.add_argument('--config', default=os.path.join(ROOT, 'config.yaml'))
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        config = ConfigManager(args.config)
+    requests = sample_requests(args.n)
+    modes = {
+        'precheck': {'decision': 'PENDING', 'confidence': 0.5, 'reason': 'Rules pre-check'},
+        'post-ai': {'decision': 'APPROVED', 'confidence': 0.8, 'reason': 'AI'},
+    }
+
+    validator = RulesValidator(config)
+    baseline_validator = BaselineRulesValidator(config)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        facts = [validator.compute_facts(request_data) for request_data in requests]
+
+    # post-ai+facts : chemin de production (faits du pre-check réutilisés) ;
+    # la baseline n'avait pas de faits et ré-évaluait tout après l'AI
+    runs = [(mode, ai_result, None) for mode, ai_result in modes.items()]
+    runs.append(('post-ai+facts', modes['post-ai'], facts))
+
+    print(f"{'mode':<14} {'compiled µs/call':>18} {'baseline µs/call':>18} {'speedup':>9}")
+    for mode, ai_result, mode_facts in runs:
+        current, baseline = bench(validator, baseline_validator, requests, ai_result, args.repeat, mode_facts)
+        print(f"{mode:<14} {current:>18.2f} {baseline:>18.2f} {baseline / current:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
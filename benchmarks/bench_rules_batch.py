@@ -0,0 +1,109 @@
+# bench_rules_batch.py - Vectorized rule evaluation vs per-request validate()
+#
+# Scores N synthetic records with evaluate_batch (pre-check and post-AI) and
+# compares against RulesValidator.validate on a sample, checking that both
+# paths agree on every sampled record.
+#
+#   python benchmarks/bench_rules_batch.py [-n 100000] [--sample 20000]
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config_loader import ConfigManager  # noqa: E402
+from app.rules_batch import (DECISION_NAMES, RecordBatch, evaluate_batch,  # noqa: E402
+                             plan_genre_vocab)
+from app.rules_validator import RulesValidator  # noqa: E402
+
+from bench_rules import sample_requests  # noqa: E402
+
+
+def sample_ai(count: int, seed: int = 2):
+    rng = random.Random(seed)
+    decisions = [rng.choice(['APPROVED', 'APPROVED', 'REJECTED', 'NEEDS_REVIEW']) for _ in range(count)]
+    confidences = [round(rng.uniform(0.5, 1.0), 2) for _ in range(count)]
+    return decisions, confidences
+
+
+def check_agreement(validator, batch_result, requests, ai=None):
+    """Number of records where batch and scalar paths disagree"""
+    mismatches = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i, request_data in enumerate(requests):
+            if ai is None:
+                ai_result = {'decision': 'PENDING', 'confidence': 0.5, 'reason': 'Rules pre-check'}
+            else:
+                ai_result = {'decision': ai[0][i], 'confidence': ai[1][i], 'reason': 'AI'}
+            scalar = validator.validate(ai_result, request_data)
+            if (scalar['final_decision'] != DECISION_NAMES[batch_result.decision[i]]
+                    or abs(scalar['final_confidence'] - batch_result.confidence[i]) > 1e-9
+                    or scalar['rule_override'] != bool(batch_result.rule_override[i])):
+                mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=20000, help='records also scored by validate()')
+    parser.add_argument('--config', default=os.path.join(ROOT, 'config.yaml'))
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        config = ConfigManager(args.config)
+    validator = RulesValidator(config)
+    plan = validator.plan
+
+    requests = sample_requests(args.n)
+    # Un peu de sorties à venir sans note pour couvrir upcoming_release
+    for request_data in requests[::50]:
+        request_data['rating'] = 0
+        request_data['year'] = str(time.localtime().tm_year)
+    # …et des titres pour les règles de mots-clés (rejet / review)
+    for i, request_data in enumerate(requests[::7]):
+        request_data['title'] = ('Movie HDCAM', 'Banned Stories', 'Camera Obscura', 'Plain Title')[i % 4]
+    ai_decisions, ai_confidences = sample_ai(args.n)
+
+    start = time.perf_counter()
+    batch = RecordBatch.from_records(requests, genre_vocab=plan_genre_vocab(plan))
+    build_s = time.perf_counter() - start
+
+    ai_codes = np.array([DECISION_NAMES.index(d) for d in ai_decisions], dtype=np.int8)
+    ai_conf = np.array(ai_confidences)
+
+    sample = min(args.sample, args.n)
+    print(f"{args.n} records, batch built in {build_s * 1000:.1f} ms (from dicts)")
+    print(f"{'mode':<10} {'batch ms':>10} {'batch µs/rec':>13} {'validate µs/rec':>16} {'speedup':>9} {'mismatches':>11}")
+    for mode in ('precheck', 'post-ai'):
+        kwargs = {} if mode == 'precheck' else {'ai_decision': ai_codes, 'ai_confidence': ai_conf}
+        start = time.perf_counter()
+        result = evaluate_batch(plan, batch, **kwargs)
+        batch_s = time.perf_counter() - start
+
+        ai = None if mode == 'precheck' else (ai_decisions, ai_confidences)
+        ai_result = {'decision': 'PENDING', 'confidence': 0.5, 'reason': ''}
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for i, request_data in enumerate(requests[:sample]):
+                if ai is not None:
+                    ai_result = {'decision': ai[0][i], 'confidence': ai[1][i], 'reason': 'AI'}
+                validator.validate(ai_result, request_data)
+            scalar_us = (time.perf_counter() - start) / sample * 1e6
+
+        mismatches = check_agreement(validator, result, requests[:sample], ai)
+        batch_us = batch_s / args.n * 1e6
+        print(f"{mode:<10} {batch_s * 1000:>10.1f} {batch_us:>13.3f} {scalar_us:>16.2f} "
+              f"{scalar_us / batch_us:>8.0f}x {mismatches:>11}")
+        print(f"           {result.counts()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ fi
 
 # Cron auto-modération toutes les 15min
 echo "*/1 * * * * curl -s http://localhost:5056/staff/moderate >> /logs/auto-moderate.log 2>&1" > /etc/cron.d/plexstaffai
+# Index local de la bibliothèque (auto_reject.duplicate_check) toutes les heures
+echo "0 * * * * curl -s -X POST http://localhost:5056/admin/library-sync >> /logs/library-sync.log 2>&1" >> /etc/cron.d/plexstaffai
 chmod 0644 /etc/cron.d/plexstaffai
 
 cron && echo "✅ Cron started (auto-moderate every 1min)"
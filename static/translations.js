@@ -124,6 +124,14 @@ const translations = {
         openaiPromptTokens: "Prompt",
         openaiCompletionTokens: "Complétion",
         openaiNoStats: "Aucune statistique disponible",
+        openaiParseFailureRate: "Réponses invalides",
+        openaiRetryRate: "Taux de relance",
+        openaiRetrySuccessRate: "Relances réussies",
+        openaiUnresolvedRate: "Non résolues",
+        openaiBudget: "Budget tokens",
+        openaiBudgetHour: "Dernière heure",
+        openaiBudgetDay: "Dernières 24h",
+        openaiBudgetBar: "Seuil décision locale",
         
         // Common
         backToDashboard: "← Retour au Dashboard",
@@ -260,6 +268,14 @@ const translations = {
         openaiPromptTokens: "Prompt",
         openaiCompletionTokens: "Completion",
         openaiNoStats: "No statistics available",
+        openaiParseFailureRate: "Invalid responses",
+        openaiRetryRate: "Retry rate",
+        openaiRetrySuccessRate: "Successful retries",
+        openaiUnresolvedRate: "Unresolved",
+        openaiBudget: "Token budget",
+        openaiBudgetHour: "Last hour",
+        openaiBudgetDay: "Last 24h",
+        openaiBudgetBar: "Local decision bar",
         
         // Common
         backToDashboard: "← Back to Dashboard",